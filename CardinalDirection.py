@@ -11,3 +11,44 @@ class CardinalDirection(Enum):
 
     def __gt__(self, other):
         return self.value > other.value
+
+    # this direction's bit in a room's 4-bit exit mask: north 1, south 2, east 4, west 8
+    @property
+    def mask(self):
+        return 1 << self.value
+
+
+# Exit bits used by Room's exit mask, and per-mask lookup tables so nothing has to loop over directions
+EXIT_NORTH = CardinalDirection.NORTH.mask
+EXIT_SOUTH = CardinalDirection.SOUTH.mask
+EXIT_EAST = CardinalDirection.EAST.mask
+EXIT_WEST = CardinalDirection.WEST.mask
+
+EXIT_ATTRIBUTES = {direction.mask: direction.name.lower() for direction in CardinalDirection}
+EXIT_BITS = {name: bit for bit, name in EXIT_ATTRIBUTES.items()}
+
+# number of exits for each of the 16 masks
+EXIT_COUNTS = tuple(bin(mask).count("1") for mask in range(16))
+# the same as a bytes.translate table, for counting exits over a whole bytes of masks at once
+DEGREE_TABLE = bytes(EXIT_COUNTS) + bytes(256 - len(EXIT_COUNTS))
+# the CardinalDirections in each mask
+EXIT_DIRECTIONS = tuple(frozenset(direction for direction in CardinalDirection if mask & direction.mask) for mask in range(16))
+# glyph for each 4-bit exit mask (north 1, south 2, east 4, west 8)
+EXIT_GLYPHS = (
+    " ",  # none
+    "⏝",  # n
+    "⏜",  # s
+    "|",  # ns
+    "(",  # e
+    "+",  # ne
+    "r",  # es
+    "+",  # nes
+    ")",  # w
+    "+",  # nw
+    "+",  # sw
+    "+",  # nsw
+    "-",  # ew
+    "+",  # new
+    "+",  # esw
+    "+",  # nesw
+)
@@ -0,0 +1,163 @@
+from GridPosition import GridPosition
+from MapSnapshot import MapSnapshot, encodeSnapshot
+from CardinalDirection import EXIT_NORTH, EXIT_SOUTH, EXIT_EAST, EXIT_WEST
+from Room import Room
+import json
+
+# Versioned log of map changes, so clients can catch up on what changed instead of downloading toDict()
+# again. Every change bumps the version by one and is stored as a compact tuple:
+#
+#   ("room", id, name, x, y, northId, southId, eastId, westId)   a room was added (exit ids may be None)
+#   ("reward", roomId, itemReward)                               a room's itemReward was set
+#   ("player", playerId, roomId)                                 a player joined or moved; roomId None when it left
+#
+# Rewards and players are last-writer-wins, so compact() keeps only the newest entry per room or player;
+# a client catching up from any version still lands on the current state. When the log is still over
+# three quarters of maxEntries after compacting, a checkpoint (a MapSnapshot plus every player's room) is
+# taken and only the newest half of maxEntries is kept. Clients older than the log get the checkpoint and
+# the changes after it.
+
+ROOM = "room"
+REWARD = "reward"
+PLAYER = "player"
+
+EXIT_ORDER = (EXIT_NORTH, EXIT_SOUTH, EXIT_EAST, EXIT_WEST)
+
+
+class ChangeLog():
+    def __init__(self, controller, maxEntries=10000):
+        self.controller = controller
+        self.maxEntries = maxEntries
+        self.version = 0
+        # oldest version a client can be at and still be served from entries alone
+        self.baseVersion = 0
+        self.entries = []
+        self.checkpointVersion = None
+        self.checkpointData = None
+        self.checkpointPlayers = None
+        self.checkpoint()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def record(self, change):
+        self.version += 1
+        self.entries.append((self.version, change))
+        if len(self.entries) > self.maxEntries:
+            self.compact()
+            if len(self.entries) > self.maxEntries * 3 // 4:
+                self.checkpoint(self.maxEntries // 2)
+
+    def roomAdded(self, room):
+        self.record((ROOM, room.id, room.name, room.position.x, room.position.y,
+                     room.north.id if room.north else None, room.south.id if room.south else None,
+                     room.east.id if room.east else None, room.west.id if room.west else None))
+
+    def rewardSet(self, room):
+        self.record((REWARD, room.id, room.itemReward))
+
+    def playerMoved(self, player):
+        self.record((PLAYER, player.id, player.room.id if player.room is not None else None))
+
+    # drops every reward and player entry that a newer entry for the same room or player overrides
+    def compact(self):
+        seen = set()
+        kept = []
+        for entry in reversed(self.entries):
+            change = entry[1]
+            if change[0] != ROOM:
+                key = (change[0], change[1])
+                if key in seen:
+                    continue
+                seen.add(key)
+            kept.append(entry)
+        kept.reverse()
+        self.entries = kept
+
+    # snapshots the whole map at the current version and drops all but the newest keep entries
+    def checkpoint(self, keep=0):
+        self.checkpointVersion = self.version
+        self.checkpointData = encodeSnapshot(self.controller) if self.controller.spawnRoom is not None else None
+        self.checkpointPlayers = [(player.id, player.room.id) for player in self.controller.occupancy.players]
+        entries = self.entries
+        if len(entries) > keep:
+            self.baseVersion = entries[len(entries) - keep - 1][0]
+            self.entries = entries[len(entries) - keep:]
+
+    # changes after version, oldest first, or None when the log no longer reaches back that far
+    def changesSince(self, version):
+        if version < self.baseVersion:
+            return None
+        entries = self.entries
+        # versions are increasing, so binary search for the first entry past version
+        low = 0
+        high = len(entries)
+        while low < high:
+            middle = (low + high) // 2
+            if entries[middle][0] <= version:
+                low = middle + 1
+            else:
+                high = middle
+        return [change for _, change in entries[low:]]
+
+    # what a client at version needs to reach the current version: just changes when the log covers it,
+    # otherwise the checkpoint and the changes after it
+    def sync(self, version=None):
+        if version is not None:
+            changes = self.changesSince(version)
+            if changes is not None:
+                return {"version": self.version, "changes": changes}
+        return {"version": self.version, "checkpointVersion": self.checkpointVersion, "checkpoint": self.checkpointData,
+                "players": list(self.checkpointPlayers), "changes": self.changesSince(self.checkpointVersion)}
+
+
+# compact wire form of a list of changes
+def encodeChanges(changes):
+    return json.dumps(changes, separators=(",", ":")).encode("utf-8")
+
+
+def decodeChanges(data):
+    return [tuple(change) for change in json.loads(data)]
+
+
+# Client-side mirror that stays current by applying sync responses. players maps player ids to room ids.
+class ChangeReplica():
+    def __init__(self):
+        self.version = None
+        self.controller = None
+        self.players = {}
+
+    def apply(self, response):
+        if "checkpoint" in response:
+            self.controller = MapSnapshot(response["checkpoint"]).toController()
+            self.players = dict(response["players"])
+        for change in response["changes"]:
+            self.applyChange(change)
+        self.version = response["version"]
+
+    def applyChange(self, change):
+        kind = change[0]
+        controller = self.controller
+        if kind == ROOM:
+            roomId, name, x, y = change[1:5]
+            room = Room(name, GridPosition(x, y), id=roomId)
+            for exit, neighborId in zip(EXIT_ORDER, change[5:9]):
+                neighbor = controller.roomWithId(neighborId) if neighborId is not None else None
+                if neighbor is not None:
+                    room.setExit(exit, neighbor)
+                    neighbor.setExit(opposite(exit), room)
+            controller.addRoomConnection(room, None, None)
+        elif kind == REWARD:
+            controller.setItemReward(controller.roomWithId(change[1]), change[2])
+        elif kind == PLAYER:
+            if change[2] is None:
+                self.players.pop(change[1], None)
+            else:
+                self.players[change[1]] = change[2]
+        else:
+            raise ValueError(f"unknown change {kind!r}")
+
+
+def opposite(exit):
+    # north 1 <-> south 2, east 4 <-> west 8
+    return exit << 1 if exit in (EXIT_NORTH, EXIT_EAST) else exit >> 1
@@ -0,0 +1,207 @@
+from CardinalDirection import CardinalDirection
+from GridPosition import GridPosition
+from Room import Room
+from RoomController import RoomController
+from WorkQueue import FIFOQueue
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import math
+import random
+
+# Chunked world generation that gives the same map for a seed no matter how many workers run it.
+#
+# The world is a square of chunkSize x chunkSize chunks around the spawn chunk. Every chunk has a hub
+# cell; all chunks in a chunk column share the hub's x offset and all chunks in a chunk row share its
+# y offset, so straight spines from neighboring hubs meet at the seam between them. The chunks form
+# a spanning tree (each chunk links toward the spawn chunk), and only seams on that tree get spines.
+# Random growth then fills each chunk's interior with the same rule as canAddRoomAt, never touching
+# the chunk's outer ring, so the only rooms adjacent across chunks are the spine ends at open seams.
+# Every chunk draws from its own random.Random seeded from (seed, chunk), which is what makes the
+# result independent of scheduling.
+
+def deriveSeed(seed, *parts):
+    digest = hashlib.blake2b(repr((seed,) + parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class ChunkedWorldGenerator():
+    def __init__(self, seed, chunkSize=32, roomsPerChunk=400):
+        # a chunk can be handed a quarter of roomsPerChunk and must still fit its spines, and random growth
+        # fills a bit over half of a chunk's interior before it runs out of eligible cells
+        if roomsPerChunk < 8 * chunkSize:
+            raise ValueError("roomsPerChunk must be at least 8 * chunkSize")
+        if roomsPerChunk > (chunkSize - 2) * (chunkSize - 2) // 2:
+            raise ValueError("roomsPerChunk must be at most half of a chunk's interior, (chunkSize - 2) ** 2 // 2")
+        self.seed = seed
+        self.chunkSize = chunkSize
+        self.roomsPerChunk = roomsPerChunk
+
+    def chunksPerSide(self, roomLimit):
+        return math.ceil(math.sqrt(math.ceil(roomLimit / self.roomsPerChunk)))
+
+    def hubOffset(self, axis, index):
+        return random.Random(deriveSeed(self.seed, axis, index)).randint(1, self.chunkSize - 2)
+
+    # the chunk this one links to on its way to the center chunk, or None for the center chunk itself
+    def parentChunk(self, chunkX, chunkY, center):
+        dx = chunkX - center
+        dy = chunkY - center
+        if dx == 0 and dy == 0:
+            return None
+        if dx == 0:
+            return (chunkX, chunkY - (1 if dy > 0 else -1))
+        if dy == 0:
+            return (chunkX - (1 if dx > 0 else -1), chunkY)
+        if random.Random(deriveSeed(self.seed, "parent", chunkX, chunkY)).random() < 0.5:
+            return (chunkX - (1 if dx > 0 else -1), chunkY)
+        return (chunkX, chunkY - (1 if dy > 0 else -1))
+
+    # chunksPerSide None means an unbounded world, where every neighboring chunk exists
+    def seamIsOpen(self, chunk, otherChunk, center, chunksPerSide):
+        if chunksPerSide is not None and not (0 <= otherChunk[0] < chunksPerSide and 0 <= otherChunk[1] < chunksPerSide):
+            return False
+        return self.parentChunk(*chunk, center) == otherChunk or self.parentChunk(*otherChunk, center) == chunk
+
+    # everything a worker needs to grow one chunk, as a plain picklable tuple
+    def chunkSpec(self, chunkX, chunkY, center, chunksPerSide, quota):
+        chunk = (chunkX, chunkY)
+        ports = (self.seamIsOpen(chunk, (chunkX, chunkY + 1), center, chunksPerSide),
+                 self.seamIsOpen(chunk, (chunkX, chunkY - 1), center, chunksPerSide),
+                 self.seamIsOpen(chunk, (chunkX + 1, chunkY), center, chunksPerSide),
+                 self.seamIsOpen(chunk, (chunkX - 1, chunkY), center, chunksPerSide))
+        return (self.chunkSize, chunkX, chunkY, self.hubOffset("column", chunkX), self.hubOffset("row", chunkY),
+                ports, quota, deriveSeed(self.seed, "chunk", chunkX, chunkY))
+
+    def chunkSpecs(self, roomLimit):
+        chunksPerSide = self.chunksPerSide(roomLimit)
+        center = chunksPerSide // 2
+        chunkCount = chunksPerSide * chunksPerSide
+        specs = []
+        for chunkY in range(chunksPerSide):
+            for chunkX in range(chunksPerSide):
+                order = chunkY * chunksPerSide + chunkX
+                quota = roomLimit // chunkCount + (1 if order < roomLimit % chunkCount else 0)
+                specs.append(self.chunkSpec(chunkX, chunkY, center, chunksPerSide, quota))
+        return specs
+
+    def generate(self, roomLimit, workers=1):
+        specs = self.chunkSpecs(roomLimit)
+        if workers > 1 and len(specs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = list(executor.map(growChunk, specs, chunksize=max(1, len(specs) // (4 * workers))))
+        else:
+            chunks = [growChunk(spec) for spec in specs]
+        return self.stitch(roomLimit, specs, chunks)
+
+    # builds the controller from the grown chunks, spawn chunk first, then links the open seams
+    def stitch(self, roomLimit, specs, chunks):
+        chunkSize = self.chunkSize
+        chunksPerSide = self.chunksPerSide(roomLimit)
+        center = chunksPerSide // 2
+        centerIndex = center * chunksPerSide + center
+        originX = center * chunkSize + specs[centerIndex][3]
+        originY = center * chunkSize + specs[centerIndex][4]
+
+        controller = RoomController(roomLimit, generate=False)
+        order = [centerIndex] + [index for index in range(len(specs)) if index != centerIndex]
+        for index in order:
+            _, chunkX, chunkY, _, _, _, _, _ = specs[index]
+            cells = chunks[index]
+            baseX = chunkX * chunkSize - originX
+            baseY = chunkY * chunkSize - originY
+            chunkRooms = []
+            for cell in range(0, len(cells), 3):
+                x = baseX + cells[cell]
+                y = baseY + cells[cell + 1]
+                parent = cells[cell + 2]
+                if index == centerIndex and cell == 0:
+                    room = Room("Spawn Area", GridPosition(x, y))
+                    controller.spawnRoom = room
+                else:
+                    room = Room(f"Room {len(controller.rooms)}", GridPosition(x, y))
+                if parent < 0:
+                    controller.addRoomConnection(room, None, None)
+                else:
+                    parentRoom = chunkRooms[parent]
+                    controller.addRoomConnection(room, parentRoom, directionBetween(parentRoom.position, room.position))
+                chunkRooms.append(room)
+
+        # only the east and north seam of each chunk, so every seam is linked once
+        for spec in specs:
+            _, chunkX, chunkY, hubX, hubY, ports, _, _ = spec
+            baseX = chunkX * chunkSize - originX
+            baseY = chunkY * chunkSize - originY
+            if ports[0]:
+                controller.roomAt(baseX + hubX, baseY + chunkSize - 1).connectNorthTo(controller.roomAt(baseX + hubX, baseY + chunkSize))
+            if ports[2]:
+                controller.roomAt(baseX + chunkSize - 1, baseY + hubY).connectEastTo(controller.roomAt(baseX + chunkSize, baseY + hubY))
+        controller.pathfinder.invalidate()
+        return controller
+
+
+def directionBetween(fromPosition, toPosition):
+    if toPosition.y > fromPosition.y:
+        return CardinalDirection.NORTH
+    if toPosition.y < fromPosition.y:
+        return CardinalDirection.SOUTH
+    if toPosition.x > fromPosition.x:
+        return CardinalDirection.EAST
+    return CardinalDirection.WEST
+
+
+# Grows one chunk. Returns a flat array of (localX, localY, parentIndex) triples in placement order;
+# the hub comes first with parent -1. Module level so process pools can pickle it.
+def growChunk(spec):
+    chunkSize, _, _, hubX, hubY, ports, quota, chunkSeed = spec
+    rng = random.Random(chunkSeed)
+    occupancy = bytearray(chunkSize * chunkSize)
+    cells = array("i")
+
+    def place(index, parent):
+        occupancy[index] = 1
+        cells.extend((index % chunkSize, index // chunkSize, parent))
+        return len(cells) // 3 - 1
+
+    hub = hubY * chunkSize + hubX
+    roomIndexes = {hub: place(hub, -1)}
+    queue = FIFOQueue()
+    queue.enqueue(hub)
+
+    # straight spines from the hub out to the open seams, north, south, east, west
+    for isOpen, step, length in ((ports[0], chunkSize, chunkSize - 1 - hubY), (ports[1], -chunkSize, hubY),
+                                 (ports[2], 1, chunkSize - 1 - hubX), (ports[3], -1, hubX)):
+        if not isOpen:
+            continue
+        previous = hub
+        for _ in range(length):
+            cell = previous + step
+            roomIndexes[cell] = place(cell, roomIndexes[previous])
+            queue.enqueue(cell)
+            previous = cell
+
+    inner = chunkSize - 1
+
+    def eligible(index):
+        targets = []
+        for target in (index + chunkSize, index - chunkSize, index + 1, index - 1):
+            x = target % chunkSize
+            y = target // chunkSize
+            if 0 < x < inner and 0 < y < inner and not occupancy[target]:
+                if occupancy[target + chunkSize] + occupancy[target - chunkSize] + occupancy[target + 1] + occupancy[target - 1] == 1:
+                    targets.append(target)
+        return targets
+
+    count = len(cells) // 3
+    while count < quota and queue:
+        index = queue.dequeue()
+        targets = eligible(index)
+        if targets:
+            target = rng.choice(targets)
+            roomIndexes[target] = place(target, roomIndexes[index])
+            count += 1
+            if eligible(target):
+                queue.enqueue(target)
+            if eligible(index):
+                queue.enqueue(index)
+    return cells
@@ -0,0 +1,181 @@
+from Room import Room
+from RoomGrid import RoomGrid
+from RoomPathfinder import RoomPathfinder
+from MapRenderer import MapRenderer
+from array import array
+
+# A frozen, consistent view of a RoomController at one version, for reader threads (serializers,
+# analytics) that run while the game loop keeps writing.
+#
+# Taking one is O(1): it only notes the grid's arrays, its room table and how many rooms it held. The
+# controller then copies on write. Before it changes a room (exits, reward, players) it hands the room's
+# current state to every live snapshot, which keeps the first state it gets per room; before it writes a
+# grid cell it hands over that cell's old bytes. Rooms nobody touched are read straight from the live
+# objects. Rooms added later aren't part of the view, and growing the grid swaps in new arrays, leaving
+# the old ones to the snapshot.
+#
+# Readers see the map through SnapshotRoom views, so toDict, textVisualization, the pathfinding methods,
+# MapAnalytics, encodeSnapshot and dumpController all work on a snapshot as they do on a controller.
+# Snapshots must be taken by the thread that writes (e.g. between ticks); reading one never blocks it.
+# Call release() or use a with block when done; release() may be called from the reading thread. A snapshot
+# is in reference cycles with its room views and pathfinder, so dropping the last reference to it only stops
+# the copying once the cyclic garbage collector runs. Reads after release() may see later writes.
+
+
+class SnapshotRoom(Room):
+    __slots__ = ("_room", "_snapshot")
+
+    def __init__(self, snapshot, room):
+        self._room = room
+        self._snapshot = snapshot
+        self.name = room.name
+        self.id = room.id
+
+    def _state(self, field):
+        return self._snapshot.state(self._room)[field]
+
+    def _neighbor(self, field):
+        room = self._snapshot.state(self._room)[field]
+        return None if room is None else self._snapshot.view(room)
+
+    north = property(lambda self: self._neighbor(0))
+    south = property(lambda self: self._neighbor(1))
+    east = property(lambda self: self._neighbor(2))
+    west = property(lambda self: self._neighbor(3))
+    exits = property(lambda self: self._state(4))
+    itemReward = property(lambda self: self._state(5))
+    position = property(lambda self: self._state(6))
+    players = property(lambda self: self._state(7))
+
+
+class ControllerSnapshot():
+    def __init__(self, controller):
+        grid = controller.grid
+        self.controller = controller
+        self.version = controller.version
+        self.roomLimit = controller.roomLimit
+        self.roomTable = grid.rooms
+        self.roomCount = len(grid.rooms)
+        self.liveSpawnRoom = controller.spawnRoom
+        self.occupancy = grid.occupancy
+        self.roomIndexes = grid.roomIndexes
+        self.gridShape = (grid.width, grid.height, grid.originX, grid.originY, grid.minX, grid.maxX, grid.minY, grid.maxY)
+        # room -> (north, south, east, west, exits, itemReward, position, players) before its first write
+        self.preserved = {}
+        # cell index -> (occupancy, room index) before its first write
+        self.preservedCells = {}
+        self.views = {}
+        self.cachedRooms = None
+        self.cachedGrid = None
+        self.cachedRoomsById = None
+        self.pathfinder = RoomPathfinder(self)
+        self.released = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __len__(self):
+        return self.roomCount
+
+    # only flags the snapshot: the controller's set belongs to the writer, which drops it from there
+    def release(self):
+        self.released = True
+
+    # called by the controller just before it changes room
+    def preserve(self, room):
+        if not self.released and room not in self.preserved:
+            self.preserved[room] = (room.north, room.south, room.east, room.west, room.exits, room.itemReward,
+                                    room.position, frozenset(room.players))
+
+    # called by the controller just before it writes cell index of the grid's current arrays
+    def preserveCell(self, grid, index):
+        if not self.released and grid.occupancy is self.occupancy and index not in self.preservedCells:
+            self.preservedCells[index] = (grid.occupancy[index], grid.roomIndexes[index])
+
+    # room's fields as of this snapshot
+    def state(self, room):
+        state = self.preserved.get(room)
+        if state is not None:
+            return state
+        state = (room.north, room.south, room.east, room.west, room.exits, room.itemReward, room.position, frozenset(room.players))
+        # a write may have started while the fields were read; it preserves the room before changing it
+        return self.preserved.get(room, state)
+
+    def view(self, room):
+        view = self.views.get(room)
+        if view is None:
+            view = self.views.setdefault(room, SnapshotRoom(self, room))
+        return view
+
+    @property
+    def spawnRoom(self):
+        return None if self.liveSpawnRoom is None else self.view(self.liveSpawnRoom)
+
+    @property
+    def rooms(self):
+        if self.cachedRooms is None:
+            self.cachedRooms = {self.view(room) for room in self.roomTable[:self.roomCount]}
+        return self.cachedRooms
+
+    @property
+    def roomCoordinates(self):
+        return {room.position for room in self.rooms}
+
+    @property
+    def roomsById(self):
+        if self.cachedRoomsById is None:
+            self.cachedRoomsById = {room.id: room for room in self.rooms}
+        return self.cachedRoomsById
+
+    # the grid as it was, rebuilt from the noted arrays with the preserved cells put back
+    @property
+    def grid(self):
+        if self.cachedGrid is None:
+            grid = RoomGrid.__new__(RoomGrid)
+            grid.width, grid.height, grid.originX, grid.originY, grid.minX, grid.maxX, grid.minY, grid.maxY = self.gridShape
+            grid.occupancy = bytearray(self.occupancy)
+            grid.roomIndexes = array("l", self.roomIndexes)
+            # read after copying, so every cell written during the copy has been preserved by now
+            for index, (occupied, roomIndex) in list(self.preservedCells.items()):
+                grid.occupancy[index] = occupied
+                grid.roomIndexes[index] = roomIndex
+            grid.rooms = [self.view(room) for room in self.roomTable[:self.roomCount]]
+            self.cachedGrid = grid
+        return self.cachedGrid
+
+    def roomAt(self, x, y):
+        return self.grid.roomAt(x, y)
+
+    def roomWithId(self, roomId):
+        return self.roomsById.get(roomId)
+
+    def roomIdAt(self, x, y):
+        return self.grid.roomIdAt(x, y)
+
+    def populationOf(self, room):
+        return len(room.players)
+
+    def distanceField(self, room=None):
+        return self.pathfinder.distanceField(room)
+
+    def shortestPath(self, fromRoom, toRoom):
+        return self.pathfinder.shortestPath(fromRoom, toRoom)
+
+    def aStarPath(self, fromRoom, toRoom):
+        return self.pathfinder.aStarPath(fromRoom, toRoom)
+
+    def nearestRoom(self, fromRoom, predicate, includeSource=False):
+        return self.pathfinder.nearestRoom(fromRoom, predicate, includeSource)
+
+    def toDict(self):
+        newDict = {}
+        newDict["rooms"] = {str(room.id): room.toDict() for room in self.rooms}
+        newDict["roomCoordinates"] = [position.toArray() for position in self.roomCoordinates]
+        newDict["spawnRoom"] = self.spawnRoom.id
+        return newDict
+
+    def textVisualization(self, file=None):
+        MapRenderer(self).renderText(file)
@@ -0,0 +1,386 @@
+from GridPosition import packCoordinates
+from WorkQueue import PriorityQueue
+
+# Two-level route graph over a RoomController's rooms, for shortest paths on large maps.
+#
+# Level one contracts corridors. A corridor room has exactly two exits, both neighbors link back to it
+# and nothing else links into it, so a route can only pass straight through. Every other room that can
+# be entered is a node (junctions, dead ends, rooms with one-way links), and each run of corridor rooms
+# becomes one weighted edge between the nodes at its ends. Rooms that nothing links into (rooms stacked
+# over by later rooms, mostly) are neither: they can only ever be the start of a route.
+#
+# Level two splits the map into clusterSize x clusterSize cells. Corridors are cut at cluster borders,
+# so every edge either stays inside one cluster or crosses into a neighboring one in a single step; the
+# nodes at those crossings are the cluster's entrances. Distances between the entrances of a cluster are
+# worked out the first time a route needs them, and a route search runs over entrances only, with the
+# rooms around the two endpoints expanded on the spot.
+#
+# Clusters are built lazily and rebuilt after a room lands in or next to them, so a growing map only
+# pays for the clusters it touches.
+
+DIRECTIONS = (("north", "south", 0, 1), ("south", "north", 0, -1), ("east", "west", 1, 0), ("west", "east", -1, 0))
+
+
+class GraphCluster():
+    def __init__(self, key):
+        self.key = key
+        self.rooms = []
+        self.dirty = True
+        self.nodes = set()
+        self.corridors = set()
+        self.entrances = set()
+        # node -> {neighbor node: (steps, first room on the way)}
+        self.edges = {}
+        # node -> [(node with an edge into it, steps)], built on first use
+        self.reverseEdges = None
+        # entrance -> ([(entrance reachable from it, steps, True if within the cluster)], parents of the search from it)
+        self.tables = {}
+
+
+class CorridorGraph():
+    def __init__(self, controller, clusterSize=32):
+        self.controller = controller
+        self.clusterSize = clusterSize
+        self.clusters = {}
+        self.roomsByCell = {}
+        self.builds = 0
+        for room in controller.rooms:
+            self.__index(room)
+
+    def clusterKey(self, room):
+        size = self.clusterSize
+        return (room.position.x // size, room.position.y // size)
+
+    # the cluster a room belongs to, rebuilt first if rooms have changed in or around it
+    def cluster(self, key):
+        cluster = self.clusters.get(key)
+        if cluster is None:
+            cluster = self.clusters[key] = GraphCluster(key)
+        if cluster.dirty:
+            self.__build(cluster)
+        return cluster
+
+    def roomAdded(self, room):
+        self.__index(room)
+        self.roomChanged(room)
+
+    # marks everything that a change to room's exits can affect: its own cluster and those of its neighbors
+    def roomChanged(self, room):
+        size = self.clusterSize
+        x = room.position.x
+        y = room.position.y
+        for dx, dy in ((0, 0), (0, 1), (0, -1), (1, 0), (-1, 0)):
+            cluster = self.clusters.get(((x + dx) // size, (y + dy) // size))
+            if cluster is not None:
+                cluster.dirty = True
+
+    def isNode(self, room):
+        return room in self.cluster(self.clusterKey(room)).nodes
+
+    def isCorridor(self, room):
+        return room in self.cluster(self.clusterKey(room)).corridors
+
+    # builds every cluster now instead of on first use
+    def build(self):
+        for key in list(self.clusters):
+            self.cluster(key)
+
+    # list of rooms from fromRoom to toRoom, both included, or None if there is no route
+    def shortestPath(self, fromRoom, toRoom):
+        if fromRoom is toRoom:
+            return [fromRoom]
+        sources, startParents = self.__walkToNodes(fromRoom)
+        best = None
+        plan = None
+        if toRoom in startParents:
+            best = self.__localDistance(startParents, toRoom)
+            plan = ("local",)
+
+        if self.isNode(toRoom):
+            goals = {toRoom: 0}
+            goalParents = {toRoom: None}
+        elif self.isCorridor(toRoom):
+            # corridor rooms link both ways, so walking out from toRoom gives the walks in, reversed
+            goals, goalParents = self.__walkToNodes(toRoom)
+        else:
+            goals = {}
+        if not goals:
+            return self.__finish(plan, startParents, None, None, None, None, fromRoom, toRoom)
+
+        # the rooms around the start, searched directly
+        startClusters = {self.clusterKey(node) for node in sources}
+        startDistances, startNodeParents = self.__search(sources, startClusters)
+        for node, steps in goals.items():
+            distance = startDistances.get(node)
+            if distance is not None and (best is None or distance + steps < best):
+                best = distance + steps
+                plan = ("start", node)
+
+        # how far every node of the goal's cluster is from the goal, within that cluster
+        goalCluster = self.cluster(self.clusterKey(toRoom))
+        goalCosts, goalNext = self.__searchBack(goalCluster, goals)
+
+        # the rest runs over entrances only, A* guided by the Manhattan distance to toRoom
+        goalX = toRoom.position.x
+        goalY = toRoom.position.y
+        costs = {}
+        via = {}
+        closed = set()
+        openNodes = PriorityQueue()
+        for key in startClusters:
+            for entrance in self.clusters[key].entrances:
+                distance = startDistances.get(entrance)
+                if distance is not None:
+                    costs[entrance] = distance
+                    via[entrance] = None
+                    openNodes.enqueue(entrance, distance + abs(entrance.position.x - goalX) + abs(entrance.position.y - goalY))
+        while openNodes:
+            estimate, entrance = openNodes.dequeueWithPriority()
+            if best is not None and estimate >= best:
+                break
+            closed.add(entrance)
+            cost = costs[entrance]
+            remaining = goalCosts.get(entrance)
+            if remaining is not None and (best is None or cost + remaining < best):
+                best = cost + remaining
+                plan = ("entrance", entrance)
+            for other, distance, inside in self.__table(self.cluster(self.clusterKey(entrance)), entrance)[0]:
+                if other in closed:
+                    continue
+                total = cost + distance
+                if total < costs.get(other, total + 1):
+                    costs[other] = total
+                    via[other] = (entrance, inside)
+                    position = other.position
+                    openNodes.enqueue(other, total + abs(position.x - goalX) + abs(position.y - goalY))
+        return self.__finish(plan, startParents, startNodeParents, via, goalNext, goalParents, fromRoom, toRoom)
+
+    def distanceBetween(self, fromRoom, toRoom):
+        path = self.shortestPath(fromRoom, toRoom)
+        return None if path is None else len(path) - 1
+
+    def __index(self, room):
+        key = packCoordinates(room.position.x, room.position.y)
+        rooms = self.roomsByCell.get(key)
+        if rooms is None:
+            self.roomsByCell[key] = [room]
+        else:
+            rooms.append(room)
+        clusterKey = self.clusterKey(room)
+        cluster = self.clusters.get(clusterKey)
+        if cluster is None:
+            cluster = self.clusters[clusterKey] = GraphCluster(clusterKey)
+        cluster.rooms.append(room)
+
+    def __build(self, cluster):
+        rooms = cluster.rooms
+        members = set(rooms)
+        size = self.clusterSize
+        key = cluster.key
+        roomsByCell = self.roomsByCell
+
+        # links into each room from inside the cluster, and rooms linked into from outside it
+        incoming = dict.fromkeys(rooms, 0)
+        crossing = set()
+        for room in rooms:
+            x = room.position.x
+            y = room.position.y
+            for exit, back, dx, dy in DIRECTIONS:
+                neighbor = getattr(room, exit)
+                if neighbor is not None and neighbor in members:
+                    incoming[neighbor] += 1
+                if ((x + dx) // size, (y + dy) // size) != key:
+                    for other in roomsByCell.get(packCoordinates(x + dx, y + dy), ()):
+                        if getattr(other, back) is room:
+                            crossing.add(room)
+        unreachable = {room for room in rooms if not incoming[room] and room not in crossing}
+
+        # links from rooms that can't be reached themselves don't stop a room being a corridor
+        live = dict.fromkeys(rooms, 0)
+        for room in rooms:
+            if room not in unreachable:
+                for neighbor in (room.north, room.south, room.east, room.west):
+                    if neighbor is not None and neighbor in members:
+                        live[neighbor] += 1
+        corridors = set()
+        for room in rooms:
+            if live[room] != 2 or room in crossing or room in unreachable:
+                continue
+            linked = [(getattr(room, exit), back) for exit, back, _, _ in DIRECTIONS if getattr(room, exit) is not None]
+            if len(linked) == 2 and all(neighbor in members and getattr(neighbor, back) is room for neighbor, back in linked):
+                corridors.add(room)
+        nodes = members - corridors - unreachable
+
+        edges = {}
+        entrances = set(crossing)
+        for node in nodes:
+            nodeEdges = {}
+            for first in (node.north, node.south, node.east, node.west):
+                if first is None:
+                    continue
+                if first not in members:
+                    entrances.add(node)
+                previous = node
+                current = first
+                steps = 1
+                while current in corridors:
+                    nextRoom = None
+                    for neighbor in (current.north, current.south, current.east, current.west):
+                        if neighbor is not None and neighbor is not previous:
+                            nextRoom = neighbor
+                    previous = current
+                    current = nextRoom
+                    steps += 1
+                edge = nodeEdges.get(current)
+                if edge is None or steps < edge[0]:
+                    nodeEdges[current] = (steps, first)
+            edges[node] = nodeEdges
+
+        cluster.nodes = nodes
+        cluster.corridors = corridors
+        cluster.entrances = entrances & nodes
+        cluster.edges = edges
+        cluster.reverseEdges = None
+        cluster.tables = {}
+        cluster.dirty = False
+        self.builds += 1
+
+    # breadth-first from room through corridor rooms: {node: steps} for the nodes reached, and parents
+    def __walkToNodes(self, room):
+        parents = {room: None}
+        distances = {room: 0}
+        if self.isNode(room):
+            return {room: 0}, parents
+        nodes = {}
+        queue = [room]
+        index = 0
+        while index < len(queue):
+            current = queue[index]
+            index += 1
+            distance = distances[current] + 1
+            for neighbor in (current.north, current.south, current.east, current.west):
+                if neighbor is None or neighbor in parents:
+                    continue
+                parents[neighbor] = current
+                distances[neighbor] = distance
+                if self.isNode(neighbor):
+                    nodes[neighbor] = distance
+                else:
+                    queue.append(neighbor)
+        return nodes, parents
+
+    def __localDistance(self, parents, room):
+        steps = 0
+        while parents[room] is not None:
+            room = parents[room]
+            steps += 1
+        return steps
+
+    # Dijkstra over contracted edges from several nodes at once, never leaving the allowed clusters
+    def __search(self, sources, allowed):
+        distances = {}
+        parents = dict.fromkeys(sources)
+        queue = PriorityQueue()
+        for node, distance in sources.items():
+            queue.enqueue(node, distance)
+        while queue:
+            distance, node = queue.dequeueWithPriority()
+            distances[node] = distance
+            for other, edge in self.cluster(self.clusterKey(node)).edges[node].items():
+                if other not in distances and self.clusterKey(other) in allowed and queue.enqueue(other, distance + edge[0]):
+                    parents[other] = node
+        return distances, parents
+
+    # steps from every node of cluster to the nearest of goals, plus the next node on the way there
+    def __searchBack(self, cluster, goals):
+        if cluster.reverseEdges is None:
+            reverseEdges = {node: [] for node in cluster.nodes}
+            for node, nodeEdges in cluster.edges.items():
+                for other, edge in nodeEdges.items():
+                    if other in reverseEdges:
+                        reverseEdges[other].append((node, edge[0]))
+            cluster.reverseEdges = reverseEdges
+        reverseEdges = cluster.reverseEdges
+        costs = {}
+        nextNodes = dict.fromkeys(goals)
+        queue = PriorityQueue()
+        for node, steps in goals.items():
+            queue.enqueue(node, steps)
+        while queue:
+            cost, node = queue.dequeueWithPriority()
+            costs[node] = cost
+            for other, steps in reverseEdges[node]:
+                if other not in costs and queue.enqueue(other, cost + steps):
+                    nextNodes[other] = node
+        return costs, nextNodes
+
+    # where an entrance leads: the cluster's other entrances, by their distance without leaving the cluster,
+    # and the entrances of other clusters that its edges cross into
+    def __table(self, cluster, entrance):
+        table = cluster.tables.get(entrance)
+        if table is None:
+            distances, parents = self.__search({entrance: 0}, (cluster.key,))
+            steps = [(other, distances[other], True) for other in cluster.entrances if other is not entrance and other in distances]
+            steps.extend((other, edge[0], False) for other, edge in cluster.edges[entrance].items() if other not in cluster.nodes)
+            table = (steps, parents)
+            cluster.tables[entrance] = table
+        return table
+
+    def __finish(self, plan, startParents, startNodeParents, via, goalNext, goalParents, fromRoom, toRoom):
+        if plan is None:
+            return None
+        if plan[0] == "local":
+            return self.__roomsBack(startParents, toRoom)
+
+        # nodes from the first node after fromRoom to the last node before toRoom
+        if plan[0] == "start":
+            nodes = self.__roomsBack(startNodeParents, plan[1])
+        else:
+            nodes = []
+            entrance = plan[1]
+            while via[entrance] is not None:
+                previous, inside = via[entrance]
+                if inside:
+                    segment = self.__roomsBack(self.__table(self.cluster(self.clusterKey(previous)), previous)[1], entrance)
+                    nodes.extend(reversed(segment[1:]))
+                else:
+                    nodes.append(entrance)
+                entrance = previous
+            nodes.extend(reversed(self.__roomsBack(startNodeParents, entrance)))
+            nodes.reverse()
+            node = plan[1]
+            while goalNext[node] is not None:
+                node = goalNext[node]
+                nodes.append(node)
+
+        path = self.__roomsBack(startParents, nodes[0])
+        for node, nextNode in zip(nodes, nodes[1:]):
+            path.extend(self.__expandEdge(node, nextNode))
+        if path[-1] is not toRoom:
+            tail = self.__roomsBack(goalParents, path[-1])
+            tail.reverse()
+            path.extend(tail[1:])
+        return path
+
+    # rooms after node up to and including nextNode along their contracted edge
+    def __expandEdge(self, node, nextNode):
+        first = self.cluster(self.clusterKey(node)).edges[node][nextNode][1]
+        rooms = [first]
+        previous = node
+        current = first
+        while current is not nextNode:
+            for neighbor in (current.north, current.south, current.east, current.west):
+                if neighbor is not None and neighbor is not previous:
+                    nextRoom = neighbor
+            previous = current
+            current = nextRoom
+            rooms.append(current)
+        return rooms
+
+    def __roomsBack(self, parents, room):
+        path = []
+        while room is not None:
+            path.append(room)
+            room = parents[room]
+        path.reverse()
+        return path
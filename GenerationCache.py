@@ -0,0 +1,101 @@
+from MapSnapshot import MapSnapshot, writeSnapshot
+from RoomController import RoomController, GENERATOR_VERSION
+from RoomIdAllocator import RoomIdAllocator, SEQUENTIAL
+from GenerationStrategy import DEFAULT_STRATEGY
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+
+# Memoized generateRooms results. Worlds are keyed by (seed, roomLimit, idMode, strategy.cacheKey(),
+# GENERATOR_VERSION) and
+# kept as pristine controllers in an LRU of maxEntries; with a directory, every generated world is also
+# written there as a MapSnapshot, so a restarted process (or another one sharing the directory) loads it
+# instead of generating again. get() always hands back controller.clone(), never the cached object, so
+# callers can change their copy freely.
+
+class GenerationCache():
+    def __init__(self, maxEntries=8, directory=None):
+        self.maxEntries = maxEntries
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    # strategy None is the default strategy, as for RoomController
+    def key(self, seed, roomLimit, idMode=SEQUENTIAL, strategy=None):
+        strategy = strategy if strategy is not None else DEFAULT_STRATEGY
+        return (seed, roomLimit, idMode, strategy.cacheKey(), GENERATOR_VERSION)
+
+    def get(self, seed, roomLimit, idMode=SEQUENTIAL, strategy=None):
+        return self.getPristine(seed, roomLimit, idMode, strategy).clone()
+
+    # the cached controller itself. callers must not change it
+    def getPristine(self, seed, roomLimit, idMode=SEQUENTIAL, strategy=None):
+        key = self.key(seed, roomLimit, idMode, strategy)
+        controller = self.entries.get(key)
+        if controller is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return controller
+        controller = self.__load(key, strategy)
+        if controller is not None:
+            self.diskHits += 1
+        else:
+            self.misses += 1
+            controller = RoomController(roomLimit, seed=seed, idMode=idMode, strategy=strategy)
+            self.__store(key, controller)
+        self.entries[key] = controller
+        if len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+        return controller
+
+    def clear(self):
+        self.entries.clear()
+
+    def path(self, key):
+        digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.directory, f"{digest}.map")
+
+    def __load(self, key, strategy):
+        if self.directory is None:
+            return None
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        snapshot = MapSnapshot.open(path)
+        try:
+            controller = snapshot.toController()
+        finally:
+            snapshot.close()
+        # pick up id allocation where generating this world would have left it
+        seed, roomLimit, idMode = key[:3]
+        controller.roomLimit = roomLimit
+        controller.idMode = idMode
+        controller.strategy = strategy if strategy is not None else DEFAULT_STRATEGY
+        controller.ids = RoomIdAllocator(idMode, seed)
+        controller.ids.counter = len(controller.rooms)
+        return controller
+
+    # written to a temporary file first, so a reader never sees a half-written snapshot. rooms go in grid
+    # order, which toController rebuilds, so a disk hit iterates its rooms the way the generated world did
+    def __store(self, key, controller):
+        if self.directory is None:
+            return
+        handle, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(handle)
+        try:
+            writeSnapshot(controller, temporaryPath, controller.grid.rooms)
+            os.replace(temporaryPath, self.path(key))
+        except BaseException:
+            os.unlink(temporaryPath)
+            raise
@@ -0,0 +1,163 @@
+import json
+import time
+
+# Optional instrumentation for RoomController.generateRooms. Set controller.profiler (or pass profiler=
+# to RoomController) and the next generation runs with its collaborators wrapped: frontier checks, grid
+# placement, room creation, addRoomConnection and the work queue are counted and timed per phase, the
+# queue and frontier sizes are sampled every sampleEvery rooms, and dead ends and re-enqueues are counted.
+# Wrapping happens on the instances for one run only, so with no profiler the generation loop is exactly
+# the uninstrumented code. Phases nest (addRoomConnection includes grid.place and frontier.occupy), so
+# their times overlap rather than add up.
+
+class PhaseStats():
+    __slots__ = ("calls", "seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+
+class GenerationProfiler():
+    def __init__(self, sampleEvery=1000):
+        self.sampleEvery = sampleEvery
+        self.reset()
+
+    def reset(self):
+        self.phases = {}
+        self.counters = {"enqueues": 0, "reenqueues": 0, "dequeues": 0, "exhaustedDequeues": 0}
+        self.samples = []
+        self.rooms = 0
+        self.deadEnds = 0
+        self.junctions = 0
+        self.elapsed = 0.0
+        self.controller = None
+        self.queue = None
+        self.patched = []
+        self.enqueued = set()
+        self.startedAt = None
+
+    # wraps function so every call is counted and timed under phase
+    def timed(self, phase, function):
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+        clock = time.perf_counter
+
+        def wrapper(*arguments):
+            start = clock()
+            result = function(*arguments)
+            stats.seconds += clock() - start
+            stats.calls += 1
+            return result
+        return wrapper
+
+    # swaps an instance's method for a timed wrapper until detach
+    def instrument(self, owner, name, phase, wrap=None):
+        original = getattr(owner, name)
+        function = wrap(original) if wrap is not None else original
+        setattr(owner, name, self.timed(phase, function))
+        self.patched.append((owner, name))
+
+    # called by generateRooms once the map has been reset, so the fresh frontier and grid get wrapped
+    def attach(self, controller, queue):
+        self.reset()
+        self.controller = controller
+        self.queue = queue
+        self.instrument(controller.frontier, "eligibleDirections", "frontier.eligibleDirections", self.__countExhausted)
+        self.instrument(controller.frontier, "hasEligibleDirection", "frontier.hasEligibleDirection")
+        self.instrument(controller.frontier, "occupy", "frontier.occupy")
+        self.instrument(controller.grid, "place", "grid.place")
+        self.instrument(controller.pathfinder, "invalidate", "pathfinder.invalidate")
+        self.instrument(controller, "addRoomConnection", "addRoomConnection", self.__sampleAfter)
+        # weighted strategies keep open cells instead of a work queue; those are only sampled
+        if hasattr(queue, "enqueue"):
+            self.instrument(queue, "enqueue", "queue.enqueue", self.__countEnqueue)
+            self.instrument(queue, "dequeue", "queue.dequeue", self.__countDequeue)
+        self.startedAt = time.perf_counter()
+
+    # room constructor used by generateRooms while attached
+    def roomFactory(self, roomClass):
+        return self.timed("createRoom", roomClass)
+
+    def detach(self):
+        self.elapsed = time.perf_counter() - self.startedAt
+        for owner, name in reversed(self.patched):
+            delattr(owner, name)
+        self.patched = []
+        controller = self.controller
+        self.rooms = len(controller.rooms)
+        self.deadEnds = len(controller.deadEnds())
+        self.junctions = len(controller.junctions())
+        self.__sample()
+        self.enqueued = set()
+        self.queue = None
+
+    def report(self):
+        return {
+            "rooms": self.rooms,
+            "elapsed": self.elapsed,
+            "roomsPerSecond": self.rooms / self.elapsed if self.elapsed else 0.0,
+            "deadEnds": self.deadEnds,
+            "junctions": self.junctions,
+            "counters": dict(self.counters),
+            "phases": {phase: {"calls": stats.calls, "seconds": stats.seconds}
+                       for phase, stats in sorted(self.phases.items(), key=lambda item: -item[1].seconds)},
+            # [rooms placed, rooms queued, frontier candidate cells]
+            "frontier": [list(sample) for sample in self.samples],
+        }
+
+    def writeReport(self, fp):
+        json.dump(self.report(), fp, indent=2)
+
+    def formatReport(self):
+        report = self.report()
+        lines = [f"{report['rooms']} rooms in {report['elapsed']:.3f}s ({report['roomsPerSecond']:.0f} rooms/s),"
+                 f" {report['deadEnds']} dead ends, {report['junctions']} junctions"]
+        for phase, stats in report["phases"].items():
+            share = stats["seconds"] / report["elapsed"] * 100 if report["elapsed"] else 0.0
+            lines.append(f"  {phase:<30} {stats['calls']:>10} calls {stats['seconds']:8.3f}s {share:5.1f}%")
+        for name, count in report["counters"].items():
+            lines.append(f"  {name:<30} {count:>10}")
+        return "\n".join(lines)
+
+    def __sample(self):
+        self.samples.append((len(self.controller.rooms), len(self.queue), len(self.controller.frontier)))
+
+    def __sampleAfter(self, function):
+        def wrapper(*arguments):
+            result = function(*arguments)
+            if len(self.controller.rooms) % self.sampleEvery == 0:
+                self.__sample()
+            return result
+        return wrapper
+
+    def __countExhausted(self, function):
+        counters = self.counters
+
+        def wrapper(key):
+            directions = function(key)
+            if not directions:
+                counters["exhaustedDequeues"] += 1
+            return directions
+        return wrapper
+
+    def __countEnqueue(self, function):
+        counters = self.counters
+        enqueued = self.enqueued
+
+        def wrapper(value):
+            counters["enqueues"] += 1
+            if value in enqueued:
+                counters["reenqueues"] += 1
+            else:
+                enqueued.add(value)
+            return function(value)
+        return wrapper
+
+    def __countDequeue(self, function):
+        counters = self.counters
+
+        def wrapper():
+            counters["dequeues"] += 1
+            return function()
+        return wrapper
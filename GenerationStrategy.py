@@ -0,0 +1,260 @@
+from CardinalDirection import CardinalDirection, DEGREE_TABLE
+from GridPosition import NORTH_KEY_DELTA, SOUTH_KEY_DELTA, EAST_KEY_DELTA, WEST_KEY_DELTA
+from WorkQueue import FIFOQueue
+from abc import ABC, abstractmethod
+from heapq import nlargest
+from itertools import compress, repeat, starmap
+from math import log
+from operator import sub, truediv
+
+# How generateRooms grows a map from the spawn room. A strategy has two methods:
+#
+#   newQueue(controller)                              the work container grow fills and the profiler samples
+#   grow(controller, rng, strict, queue, createRoom)  adds rooms until controller.roomLimit, drawing only from rng
+#
+# QueueStrategy is the original policy and the default: take the next room off a work queue and branch out of
+# it in a uniformly random eligible direction.
+#
+# WeightedStrategy subclasses shape the map instead. They keep every open cell (an empty cell with exactly one
+# occupied neighbor, its parent) together with per-room features, and grow in rounds. Each round scores all
+# open cells at once with map/translate over the feature columns:
+#
+#   distances     steps from spawn the new room would be at
+#   crowding      occupied cells among the 8 around the open cell, its parent included
+#   parentExits   exits the parent has now
+#   branchDepths  junctions (rooms with 3 or more exits) the parent's path from spawn turns off at
+#
+# and then draws batchFraction of them by weighted sampling without replacement (Efraimidis-Spirakis, as in
+# RewardPlacer). Picks that an earlier pick in the same round closed are skipped. Smaller fractions follow
+# the weights more closely and cost more rounds. Weighted strategies never place two rooms on one cell.
+
+
+# raised by generateRooms(strict=True) when the map can't grow to roomLimit
+class GenerationExhausted(Exception):
+    pass
+
+
+# direction from a parent cell to the open cell at key delta from it
+DELTA_DIRECTIONS = {
+    NORTH_KEY_DELTA: CardinalDirection.NORTH,
+    SOUTH_KEY_DELTA: CardinalDirection.SOUTH,
+    EAST_KEY_DELTA: CardinalDirection.EAST,
+    WEST_KEY_DELTA: CardinalDirection.WEST,
+}
+NEIGHBOR_DELTAS = tuple(DELTA_DIRECTIONS)
+SURROUNDING_DELTAS = NEIGHBOR_DELTAS + tuple(vertical + horizontal for vertical in (NORTH_KEY_DELTA, SOUTH_KEY_DELTA)
+                                             for horizontal in (EAST_KEY_DELTA, WEST_KEY_DELTA))
+
+
+class GenerationStrategy(ABC):
+    name = None
+
+    # what the maps this strategy grows depend on besides seed and size; GenerationCache keys worlds by it.
+    # subclasses with their own weights or parameters need their own name or parameters
+    def cacheKey(self):
+        return (self.name,) + self.parameters()
+
+    def parameters(self):
+        return ()
+
+    @abstractmethod
+    def newQueue(self, controller):
+        pass
+
+    @abstractmethod
+    def grow(self, controller, rng, strict, queue, createRoom):
+        pass
+
+    def exhausted(self, controller, strict):
+        if strict:
+            raise GenerationExhausted(f"no eligible rooms left after {len(controller.rooms)} of {controller.roomLimit}")
+        print("Somehow there are no valid rooms in the queue")
+
+
+# the original generator, breadth first off a FIFOQueue. GENERATOR_VERSION tracks its output
+class QueueStrategy(GenerationStrategy):
+    name = "queue"
+
+    def newQueue(self, controller):
+        return FIFOQueue()
+
+    def grow(self, controller, rng, strict, roomQueue, createRoom):
+        roomQueue.enqueue(controller.spawnRoom)
+        # the frontier answers eligibility from its neighbor counts and generated rooms carry packed
+        # GridPosition keys, so no positions are built or string-hashed per check
+        eligibleDirections = controller.frontier.eligibleDirections
+        hasEligibleDirection = controller.frontier.hasEligibleDirection
+        rooms = controller.rooms
+        roomLimit = controller.roomLimit
+
+        while len(rooms) < roomLimit:
+            if len(roomQueue) == 0:
+                self.exhausted(controller, strict)
+                return
+            oldRoom = roomQueue.dequeue()
+            oldKey = oldRoom.position.key
+
+            # rooms that stopped being eligible while queued are dropped without drawing from the rng
+            possibleDirections = eligibleDirections(oldKey)
+            if len(possibleDirections) > 0:
+                newRoom = createRoom(f"Room {len(rooms)}")
+                newDirection = rng.choice(possibleDirections)
+                controller.addRoomConnection(newRoom, oldRoom, newDirection)
+                if hasEligibleDirection(newRoom.position.key):
+                    roomQueue.enqueue(newRoom)
+                if hasEligibleDirection(oldKey):
+                    roomQueue.enqueue(oldRoom)
+
+
+# open cells and the per-room feature columns a WeightedStrategy scores them from. rooms are numbered in
+# the order they were placed
+class OpenCells():
+    def __init__(self, controller):
+        self.controller = controller
+        self.rooms = []
+        self.keys = []
+        self.depths = []
+        self.branchDepths = []
+        self.exitMasks = bytearray()
+        self.occupied = set()
+        # open cell key -> parent room number
+        self.parents = {}
+        # cell key -> occupied cells among the 8 around it
+        self.crowding = {}
+
+    def __len__(self):
+        return len(self.parents)
+
+    def add(self, room, parent=None):
+        index = len(self.rooms)
+        key = room.position.key
+        self.rooms.append(room)
+        self.keys.append(key)
+        self.exitMasks.append(room.exits)
+        if parent is None:
+            self.depths.append(0)
+            self.branchDepths.append(0)
+        else:
+            parentExits = self.rooms[parent].exits
+            self.exitMasks[parent] = parentExits
+            self.depths.append(self.depths[parent] + 1)
+            self.branchDepths.append(self.branchDepths[parent] + (DEGREE_TABLE[parentExits] >= 3))
+        self.occupied.add(key)
+        crowding = self.crowding
+        for delta in SURROUNDING_DELTAS:
+            crowding[key + delta] = crowding.get(key + delta, 0) + 1
+
+        parents = self.parents
+        parents.pop(key, None)
+        neighborCounts = self.controller.frontier.neighborCounts
+        for delta in NEIGHBOR_DELTAS:
+            neighbor = key + delta
+            # a count of 1 right after this placement means this room is the only occupied neighbor
+            if neighborCounts.get(neighbor) == 1 and neighbor not in self.occupied:
+                parents[neighbor] = index
+            else:
+                parents.pop(neighbor, None)
+
+
+class WeightedStrategy(GenerationStrategy):
+    name = "weighted"
+
+    def __init__(self, batchFraction=0.1):
+        self.batchFraction = batchFraction
+
+    def parameters(self):
+        return (self.batchFraction,)
+
+    def newQueue(self, controller):
+        return OpenCells(controller)
+
+    # one weight per open cell, from the feature columns (equal-length sequences). weights must not be
+    # negative; cells weighted 0 are never picked. uniform by default
+    def weights(self, distances, crowding, parentExits, branchDepths):
+        return [1.0] * len(distances)
+
+    def grow(self, controller, rng, strict, cells, createRoom):
+        cells.add(controller.spawnRoom)
+        rooms = controller.rooms
+        roomLimit = controller.roomLimit
+        addRoomConnection = controller.addRoomConnection
+        random = rng.random
+
+        while len(rooms) < roomLimit:
+            keys = list(cells.parents)
+            parents = list(cells.parents.values())
+            weights = self.weights(
+                list(map((1).__add__, map(cells.depths.__getitem__, parents))),
+                list(map(cells.crowding.__getitem__, keys)),
+                bytes(map(cells.exitMasks.__getitem__, parents)).translate(DEGREE_TABLE),
+                list(map(cells.branchDepths.__getitem__, parents)))
+            candidates = list(compress(range(len(keys)), weights))
+            if not candidates:
+                self.exhausted(controller, strict)
+                return
+            count = min(max(1, int(len(candidates) * self.batchFraction)), roomLimit - len(rooms))
+            # log(u) / weight orders the same as u ** (1 / weight), without overflowing on small weights
+            uniforms = map(sub, repeat(1.0), starmap(random, repeat((), len(candidates))))
+            sortKeys = map(truediv, map(log, uniforms), map(weights.__getitem__, candidates))
+            for _, candidate in nlargest(count, zip(sortKeys, candidates)):
+                key = keys[candidate]
+                parent = cells.parents.get(key)
+                # an earlier pick this round closed the cell (or gave it another parent)
+                if parent != parents[candidate]:
+                    continue
+                newRoom = createRoom(f"Room {len(rooms)}")
+                addRoomConnection(newRoom, cells.rooms[parent], DELTA_DIRECTIONS[key - cells.keys[parent]])
+                cells.add(newRoom, parent)
+
+
+# long corridors: extends dead ends over branching out of corridors and junctions, away from other rooms
+class CorridorStrategy(WeightedStrategy):
+    name = "corridor"
+
+    def __init__(self, straightness=16.0, batchFraction=0.1):
+        WeightedStrategy.__init__(self, batchFraction)
+        self.straightness = straightness
+        # indexed by the parent's exit count; the spawn room (no exits yet) counts as a dead end
+        self.exitFactors = [straightness, straightness, 1.0, 1.0, 1.0]
+        self.crowdingPenalties = [max(count * count, 1) for count in range(9)]
+
+    def parameters(self):
+        return (self.straightness, self.batchFraction)
+
+    def weights(self, distances, crowding, parentExits, branchDepths):
+        return list(map(truediv, map(self.exitFactors.__getitem__, parentExits),
+                        map(self.crowdingPenalties.__getitem__, crowding)))
+
+
+# bushy hubs: branches out of rooms that already branch, favoring the ones few junctions from spawn
+class HubStrategy(WeightedStrategy):
+    name = "hub"
+
+    def __init__(self, bushiness=4.0, batchFraction=0.1):
+        WeightedStrategy.__init__(self, batchFraction)
+        self.bushiness = bushiness
+        self.exitFactors = [1.0, 1.0, bushiness, bushiness * bushiness, 0.0]
+
+    def parameters(self):
+        return (self.bushiness, self.batchFraction)
+
+    def weights(self, distances, crowding, parentExits, branchDepths):
+        return list(map(truediv, map(self.exitFactors.__getitem__, parentExits), map((1).__add__, branchDepths)))
+
+
+# grows away from spawn: open cells weigh distance ** bias
+class OutwardStrategy(WeightedStrategy):
+    name = "outward"
+
+    def __init__(self, bias=2.0, batchFraction=0.1):
+        WeightedStrategy.__init__(self, batchFraction)
+        self.bias = bias
+
+    def parameters(self):
+        return (self.bias, self.batchFraction)
+
+    def weights(self, distances, crowding, parentExits, branchDepths):
+        return list(map(pow, distances, repeat(float(self.bias))))
+
+
+DEFAULT_STRATEGY = QueueStrategy()
@@ -0,0 +1,128 @@
+import math
+import operator
+from Position import Position, PACK_SHIFT, PACK_OFFSET
+
+# x and y are packed into one non-negative int: 32 bits each, offset so negative coordinates fit (the
+# layout lives in Position, whose hash uses it too).
+# neighbors are a constant add away, so grid code can walk cells without building positions.
+PACK_MASK = (1 << PACK_SHIFT) - 1
+
+NORTH_KEY_DELTA = 1
+SOUTH_KEY_DELTA = -1
+EAST_KEY_DELTA = 1 << PACK_SHIFT
+WEST_KEY_DELTA = -(1 << PACK_SHIFT)
+
+# most cells GridPosition.at and fromKey keep shared instances for; past this the table starts over
+INTERN_LIMIT = 1 << 16
+
+
+def packCoordinates(x, y):
+    return ((x + PACK_OFFSET) << PACK_SHIFT) | (y + PACK_OFFSET)
+
+
+def unpackCoordinates(key):
+    return ((key >> PACK_SHIFT) - PACK_OFFSET, (key & PACK_MASK) - PACK_OFFSET)
+
+
+# Integer-only, slotted counterpart of Position for grid cells. Hashes to its packed key, which
+# Position also does for integer coordinates, so the two compare and hash interchangeably.
+# Treat instances as immutable: GridPosition.at hands out shared, interned instances. The intern table
+# is bounded by INTERN_LIMIT, so two calls for one cell give equal positions, not always the same one.
+class GridPosition():
+    __slots__ = ("x", "y", "key")
+
+    _interned = {}
+
+    @staticmethod
+    def zero():
+        return GridPosition.at(0, 0)
+
+    # returns the shared instance for a cell, creating it on first use
+    @staticmethod
+    def at(x, y):
+        key = packCoordinates(x, y)
+        position = GridPosition._interned.get(key)
+        if position is None:
+            position = GridPosition(x, y)
+            GridPosition.__intern(key, position)
+        return position
+
+    @staticmethod
+    def fromKey(key):
+        position = GridPosition._interned.get(key)
+        if position is None:
+            x, y = unpackCoordinates(key)
+            position = GridPosition(x, y)
+            GridPosition.__intern(key, position)
+        return position
+
+    # walking an unbounded world would otherwise keep every cell ever visited alive
+    @staticmethod
+    def __intern(key, position):
+        interned = GridPosition._interned
+        if len(interned) >= INTERN_LIMIT:
+            interned.clear()
+        interned[key] = position
+
+    @staticmethod
+    def clearInterned():
+        GridPosition._interned.clear()
+
+    def __init__(self, x, y):
+        self.x = operator.index(x)
+        self.y = operator.index(y)
+        self.key = ((self.x + PACK_OFFSET) << PACK_SHIFT) | (self.y + PACK_OFFSET)
+
+    def __add__(self, other):
+        return GridPosition(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other):
+        return GridPosition(self.x - other.x, self.y - other.y)
+
+    def __mul__(self, other):
+        return GridPosition(self.x * other.x, self.y * other.y)
+
+    # true division leaves the grid, so it falls back to the float-capable Position
+    def __truediv__(self, other):
+        return Position(self.x / other.x, self.y / other.y)
+
+    def __floordiv__(self, other):
+        return GridPosition(self.x // other.x, self.y // other.y)
+
+    def __eq__(self, other):
+        return self.x == other.x and self.y == other.y
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return self.key
+
+    def offset(self, dx, dy):
+        return GridPosition(self.x + dx, self.y + dy)
+
+    def nsewOne(self):
+        fromKey = GridPosition.fromKey
+        key = self.key
+        return (fromKey(key + NORTH_KEY_DELTA), fromKey(key + SOUTH_KEY_DELTA), fromKey(key + EAST_KEY_DELTA), fromKey(key + WEST_KEY_DELTA))
+
+    def __distanceToNoRoot(self, toPosition):
+        return (self.x - toPosition.x) * (self.x - toPosition.x) + (self.y - toPosition.y) * (self.y - toPosition.y)
+
+    def distanceTo(self, toPosition):
+        return math.sqrt(self.__distanceToNoRoot(toPosition))
+
+    def distanceIsGreaterThan(self, toPosition, comparedValue):
+        return self.__distanceToNoRoot(toPosition) > (comparedValue * comparedValue)
+
+    def __repr__(self):
+        return f"({repr(self.x)}, {repr(self.y)})"
+
+    def __str__(self):
+        return f"({str(self.x)}, {str(self.y)})"
+
+    def toArray(self):
+        return [self.x, self.y]
+
+    def toPosition(self):
+        return Position(self.x, self.y)
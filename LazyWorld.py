@@ -0,0 +1,221 @@
+from CardinalDirection import CardinalDirection, EXIT_NORTH, EXIT_SOUTH, EXIT_EAST, EXIT_WEST
+from ChunkedWorldGenerator import ChunkedWorldGenerator, directionBetween, growChunk
+from GridPosition import GridPosition
+from Room import Room
+from RoomIdAllocator import RoomIdAllocator, SEEDED
+from RoomOccupancy import MOVE_ATTRIBUTES
+from collections import OrderedDict
+
+# An unbounded world that only exists around its players. The world is ChunkedWorldGenerator's chunk
+# layout with no edge: every chunk links toward chunk (0, 0), whose hub is the spawn room at (0, 0).
+# A chunk is grown from its own seed the first time something needs it, so creating a LazyWorld does no
+# generation at all, and evicting a chunk just drops its rooms: growing it again from the same seed
+# gives back the same rooms, positions, exits and ids.
+#
+# Loaded chunks sit in an LRU. Every time a player enters a room, the chunks within loadRadius of it are
+# loaded, pinned and touched, then the least recently touched chunks beyond maxLoadedChunks are evicted.
+# Chunks within loadRadius of any player stay pinned, so a player's seams are never cut under it.
+
+class WorldChunk():
+    def __init__(self, key, spec, rooms, roomsByCell):
+        self.key = key
+        self.spec = spec
+        self.rooms = rooms
+        # local cell index (y * chunkSize + x) -> Room
+        self.roomsByCell = roomsByCell
+        # players standing in the chunk
+        self.population = 0
+        # players whose loadRadius covers the chunk; pinned chunks are never evicted
+        self.pins = 0
+
+
+CONNECT = {
+    CardinalDirection.NORTH: Room.connectNorthTo,
+    CardinalDirection.SOUTH: Room.connectSouthTo,
+    CardinalDirection.EAST: Room.connectEastTo,
+    CardinalDirection.WEST: Room.connectWestTo,
+}
+
+
+class LazyWorld():
+    def __init__(self, seed, chunkSize=32, roomsPerChunk=400, maxLoadedChunks=64, loadRadius=1):
+        self.generator = ChunkedWorldGenerator(seed, chunkSize, roomsPerChunk)
+        self.seed = seed
+        self.chunkSize = chunkSize
+        self.roomsPerChunk = roomsPerChunk
+        self.maxLoadedChunks = maxLoadedChunks
+        self.loadRadius = loadRadius
+        self.chunks = OrderedDict()
+        self.players = set()
+        # world coordinates put the spawn chunk's hub at (0, 0)
+        self.originX = self.generator.hubOffset("column", 0)
+        self.originY = self.generator.hubOffset("row", 0)
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return sum(len(chunk.rooms) for chunk in self.chunks.values())
+
+    @property
+    def spawnRoom(self):
+        return self.chunk(0, 0).rooms[0]
+
+    def chunkKeyAt(self, x, y):
+        return ((x + self.originX) // self.chunkSize, (y + self.originY) // self.chunkSize)
+
+    # the loaded chunk, grown on first use. counts as a touch for the LRU
+    def chunk(self, chunkX, chunkY):
+        key = (chunkX, chunkY)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.__load(key)
+        else:
+            self.chunks.move_to_end(key)
+        return chunk
+
+    def roomAt(self, x, y):
+        chunkX, chunkY = self.chunkKeyAt(x, y)
+        chunk = self.chunk(chunkX, chunkY)
+        localX = x + self.originX - chunkX * self.chunkSize
+        localY = y + self.originY - chunkY * self.chunkSize
+        return chunk.roomsByCell.get(localY * self.chunkSize + localX)
+
+    def isLoaded(self, chunkX, chunkY):
+        return (chunkX, chunkY) in self.chunks
+
+    def place(self, player, room=None):
+        if room is None:
+            room = self.spawnRoom
+        if player.room is not None:
+            self.__leave(player)
+        self.__enter(player, room)
+        self.players.add(player)
+
+    def remove(self, player):
+        if player not in self.players:
+            return False
+        self.__leave(player)
+        player.room = None
+        self.players.discard(player)
+        return True
+
+    # moves player through one exit and loads whatever it now needs. returns the new room or None
+    def move(self, player, direction):
+        if player not in self.players:
+            raise ValueError("player has not been placed in this world")
+        if direction not in MOVE_ATTRIBUTES:
+            raise ValueError(f"{direction!r} is not a direction")
+        nextRoom = getattr(player.room, MOVE_ATTRIBUTES[direction])
+        if nextRoom is None:
+            return None
+        self.__leave(player)
+        self.__enter(player, nextRoom)
+        return nextRoom
+
+    # loads and touches the chunks around (x, y), then trims the LRU
+    def ensureAround(self, x, y):
+        active = self.__area(x, y)
+        for chunkX, chunkY in active:
+            self.chunk(chunkX, chunkY)
+        # the player's own chunk is the most recently used
+        self.chunks.move_to_end(self.chunkKeyAt(x, y))
+        self.evictIdle(active)
+
+    def evictIdle(self, keep=()):
+        if len(self.chunks) <= self.maxLoadedChunks:
+            return
+        for key in list(self.chunks):
+            if len(self.chunks) <= self.maxLoadedChunks:
+                break
+            if key in keep or self.chunks[key].pins:
+                continue
+            self.evict(key)
+
+    def evict(self, key):
+        chunk = self.chunks.pop(key)
+        chunkX, chunkY = key
+        ports = chunk.spec[5]
+        # cut the seams to loaded neighbors so nothing loaded points into the dropped rooms
+        for isOpen, exit, neighborKey in ((ports[0], EXIT_SOUTH, (chunkX, chunkY + 1)), (ports[1], EXIT_NORTH, (chunkX, chunkY - 1)),
+                                          (ports[2], EXIT_WEST, (chunkX + 1, chunkY)), (ports[3], EXIT_EAST, (chunkX - 1, chunkY))):
+            neighbor = self.chunks.get(neighborKey) if isOpen else None
+            if neighbor is not None:
+                self.__seamRoom(neighbor, exit).setExit(exit, None)
+        self.evictions += 1
+
+    def __enter(self, player, room):
+        room.players.add(player)
+        player.room = room
+        player.position = room.position
+        for chunkX, chunkY in self.__area(room.position.x, room.position.y):
+            self.chunk(chunkX, chunkY).pins += 1
+        self.chunks[self.chunkKeyAt(room.position.x, room.position.y)].population += 1
+        self.ensureAround(room.position.x, room.position.y)
+
+    def __leave(self, player):
+        room = player.room
+        room.players.discard(player)
+        self.chunks[self.chunkKeyAt(room.position.x, room.position.y)].population -= 1
+        # pinned chunks are still loaded
+        for key in self.__area(room.position.x, room.position.y):
+            self.chunks[key].pins -= 1
+
+    # keys of the chunks within loadRadius of (x, y)
+    def __area(self, x, y):
+        centerX, centerY = self.chunkKeyAt(x, y)
+        radius = self.loadRadius
+        return {(chunkX, chunkY) for chunkY in range(centerY - radius, centerY + radius + 1)
+                for chunkX in range(centerX - radius, centerX + radius + 1)}
+
+    def __load(self, key):
+        chunkX, chunkY = key
+        chunkSize = self.chunkSize
+        spec = self.generator.chunkSpec(chunkX, chunkY, 0, None, self.roomsPerChunk)
+        cells = growChunk(spec)
+        ids = RoomIdAllocator(SEEDED, (self.seed, chunkX, chunkY))
+        baseX = chunkX * chunkSize - self.originX
+        baseY = chunkY * chunkSize - self.originY
+        rooms = []
+        roomsByCell = {}
+        for cell in range(0, len(cells), 3):
+            localX = cells[cell]
+            localY = cells[cell + 1]
+            parent = cells[cell + 2]
+            name = "Spawn Area" if key == (0, 0) and cell == 0 else f"Room {chunkX},{chunkY}.{cell // 3}"
+            room = Room(name, GridPosition(baseX + localX, baseY + localY), id=ids.allocate())
+            if parent >= 0:
+                parentRoom = rooms[parent]
+                CONNECT[directionBetween(parentRoom.position, room.position)](parentRoom, room)
+            rooms.append(room)
+            roomsByCell[localY * chunkSize + localX] = room
+        chunk = WorldChunk(key, spec, rooms, roomsByCell)
+        self.chunks[key] = chunk
+        self.loads += 1
+
+        ports = spec[5]
+        for isOpen, exit, neighborKey in ((ports[0], EXIT_NORTH, (chunkX, chunkY + 1)), (ports[1], EXIT_SOUTH, (chunkX, chunkY - 1)),
+                                          (ports[2], EXIT_EAST, (chunkX + 1, chunkY)), (ports[3], EXIT_WEST, (chunkX - 1, chunkY))):
+            neighbor = self.chunks.get(neighborKey) if isOpen else None
+            if neighbor is not None:
+                room = self.__seamRoom(chunk, exit)
+                other = self.__seamRoom(neighbor, OPPOSITE[exit])
+                room.setExit(exit, other)
+                other.setExit(OPPOSITE[exit], room)
+        return chunk
+
+    # the spine end on the given side of a chunk
+    def __seamRoom(self, chunk, exit):
+        chunkSize = self.chunkSize
+        hubX, hubY = chunk.spec[3], chunk.spec[4]
+        if exit == EXIT_NORTH:
+            cell = (chunkSize - 1) * chunkSize + hubX
+        elif exit == EXIT_SOUTH:
+            cell = hubX
+        elif exit == EXIT_EAST:
+            cell = hubY * chunkSize + chunkSize - 1
+        else:
+            cell = hubY * chunkSize
+        return chunk.roomsByCell[cell]
+
+
+OPPOSITE = {EXIT_NORTH: EXIT_SOUTH, EXIT_SOUTH: EXIT_NORTH, EXIT_EAST: EXIT_WEST, EXIT_WEST: EXIT_EAST}
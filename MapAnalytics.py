@@ -0,0 +1,140 @@
+from CardinalDirection import DEGREE_TABLE
+from array import array
+
+# Balancing metrics over a map, computed on a flat export of the room graph instead of Room objects.
+# Rooms are numbered in creation order (the grid's room table, so the spawn room is 0) and exported as
+#
+#   xs, ys      array("l") of positions
+#   exitMasks   bytes of exit masks (N=1, S=2, E=4, W=8)
+#   offsets     array("l") of n + 1 CSR row offsets; room i's neighbors are targets[offsets[i]:offsets[i + 1]]
+#   targets     array("l") of neighbor indexes, in north, south, east, west order
+#
+# Counting work runs over whole byte strings at C speed (translate/count), and the walks (distances,
+# diameter, corridors) are index loops over the arrays, with no attribute lookups on rooms.
+
+
+class MapAnalytics():
+    def __init__(self, controller):
+        rooms = list(controller.grid.rooms)
+        indexes = {room: index for index, room in enumerate(rooms)}
+        self.rooms = rooms
+        self.ids = [room.id for room in rooms]
+        self.xs = array("l", [room.position.x for room in rooms])
+        self.ys = array("l", [room.position.y for room in rooms])
+        self.exitMasks = bytes([room.exits for room in rooms])
+        offsets = array("l", [0])
+        targets = array("l")
+        for room in rooms:
+            for neighbor in (room.north, room.south, room.east, room.west):
+                if neighbor is not None:
+                    targets.append(indexes[neighbor])
+            offsets.append(len(targets))
+        self.offsets = offsets
+        self.targets = targets
+        self.spawnIndex = indexes[controller.spawnRoom] if controller.spawnRoom is not None else None
+        self.degrees = self.exitMasks.translate(DEGREE_TABLE)
+
+    def __len__(self):
+        return len(self.rooms)
+
+    # rooms with exactly count exits
+    def roomsWithExitCount(self, count):
+        return self.degrees.count(count)
+
+    def deadEndRatio(self):
+        return self.degrees.count(1) / len(self.rooms) if self.rooms else 0.0
+
+    # mean number of exits per room
+    def branchingFactor(self):
+        return len(self.targets) / len(self.rooms) if self.rooms else 0.0
+
+    # rooms in each maximal run of two-exit rooms, i.e. each stretch of corridor between junctions and dead ends
+    def corridorLengths(self):
+        degrees = self.degrees
+        offsets = self.offsets
+        targets = self.targets
+        seen = bytearray(len(degrees))
+        lengths = []
+        start = degrees.find(2)
+        while start >= 0:
+            if not seen[start]:
+                seen[start] = 1
+                stack = [start]
+                length = 0
+                while stack:
+                    room = stack.pop()
+                    length += 1
+                    for edge in range(offsets[room], offsets[room + 1]):
+                        neighbor = targets[edge]
+                        if degrees[neighbor] == 2 and not seen[neighbor]:
+                            seen[neighbor] = 1
+                            stack.append(neighbor)
+                lengths.append(length)
+            start = degrees.find(2, start + 1)
+        return lengths
+
+    # breadth-first steps from source (the spawn room by default) to every room, -1 where unreachable.
+    # all -1 when there is no spawn room
+    def distancesFrom(self, source=None):
+        if source is None:
+            source = self.spawnIndex
+        offsets = self.offsets
+        targets = self.targets
+        distances = array("l", [-1]) * len(self.rooms)
+        if source is None:
+            return distances
+        distances[source] = 0
+        level = [source]
+        distance = 0
+        # one frontier level at a time, so every room in a level gets the same distance
+        while level:
+            distance += 1
+            nextLevel = []
+            for room in level:
+                for edge in range(offsets[room], offsets[room + 1]):
+                    neighbor = targets[edge]
+                    if distances[neighbor] < 0:
+                        distances[neighbor] = distance
+                        nextLevel.append(neighbor)
+            level = nextLevel
+        return distances
+
+    # how many rooms are at each distance from the spawn room
+    def distanceHistogram(self, distances=None):
+        if distances is None:
+            distances = self.distancesFrom()
+        histogram = [0] * (max(distances, default=-1) + 1)
+        for distance in distances:
+            if distance >= 0:
+                histogram[distance] += 1
+        return histogram
+
+    # longest shortest path, by a double sweep from the spawn room: exact on trees, which generated maps
+    # are, and a lower bound on maps with loops
+    def diameter(self):
+        if self.spawnIndex is None:
+            return 0
+        distances = self.distancesFrom()
+        farthest = max(range(len(distances)), key=distances.__getitem__)
+        return max(self.distancesFrom(farthest))
+
+    def metrics(self):
+        roomCount = len(self.rooms)
+        distances = self.distancesFrom()
+        histogram = self.distanceHistogram(distances)
+        reachable = sum(histogram)
+        corridors = self.corridorLengths()
+        return {
+            "rooms": roomCount,
+            "branchingFactor": self.branchingFactor(),
+            "deadEndRatio": self.deadEndRatio(),
+            "junctionRatio": (self.degrees.count(3) + self.degrees.count(4)) / roomCount if roomCount else 0.0,
+            "corridors": len(corridors),
+            "meanCorridorLength": sum(corridors) / len(corridors) if corridors else 0.0,
+            "maxCorridorLength": max(corridors, default=0),
+            "diameter": self.diameter(),
+            "meanSpawnDistance": sum(distance * count for distance, count in enumerate(histogram)) / reachable if reachable else 0.0,
+            "maxSpawnDistance": max(len(histogram) - 1, 0),
+            "unreachable": roomCount - reachable,
+            "spawnDistanceHistogram": histogram,
+        }
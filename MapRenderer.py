@@ -0,0 +1,137 @@
+from CardinalDirection import EXIT_NORTH, EXIT_SOUTH, EXIT_EAST, EXIT_WEST, EXIT_GLYPHS
+import struct
+import sys
+import zlib
+
+# Text and raster rendering of a RoomController's map, north up. Everything is written to a file
+# handle row by row, so huge maps never have to exist as one string or image in memory.
+
+SPAWN_GLYPH = "O"
+EMPTY_GLYPH = " "
+
+EMPTY_COLOR = (0, 0, 0)
+ROOM_COLOR = (200, 200, 200)
+SPAWN_COLOR = (220, 60, 60)
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class MapRenderer():
+    def __init__(self, controller):
+        self.controller = controller
+
+    # (minX, minY, maxX, maxY) of the whole map, or of the square window around a center cell
+    def window(self, centerX=None, centerY=None, radius=None):
+        grid = self.controller.grid
+        if radius is None:
+            return grid.bounds()
+        return (centerX - radius, centerY - radius, centerX + radius, centerY + radius)
+
+    def windowAround(self, player, radius):
+        position = player.room.position if player.room is not None else player.position
+        return self.window(position.x, position.y, radius)
+
+    # (column, room) for every room in row y between minX and maxX, read straight off the grid's room table
+    def roomsInRow(self, y, minX, maxX):
+        grid = self.controller.grid
+        startX = max(minX, grid.originX)
+        endX = min(maxX, grid.originX + grid.width - 1)
+        if startX > endX or not grid.originY <= y < grid.originY + grid.height:
+            return
+        rooms = grid.rooms
+        start = grid.cellIndex(startX, y)
+        offset = startX - minX
+        for column, roomIndex in enumerate(grid.roomIndexes[start:start + endX - startX + 1]):
+            if roomIndex:
+                yield (offset + column, rooms[roomIndex - 1])
+
+    # yields each row of glyphs in the window, top row first. one buffer is reused for every row
+    def textRows(self, window=None):
+        minX, minY, maxX, maxY = window or self.window()
+        spawnRoom = self.controller.spawnRoom
+        emptyRow = [EMPTY_GLYPH] * (maxX - minX + 1)
+        row = list(emptyRow)
+        for y in range(maxY, minY - 1, -1):
+            row[:] = emptyRow
+            for column, room in self.roomsInRow(y, minX, maxX):
+                row[column] = SPAWN_GLYPH if room is spawnRoom else EXIT_GLYPHS[room.exitMask()]
+            yield "".join(row)
+
+    def renderText(self, fp=None, window=None):
+        fp = fp or sys.stdout
+        for row in self.textRows(window):
+            fp.write(row)
+            fp.write("\n")
+
+    def renderTextAround(self, player, radius, fp=None):
+        self.renderText(fp, self.windowAround(player, radius))
+
+    # yields raw RGB rows. every cell is a 3x3 tile (room in the middle, lit edges toward its exits)
+    # magnified by scale. the yielded buffers are reused, so write each row out before asking for the next
+    def pixelRows(self, window=None, scale=1):
+        minX, minY, maxX, maxY = window or self.window()
+        spawnRoom = self.controller.spawnRoom
+        width = maxX - minX + 1
+        step = 3 * scale
+        tile = 3 * step
+        emptyRow = bytes(EMPTY_COLOR) * (3 * scale * width)
+        roomColor = bytes(ROOM_COLOR) * scale
+        spawnColor = bytes(SPAWN_COLOR) * scale
+        top = bytearray(emptyRow)
+        middle = bytearray(emptyRow)
+        bottom = bytearray(emptyRow)
+        for y in range(maxY, minY - 1, -1):
+            top[:] = emptyRow
+            middle[:] = emptyRow
+            bottom[:] = emptyRow
+            for column, room in self.roomsInRow(y, minX, maxX):
+                color = spawnColor if room is spawnRoom else roomColor
+                mask = room.exitMask()
+                start = column * tile
+                middle[start + step:start + 2 * step] = color
+                if mask & EXIT_NORTH:
+                    top[start + step:start + 2 * step] = color
+                if mask & EXIT_SOUTH:
+                    bottom[start + step:start + 2 * step] = color
+                if mask & EXIT_WEST:
+                    middle[start:start + step] = color
+                if mask & EXIT_EAST:
+                    middle[start + 2 * step:start + tile] = color
+            for buffer in (top, middle, bottom):
+                for _ in range(scale):
+                    yield buffer
+
+    def imageSize(self, window=None, scale=1):
+        minX, minY, maxX, maxY = window or self.window()
+        return (3 * scale * (maxX - minX + 1), 3 * scale * (maxY - minY + 1))
+
+    # binary PPM (P6), written to a binary file handle
+    def writePPM(self, fp, window=None, scale=1):
+        width, height = self.imageSize(window, scale)
+        fp.write(f"P6\n{width} {height}\n255\n".encode("ascii"))
+        for row in self.pixelRows(window, scale):
+            fp.write(row)
+
+    # 8-bit RGB PNG, compressed and flushed in IDAT chunks as rows are produced
+    def writePNG(self, fp, window=None, scale=1, chunkSize=1 << 16):
+        width, height = self.imageSize(window, scale)
+        fp.write(PNG_SIGNATURE)
+        writePNGChunk(fp, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        compressor = zlib.compressobj()
+        pending = bytearray()
+        for row in self.pixelRows(window, scale):
+            # filter type 0 (none) before every scanline
+            pending += compressor.compress(b"\x00" + row)
+            if len(pending) >= chunkSize:
+                writePNGChunk(fp, b"IDAT", bytes(pending))
+                pending.clear()
+        pending += compressor.flush()
+        writePNGChunk(fp, b"IDAT", bytes(pending))
+        writePNGChunk(fp, b"IEND", b"")
+
+
+def writePNGChunk(fp, chunkType, data):
+    fp.write(struct.pack(">I", len(data)))
+    fp.write(chunkType)
+    fp.write(data)
+    fp.write(struct.pack(">I", zlib.crc32(chunkType + data) & 0xffffffff))
@@ -0,0 +1,221 @@
+from CardinalDirection import EXIT_NORTH, EXIT_SOUTH, EXIT_EAST, EXIT_WEST
+from GridPosition import GridPosition
+from Room import Room
+from RoomController import RoomController
+import json
+import mmap
+import re
+import struct
+
+# Compact binary snapshot of a RoomController. All integers are little-endian.
+#
+#   header   magic, version, flags, roomCount, spawnIndex, stringCount and the three section offsets
+#   records  roomCount fixed-width records: x, y, north, south, east, west, name, itemReward.
+#            exits are indexes into the record table and name/itemReward index the string table
+#            (itemReward is stored JSON-encoded); -1 means none
+#   ids      8 bytes per room when every id is an unsigned 64-bit int (FLAG_INT_IDS), 16 raw bytes per room
+#            when every id is a 32-digit hex string (FLAG_HEX_IDS), otherwise one string-table index per room
+#            (JSON-encoded with FLAG_JSON_IDS, so mixed int and string ids keep their types)
+#   strings  stringCount + 1 offsets into the utf-8 data that follows, then the data
+#
+# Names and rewards are interned, so repeated strings are stored once.
+
+MAGIC = b"RMAP"
+VERSION = 2
+# version 1 had no integer ids and is otherwise the same
+SUPPORTED_VERSIONS = (1, 2)
+FLAG_HEX_IDS = 1
+FLAG_INT_IDS = 2
+FLAG_JSON_IDS = 4
+
+HEADER = struct.Struct("<4sHHIIIQQQ")
+RECORD = struct.Struct("<iiiiiiii")
+STRING_ID = struct.Struct("<I")
+INT_ID = struct.Struct("<Q")
+STRING_OFFSETS = struct.Struct("<II")
+
+HEX_ID_SIZE = 16
+HEX_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+# rooms fixes the record order (every room of the controller, in any order); by default it is controller.rooms
+def encodeSnapshot(controller, rooms=None):
+    rooms = list(controller.rooms) if rooms is None else rooms
+    roomIndexes = {room: index for index, room in enumerate(rooms)}
+    strings = []
+    stringIndexes = {}
+
+    def intern(value):
+        index = stringIndexes.get(value)
+        if index is None:
+            index = len(strings)
+            stringIndexes[value] = index
+            strings.append(value)
+        return index
+
+    def exitIndex(room):
+        if room is None:
+            return -1
+        index = roomIndexes.get(room)
+        if index is None:
+            raise ValueError(f"{room.name} is linked to but not part of the controller")
+        return index
+
+    records = bytearray(RECORD.size * len(rooms))
+    for index, room in enumerate(rooms):
+        reward = -1 if room.itemReward is None else intern(json.dumps(room.itemReward))
+        RECORD.pack_into(records, index * RECORD.size, room.position.x, room.position.y,
+                         exitIndex(room.north), exitIndex(room.south), exitIndex(room.east), exitIndex(room.west),
+                         intern(room.name), reward)
+
+    flags = 0
+    if all(type(room.id) is int and 0 <= room.id < 1 << 64 for room in rooms):
+        flags |= FLAG_INT_IDS
+        ids = struct.pack(f"<{len(rooms)}Q", *(room.id for room in rooms))
+    elif all(isinstance(room.id, str) and HEX_ID_PATTERN.fullmatch(room.id) for room in rooms):
+        flags |= FLAG_HEX_IDS
+        ids = b"".join(bytes.fromhex(room.id) for room in rooms)
+    else:
+        flags |= FLAG_JSON_IDS
+        ids = b"".join(STRING_ID.pack(intern(json.dumps(room.id))) for room in rooms)
+
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = [0]
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    stringTable = struct.pack(f"<{len(offsets)}I", *offsets) + b"".join(encoded)
+
+    recordsOffset = HEADER.size
+    idsOffset = recordsOffset + len(records)
+    stringsOffset = idsOffset + len(ids)
+    header = HEADER.pack(MAGIC, VERSION, flags, len(rooms), roomIndexes[controller.spawnRoom], len(strings),
+                         recordsOffset, idsOffset, stringsOffset)
+    return b"".join((header, records, ids, stringTable))
+
+
+def writeSnapshot(controller, path, rooms=None):
+    with open(path, "wb") as fp:
+        fp.write(encodeSnapshot(controller, rooms))
+
+
+# A Room read out of a snapshot. Its exits hold record indexes until they are first followed,
+# so walking the map only materializes the rooms that are actually visited.
+class LazyRoom(Room):
+    __slots__ = ("_exits", "_snapshot", "_exitIndexes", "index")
+
+    def __init__(self, snapshot, index, name, position, exitIndexes):
+        self._exits = [None, None, None, None]
+        Room.__init__(self, name, position)
+        self._snapshot = snapshot
+        self._exitIndexes = exitIndexes
+        self.index = index
+        # slots 0-3 are north, south, east, west, the same order as the mask bits
+        self.exits = sum(1 << slot for slot in range(4) if exitIndexes[slot] >= 0)
+
+    def _exit(self, slot):
+        room = self._exits[slot]
+        if room is None and self._exitIndexes[slot] >= 0:
+            room = self._snapshot.room(self._exitIndexes[slot])
+            self._exits[slot] = room
+        return room
+
+    def _setExit(self, slot, room):
+        self._exits[slot] = room
+        if hasattr(self, "_exitIndexes"):
+            self._exitIndexes[slot] = -1
+
+    north = property(lambda self: self._exit(0), lambda self, room: self._setExit(0, room))
+    south = property(lambda self: self._exit(1), lambda self, room: self._setExit(1, room))
+    east = property(lambda self: self._exit(2), lambda self, room: self._setExit(2, room))
+    west = property(lambda self: self._exit(3), lambda self, room: self._setExit(3, room))
+
+
+# Read-only view over snapshot bytes, usually a memory-mapped file. Opening only parses the header;
+# rooms are decoded on first access and cached, so the same index always gives the same object.
+class MapSnapshot():
+    @staticmethod
+    def open(path):
+        with open(path, "rb") as fp:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return MapSnapshot(mapped)
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+        magic, version, flags, roomCount, spawnIndex, stringCount, recordsOffset, idsOffset, stringsOffset = HEADER.unpack_from(self.view, 0)
+        if magic != MAGIC:
+            raise ValueError("not a room map snapshot")
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"unsupported snapshot version {version}")
+        self.flags = flags
+        self.roomCount = roomCount
+        self.spawnIndex = spawnIndex
+        self.stringCount = stringCount
+        self.recordsOffset = recordsOffset
+        self.idsOffset = idsOffset
+        self.stringsOffset = stringsOffset
+        self.stringDataOffset = stringsOffset + 4 * (stringCount + 1)
+        self.rooms = {}
+
+    def __len__(self):
+        return self.roomCount
+
+    def close(self):
+        self.rooms = {}
+        self.view.release()
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+    def string(self, index):
+        start, end = STRING_OFFSETS.unpack_from(self.view, self.stringsOffset + 4 * index)
+        return str(self.view[self.stringDataOffset + start:self.stringDataOffset + end], "utf-8")
+
+    def roomId(self, index):
+        if self.flags & FLAG_INT_IDS:
+            return INT_ID.unpack_from(self.view, self.idsOffset + INT_ID.size * index)[0]
+        if self.flags & FLAG_HEX_IDS:
+            start = self.idsOffset + HEX_ID_SIZE * index
+            return self.view[start:start + HEX_ID_SIZE].hex()
+        roomId = self.string(STRING_ID.unpack_from(self.view, self.idsOffset + STRING_ID.size * index)[0])
+        return json.loads(roomId) if self.flags & FLAG_JSON_IDS else roomId
+
+    def room(self, index):
+        room = self.rooms.get(index)
+        if room is not None:
+            return room
+        if not 0 <= index < self.roomCount:
+            raise IndexError(index)
+        x, y, north, south, east, west, name, reward = RECORD.unpack_from(self.view, self.recordsOffset + RECORD.size * index)
+        room = LazyRoom(self, index, self.string(name), GridPosition(x, y), [north, south, east, west])
+        room.id = self.roomId(index)
+        if reward >= 0:
+            room.itemReward = json.loads(self.string(reward))
+        self.rooms[index] = room
+        return room
+
+    @property
+    def spawnRoom(self):
+        return self.room(self.spawnIndex)
+
+    def iterRooms(self):
+        for index in range(self.roomCount):
+            yield self.room(index)
+
+    # materializes every room into a regular, fully indexed RoomController
+    def toController(self):
+        controller = RoomController(generate=False)
+        records = [RECORD.unpack_from(self.view, self.recordsOffset + RECORD.size * index) for index in range(self.roomCount)]
+        rooms = [Room(self.string(record[6]), GridPosition(record[0], record[1])) for record in records]
+        for index, room in enumerate(rooms):
+            _, _, north, south, east, west, _, reward = records[index]
+            room.id = self.roomId(index)
+            room.setExit(EXIT_NORTH, rooms[north] if north >= 0 else None)
+            room.setExit(EXIT_SOUTH, rooms[south] if south >= 0 else None)
+            room.setExit(EXIT_EAST, rooms[east] if east >= 0 else None)
+            room.setExit(EXIT_WEST, rooms[west] if west >= 0 else None)
+            if reward >= 0:
+                room.itemReward = json.loads(self.string(reward))
+            controller.addRoomConnection(room, None, None)
+        controller.spawnRoom = rooms[self.spawnIndex]
+        controller.roomLimit = self.roomCount
+        return controller
@@ -1,6 +1,8 @@
-from Position import Position
+from GridPosition import GridPosition
 
 class Player():
-    def __init__(self):
+    # id is handed out when the player is first placed on a map, unless given here
+    def __init__(self, id=None):
+        self.id = id
         self.room = None
-        self.position = Position.zero()
+        self.position = GridPosition.zero()
@@ -0,0 +1,87 @@
+from GridPosition import packCoordinates
+import math
+
+# Uniform grid over player positions for area-of-interest queries. Each bucket covers cellSize x cellSize
+# rooms and holds the players standing in it, so a radius query only looks at the buckets the circle
+# overlaps instead of at every player. Moving a player is O(1) and only touches the buckets when it
+# crosses a bucket edge. Graph-distance queries don't need buckets at all: they walk room exits and read
+# Room.players, which RoomOccupancy keeps current.
+class PlayerSpatialIndex():
+    def __init__(self, cellSize=16):
+        self.cellSize = cellSize
+        self.buckets = {}
+        self.playerBuckets = {}
+
+    def __len__(self):
+        return len(self.playerBuckets)
+
+    def __contains__(self, player):
+        return player in self.playerBuckets
+
+    def bucketKey(self, x, y):
+        return packCoordinates(x // self.cellSize, y // self.cellSize)
+
+    # adds player at its current position, or moves it there if it is already indexed
+    def update(self, player):
+        position = player.position
+        key = packCoordinates(position.x // self.cellSize, position.y // self.cellSize)
+        oldKey = self.playerBuckets.get(player)
+        if oldKey == key:
+            return
+        if oldKey is not None:
+            self.__discard(player, oldKey)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = set()
+        bucket.add(player)
+        self.playerBuckets[player] = key
+
+    def remove(self, player):
+        key = self.playerBuckets.pop(player, None)
+        if key is None:
+            return False
+        self.__discard(player, key)
+        return True
+
+    # players within radius rooms (straight-line, like Position.distanceTo) of (x, y)
+    def playersNear(self, x, y, radius):
+        cellSize = self.cellSize
+        buckets = self.buckets
+        limit = radius * radius
+        found = []
+        # floor keeps the bucket bounds ints when radius is a float
+        for bucketY in range(math.floor((y - radius) / cellSize), math.floor((y + radius) / cellSize) + 1):
+            for bucketX in range(math.floor((x - radius) / cellSize), math.floor((x + radius) / cellSize) + 1):
+                bucket = buckets.get(packCoordinates(bucketX, bucketY))
+                if not bucket:
+                    continue
+                for player in bucket:
+                    position = player.position
+                    dx = position.x - x
+                    dy = position.y - y
+                    if dx * dx + dy * dy <= limit:
+                        found.append(player)
+        return found
+
+    # players in rooms at most steps moves away from room, walking exits breadth first
+    def playersWithinRooms(self, room, steps):
+        found = list(room.players)
+        seen = {room}
+        layer = [room]
+        for _ in range(steps):
+            nextLayer = []
+            for current in layer:
+                for neighbor in (current.north, current.south, current.east, current.west):
+                    if neighbor is not None and neighbor not in seen:
+                        seen.add(neighbor)
+                        nextLayer.append(neighbor)
+                        if neighbor.players:
+                            found.extend(neighbor.players)
+            layer = nextLayer
+        return found
+
+    def __discard(self, player, key):
+        bucket = self.buckets[key]
+        bucket.discard(player)
+        if not bucket:
+            del self.buckets[key]
@@ -1,5 +1,10 @@
 import math
 
+# cell key layout shared with GridPosition: x and y in 32 bits each, offset so negative coordinates fit.
+# GridPosition imports these, so whole-number Positions and GridPositions always hash alike
+PACK_SHIFT = 32
+PACK_OFFSET = 1 << 31
+
 class Position():
     @staticmethod
     def zero():
@@ -52,8 +57,17 @@ class Position():
     def __str__(self):
         return f"({str(self.x)}, {str(self.y)})"
 
+    # whole-number coordinates hash to their packed grid key (GridPosition.packCoordinates),
+    # so equal Positions and GridPositions land in the same set slot
     def __hash__(self):
-        return hash(repr(self))
+        try:
+            x = int(self.x)
+            y = int(self.y)
+        except (ValueError, OverflowError):
+            return hash((self.x, self.y))
+        if x == self.x and y == self.y:
+            return ((x + PACK_OFFSET) << PACK_SHIFT) | (y + PACK_OFFSET)
+        return hash((self.x, self.y))
 
     def toArray(self):
         return [self.x, self.y]
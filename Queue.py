@@ -1,15 +1,8 @@
-from DoublyLinkedList import DoublyLinkedList
+from WorkQueue import FIFOQueue
 
 
-class Queue:
+# the original FIFO, now on the ring-buffer FIFOQueue. like before it accepts duplicate values;
+# see WorkQueue for the unique and non-FIFO variants
+class Queue(FIFOQueue):
     def __init__(self):
-        self.storage = DoublyLinkedList()
-
-    def enqueue(self, value):
-        self.storage.add_to_head(value)
-
-    def dequeue(self):
-        return self.storage.remove_from_tail()
-
-    def __len__(self):
-        return len(self.storage)
+        FIFOQueue.__init__(self, unique=False)
@@ -0,0 +1,128 @@
+from MapAnalytics import MapAnalytics
+from itertools import accumulate
+from operator import add
+import heapq
+import json
+import math
+import random
+
+# Places item rewards on a generated map and keeps a reward -> rooms index, so finding every room with a
+# given reward is a dictionary lookup.
+#
+# place() works from three features computed once per call for every room, in creation order:
+#
+#   distance  steps from the spawn room (-1 when the spawn room can't reach it; those rooms never get rewards)
+#   deadEnd   True for rooms with exactly one exit
+#   density   occupied cells within densityRadius cells of the room, not counting its own
+#
+# and draws each reward's rooms by weighted sampling without replacement (Efraimidis-Spirakis: every room
+# gets the key log(u) / weight for a uniform u, which orders like u ** (1 / weight) without underflowing to
+# 0 for small weights, and the count largest keys win), all from one seeded
+# random.Random, so the same map, rewards and seed always give the same placement. A room holds at most
+# one reward; rooms that already have one are skipped.
+
+DEAD_END_WEIGHT = 4.0
+
+
+# far from spawn, in dead ends and in sparse parts of the map
+def defaultWeight(distance, deadEnd, density):
+    return (1 + distance) * (DEAD_END_WEIGHT if deadEnd else 1.0) / (1 + density)
+
+
+# index key for a reward; JSON rewards that can't be hashed (lists, dicts) are keyed by their JSON text
+def rewardKey(reward):
+    try:
+        hash(reward)
+    except TypeError:
+        return json.dumps(reward, sort_keys=True)
+    return reward
+
+
+class RewardPlacer():
+    def __init__(self, controller):
+        self.controller = controller
+        # rewardKey(reward) -> set of rooms
+        self.index = {}
+
+    def __len__(self):
+        return sum(len(rooms) for rooms in self.index.values())
+
+    def roomsWith(self, reward):
+        return self.index.get(rewardKey(reward), frozenset())
+
+    def rewardTypes(self):
+        return list(self.index)
+
+    def indexRoom(self, room):
+        key = rewardKey(room.itemReward)
+        rooms = self.index.get(key)
+        if rooms is None:
+            self.index[key] = {room}
+        else:
+            rooms.add(room)
+
+    def setReward(self, room, reward):
+        if room.itemReward is not None:
+            key = rewardKey(room.itemReward)
+            rooms = self.index[key]
+            rooms.discard(room)
+            if not rooms:
+                del self.index[key]
+        room.itemReward = reward
+        if reward is not None:
+            self.indexRoom(room)
+
+    # (rooms, distances, deadEnds, densities), one entry per room
+    def features(self, densityRadius=2):
+        analytics = MapAnalytics(self.controller)
+        deadEnds = [degree == 1 for degree in analytics.degrees]
+        return analytics.rooms, analytics.distancesFrom(), deadEnds, self.densities(analytics.rooms, densityRadius)
+
+    # occupied cells around each room, from a summed-area table over the grid's occupancy bytes
+    def densities(self, rooms, radius):
+        grid = self.controller.grid
+        width = grid.width
+        height = grid.height
+        occupancy = grid.occupancy
+        row = [0] * (width + 1)
+        sums = [row]
+        for y in range(height):
+            line = [0]
+            line.extend(accumulate(occupancy[y * width:(y + 1) * width]))
+            row = list(map(add, row, line))
+            sums.append(row)
+
+        densities = []
+        for room in rooms:
+            column = room.position.x - grid.originX
+            line = room.position.y - grid.originY
+            left = max(column - radius, 0)
+            right = min(column + radius + 1, width)
+            bottom = max(line - radius, 0)
+            top = min(line + radius + 1, height)
+            densities.append(sums[top][right] - sums[bottom][right] - sums[top][left] + sums[bottom][left] - 1)
+        return densities
+
+    # rewards maps each reward to how many rooms should get it (or is a list of (reward, count) pairs);
+    # weight is a function of (distance, deadEnd, density), or a dict of them per reward.
+    # returns {reward key: [rooms it was placed in]}
+    def place(self, rewards, seed=None, weight=defaultWeight, densityRadius=2):
+        rng = random.Random(seed)
+        rooms, distances, deadEnds, densities = self.features(densityRadius)
+        available = [room.itemReward is None and distances[index] >= 0 for index, room in enumerate(rooms)]
+        setItemReward = self.controller.setItemReward
+        placed = {}
+        for reward, count in (rewards.items() if isinstance(rewards, dict) else rewards):
+            weightOf = weight.get(reward, defaultWeight) if isinstance(weight, dict) else weight
+            keys = []
+            for index in range(len(rooms)):
+                if available[index]:
+                    roomWeight = weightOf(distances[index], deadEnds[index], densities[index])
+                    if roomWeight > 0:
+                        keys.append((math.log(1.0 - rng.random()) / roomWeight, index))
+            chosen = [index for _, index in heapq.nlargest(count, keys)]
+            for index in chosen:
+                available[index] = False
+                setItemReward(rooms[index], reward)
+            placed[rewardKey(reward)] = [rooms[index] for index in chosen]
+        return placed
@@ -1,18 +1,29 @@
-from Position import Position
-from CardinalDirection import CardinalDirection
-import uuid
+from GridPosition import GridPosition
+from CardinalDirection import EXIT_NORTH, EXIT_SOUTH, EXIT_EAST, EXIT_WEST, EXIT_ATTRIBUTES, EXIT_COUNTS, EXIT_DIRECTIONS, EXIT_GLYPHS
 
+NORTH_ONE = GridPosition(0, 1)
+SOUTH_ONE = GridPosition(0, -1)
+EAST_ONE = GridPosition(1, 0)
+WEST_ONE = GridPosition(-1, 0)
+
+# Exits are plain slots so walking the graph is a bare attribute read. exits mirrors them as a 4-bit mask
+# (north 1, south 2, east 4, west 8); anything that links rooms outside the connect methods must go
+# through setExit to keep the two in step.
 class Room():
-    def __init__(self, name, position=Position.zero(), north=None, south=None, east=None, west=None):
+    __slots__ = ("name", "position", "north", "south", "east", "west", "exits", "players", "itemReward", "id")
+
+    # id stays None until a RoomController adds the room and allocates one
+    def __init__(self, name, position=GridPosition.zero(), north=None, south=None, east=None, west=None, id=None):
         self.name = name
         self.position = position
         self.north = north
         self.south = south
         self.east = east
         self.west = west
+        self.exits = (EXIT_NORTH if north else 0) | (EXIT_SOUTH if south else 0) | (EXIT_EAST if east else 0) | (EXIT_WEST if west else 0)
         self.players = set()
         self.itemReward = None
-        self.id = uuid.uuid4().hex
+        self.id = id
 
     def toDict(self):
         newDict = {}
@@ -32,98 +43,56 @@ class Room():
 
     def connectNorthTo(self, room):
         self.north = room
-        relativePosition = Position(0, 1)
-        self.north.position = self.position + relativePosition
+        self.exits |= EXIT_NORTH
+        self.north.position = self.position + NORTH_ONE
         if room.south != self:
             room.connectSouthTo(self)
 
     def connectSouthTo(self, room):
         self.south = room
-        relativePosition = Position(0, -1)
-        self.south.position = self.position + relativePosition
+        self.exits |= EXIT_SOUTH
+        self.south.position = self.position + SOUTH_ONE
         if room.north != self:
             room.connectNorthTo(self)
 
     def connectEastTo(self, room):
         self.east = room
-        relativePosition = Position(1, 0)
-        self.east.position = self.position + relativePosition
+        self.exits |= EXIT_EAST
+        self.east.position = self.position + EAST_ONE
         if room.west != self:
             room.connectWestTo(self)
 
     def connectWestTo(self, room):
         self.west = room
-        relativePosition = Position(-1, 0)
-        self.west.position = self.position + relativePosition
+        self.exits |= EXIT_WEST
+        self.west.position = self.position + WEST_ONE
         if room.east != self:
             room.connectEastTo(self)
 
+    # links (or with room=None, unlinks) the exit for one bit without touching the other room
+    def setExit(self, exit, room):
+        setattr(self, EXIT_ATTRIBUTES[exit], room)
+        if room is None:
+            self.exits &= ~exit
+        else:
+            self.exits |= exit
+
+    def hasExit(self, exit):
+        return self.exits & exit != 0
+
+    def exitCount(self):
+        return EXIT_COUNTS[self.exits]
+
     def connectedInDirections(self):
-        connectedDirections = set()
-        if self.north:
-            connectedDirections.add(CardinalDirection.NORTH)
-        if self.south:
-            connectedDirections.add(CardinalDirection.SOUTH)
-        if self.east:
-            connectedDirections.add(CardinalDirection.EAST)
-        if self.west:
-            connectedDirections.add(CardinalDirection.WEST)
-        return connectedDirections
+        return set(EXIT_DIRECTIONS[self.exits])
+
+    def exitMask(self):
+        return self.exits
 
     def visualizeTextCharacter(self):
-        connections = self.connectedInDirections()
-        if len(connections) == 4:
-            return "+"
-        elif len(connections) == 3:
-            # nes
-            if CardinalDirection.NORTH in connections and CardinalDirection.EAST in connections and CardinalDirection.SOUTH in connections:
-                return "+"
-            # new
-            elif CardinalDirection.NORTH in connections and CardinalDirection.EAST in connections and CardinalDirection.WEST in connections:
-                return "+"
-            # nws
-            elif CardinalDirection.NORTH in connections and CardinalDirection.SOUTH in connections and CardinalDirection.WEST in connections:
-                return "+"
-            # ews
-            else:
-                return "+"
-        elif len(connections) == 2:
-            # ne
-            if CardinalDirection.NORTH in connections and CardinalDirection.EAST in connections:
-                return "+"
-            # nw
-            elif CardinalDirection.NORTH in connections and CardinalDirection.WEST in connections:
-                return "+"
-            # ns
-            elif CardinalDirection.NORTH in connections and CardinalDirection.SOUTH in connections:
-                return "|"
-            # es
-            elif CardinalDirection.EAST in connections and CardinalDirection.SOUTH in connections:
-                return "r"
-            # ew
-            elif CardinalDirection.EAST in connections and CardinalDirection.WEST in connections:
-                return "-"
-            # sw
-            else:
-                return "+"
-        elif len(connections) == 1:
-            # n
-            if CardinalDirection.NORTH in connections:
-                return "⏝"
-            # s
-            elif CardinalDirection.SOUTH in connections:
-                return "⏜"
-            # w
-            elif CardinalDirection.WEST in connections:
-                return ")"
-            # e
-            else:
-                return "("
-        else:
-            return " "
+        return EXIT_GLYPHS[self.exits]
 
     def __str__(self):
-        connectedRooms = [self.north, self.south, self.east, self.west]
-        connectionCount = len(connectedRooms)
+        connectionCount = EXIT_COUNTS[self.exits]
         roomsString = "room" + ("" if connectionCount == 1 else "s")
         return f"Room: {self.name} - connected to {connectionCount} {roomsString}"
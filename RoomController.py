@@ -1,61 +1,138 @@
-from Queue import Queue
-from Position import Position
-from CardinalDirection import CardinalDirection
+from GenerationStrategy import DEFAULT_STRATEGY, GenerationExhausted
+from GridPosition import packCoordinates
+from CardinalDirection import CardinalDirection, EXIT_COUNTS
 from Room import Room
+from RoomFrontier import RoomFrontier
+from RoomGrid import RoomGrid
+from RoomIdAllocator import RoomIdAllocator, SEQUENTIAL
+from RoomOccupancy import RoomOccupancy
+from RoomPathfinder import RoomPathfinder
+from RewardPlacer import RewardPlacer, defaultWeight
+from CorridorGraph import CorridorGraph
+from MapRenderer import MapRenderer
+from ControllerSnapshot import ControllerSnapshot
+from MapAnalytics import MapAnalytics
 # from Player import Player # ready for importing
+import copy
 import random
 import time
+import weakref
+
+DEAD_END_MASKS = frozenset(mask for mask in range(16) if EXIT_COUNTS[mask] == 1)
+JUNCTION_MASKS = frozenset(mask for mask in range(16) if EXIT_COUNTS[mask] >= 3)
+
+# bump whenever generateRooms starts producing a different map for the same seed, so caches keyed on it
+# don't hand out stale worlds
+GENERATOR_VERSION = 1
+
 
 class RoomController():
-    def __init__(self, roomLimit=100):
+    # with generate=False the controller starts with no rooms at all, ready to be filled by a loader
+    # profiler is an optional GenerationProfiler; with None generation runs uninstrumented.
+    # idMode picks how rooms get ids, see RoomIdAllocator ("sequential", "seeded" or the old "hex")
+    # strategy shapes the map, see GenerationStrategy; None keeps the original breadth-first growth
+    def __init__(self, roomLimit=100, seed=None, generate=True, profiler=None, idMode=SEQUENTIAL, strategy=None):
         self.roomLimit = roomLimit
-        self.generateRooms()
+        self.profiler = profiler
+        self.strategy = strategy if strategy is not None else DEFAULT_STRATEGY
+        self.idMode = idMode
+        # bumped by every change to rooms, rewards or players; see snapshot()
+        self.version = 0
+        if generate:
+            self.generateRooms(seed)
+        else:
+            self.clearRooms()
 
     def toDict(self):
         newDict = {}
         roomDict = {}
         for room in self.rooms:
-            roomDict[room.id] = room.toDict()
+            # keyed by the id's string form, as the JSON export writes it
+            roomDict[str(room.id)] = room.toDict()
         newDict["rooms"] = roomDict
         newDict["roomCoordinates"] = [pos.toArray() for pos in self.roomCoordinates]
         newDict["spawnRoom"] = self.spawnRoom.id
         return newDict
 
-    def resetAllRooms(self):
+    # idSeed only matters for seeded ids; generateRooms passes its own seed
+    def resetAllRooms(self, idSeed=None):
+        self.clearRooms()
+        if idSeed is not None:
+            self.ids = RoomIdAllocator(self.idMode, idSeed)
+        self.spawnRoom = Room("Spawn Area")
+        self.addRoomConnection(self.spawnRoom, None, None)
+
+    def clearRooms(self):
         self.rooms = set()
+        self.roomsById = {}
+        self.ids = RoomIdAllocator(self.idMode)
         self.occupiedRooms = set()
         self.emptyRooms = set()
         self.roomCoordinates = set()
+        self.frontier = RoomFrontier()
+        self.grid = RoomGrid()
+        self.pathfinder = RoomPathfinder(self)
+        # CorridorGraph, built by the first hierarchicalPath call and kept up to date after that
+        self.corridorGraph = None
+        self.occupancy = RoomOccupancy(self)
+        self.rewards = RewardPlacer(self)
+        # ChangeLog while trackChanges is on; clearing the map turns it off
+        self.changeLog = None
+        # live ControllerSnapshots, which get rooms' old state before every write
+        self.snapshots = weakref.WeakSet()
+        self.spawnRoom = None
 
-        self.spawnRoom = Room("Spawn Area")
-        self.addRoomConnection(self.spawnRoom, None, None)
-
-    def generateRooms(self, seed=time.time()):
-        self.resetAllRooms()
-        random.seed(seed)
+    # an independent copy of the map: new Room objects with the same ids, names, positions, exits and
+    # rewards, and copies of the grid and frontier indexes. players, the change log and the profiler
+    # aren't carried over. much cheaper than generating or loading the map again
+    def clone(self):
+        # everything but the room graph and its indexes starts out as clearRooms leaves it
+        controller = RoomController(self.roomLimit, generate=False, idMode=self.idMode, strategy=self.strategy)
+        controller.version = self.version
+        roomMap = {room: Room(room.name, room.position, id=room.id) for room in self.rooms}
+        for room, clone in roomMap.items():
+            clone.north = roomMap.get(room.north)
+            clone.south = roomMap.get(room.south)
+            clone.east = roomMap.get(room.east)
+            clone.west = roomMap.get(room.west)
+            clone.exits = room.exits
+            if room.itemReward is not None:
+                clone.itemReward = copy.deepcopy(room.itemReward)
+                controller.rewards.indexRoom(clone)
+        controller.rooms = set(roomMap.values())
+        controller.roomsById = {roomId: roomMap[room] for roomId, room in self.roomsById.items()}
+        controller.ids = copy.copy(self.ids)
+        controller.emptyRooms = set(controller.rooms)
+        controller.roomCoordinates = self.roomCoordinates.copy()
+        controller.frontier = self.frontier.copy()
+        controller.grid = self.grid.copy(roomMap)
+        controller.spawnRoom = roomMap.get(self.spawnRoom)
+        return controller
 
-        roomQueue = Queue()
-        roomQueue.enqueue(self.spawnRoom)
-
-        while len(self.rooms) < self.roomLimit:
-            if len(roomQueue) == 0:
-                print("Somehow there are no valid rooms in the queue")
-                return
-            oldRoom = roomQueue.dequeue()
-            newRoom = Room(f"Room {len(self.rooms)}")
-
-            possibleDirections = list(self.roomEligibleDirections(oldRoom))
-            possibleDirections.sort()
-            if len(possibleDirections) > 0:
-                newDirection = random.choice(possibleDirections)
-                self.addRoomConnection(newRoom, oldRoom, newDirection)
-                if self.roomEligibleToAppend(newRoom):
-                    roomQueue.enqueue(newRoom)
-                if self.roomEligibleToAppend(oldRoom):
-                    roomQueue.enqueue(oldRoom)
+    # seed defaults to the current time. generation draws from its own random.Random, never the global one.
+    # with strict=True running out of eligible rooms raises GenerationExhausted instead of printing
+    def generateRooms(self, seed=None, strict=False):
+        if seed is None:
+            seed = time.time()
+        self.resetAllRooms(seed)
+        rng = random.Random(seed)
+        strategy = self.strategy
+        roomQueue = strategy.newQueue(self)
+        profiler = self.profiler
+        if profiler is None:
+            strategy.grow(self, rng, strict, roomQueue, Room)
+            return
+        profiler.attach(self, roomQueue)
+        try:
+            strategy.grow(self, rng, strict, roomQueue, profiler.roomFactory(Room))
+        finally:
+            profiler.detach()
 
     # must include an oldRoom and direction or the new room will sit abandoned and alone. Exception is made for initial room.
     def addRoomConnection(self, newRoom, oldRoom, direction):
+        self.version += 1
+        if self.snapshots and oldRoom:
+            self.preserveRoom(oldRoom)
         if oldRoom and direction:
             if direction == CardinalDirection.NORTH:
                 oldRoom.connectNorthTo(newRoom)
@@ -68,61 +145,174 @@ class RoomController():
             else:
                 # something went wrong
                 return
+        # rooms from loaders arrive with their ids; everything else gets one here
+        if newRoom.id is None:
+            newRoom.id = self.ids.allocate()
+        else:
+            self.ids.reserve(newRoom.id)
+        self.roomsById[newRoom.id] = newRoom
         self.rooms.add(newRoom)
         self.emptyRooms.add(newRoom)
         self.roomCoordinates.add(newRoom.position)
+        if self.snapshots:
+            self.__preserveCell(newRoom.position.x, newRoom.position.y)
+        if self.grid.place(newRoom):
+            self.frontier.occupy(packCoordinates(newRoom.position.x, newRoom.position.y))
+        if newRoom.itemReward is not None:
+            self.rewards.indexRoom(newRoom)
+        self.pathfinder.invalidate()
+        if self.corridorGraph is not None:
+            self.corridorGraph.roomAdded(newRoom)
+        if self.changeLog is not None:
+            self.changeLog.roomAdded(newRoom)
+
+    # O(1) read-only view of the map as it is now, unaffected by later writes; see ControllerSnapshot
+    def snapshot(self):
+        snapshot = ControllerSnapshot(self)
+        self.snapshots = weakref.WeakSet(live for live in self.snapshots if not live.released)
+        self.snapshots.add(snapshot)
+        return snapshot
+
+    # hands room's current state to live snapshots before it changes
+    def preserveRoom(self, room):
+        for snapshot in self.snapshots:
+            snapshot.preserve(room)
+
+    def __preserveCell(self, x, y):
+        grid = self.grid
+        # a room outside the interior grows the grid into new arrays, which leaves the old ones untouched
+        if grid.inInterior(x, y):
+            index = grid.cellIndex(x, y)
+            for snapshot in self.snapshots:
+                snapshot.preserveCell(grid, index)
 
     # checks to see how many NSEW neighbors a new room would potentially have. returns true if the neighbor count is 1
     def canAddRoomAt(self, position):
-        nswe = [pos for pos in (position.nsewOne())]
-
-        count = len([direction for direction in nswe if direction in self.roomCoordinates])
-        if count == 1:
-            return True
-        else:
-            return False
+        return self.grid.neighborCount(position.x, position.y) == 1
 
     def roomEligibleDirections(self, room):
-        n, s, e, w = room.position.nsewOne()
-        eligibleDirections = set()
-        if self.canAddRoomAt(n):
-            eligibleDirections.add(CardinalDirection.NORTH)
-        if self.canAddRoomAt(s):
-            eligibleDirections.add(CardinalDirection.SOUTH)
-        if self.canAddRoomAt(e):
-            eligibleDirections.add(CardinalDirection.EAST)
-        if self.canAddRoomAt(w):
-            eligibleDirections.add(CardinalDirection.WEST)
-        return eligibleDirections
+        return set(self.frontier.eligibleDirections(packCoordinates(room.position.x, room.position.y)))
 
     def roomEligibleToAppend(self, room):
-        return len(self.roomEligibleDirections(room)) > 0
+        return self.frontier.hasEligibleDirection(packCoordinates(room.position.x, room.position.y))
+
+    # the most recently placed room at a cell, or None
+    def roomAt(self, x, y):
+        return self.grid.roomAt(x, y)
+
+    def roomWithId(self, roomId):
+        return self.roomsById.get(roomId)
+
+    def roomIdAt(self, x, y):
+        return self.grid.roomIdAt(x, y)
+
+    # distances from room (spawnRoom by default), cached until the room graph changes
+    def distanceField(self, room=None):
+        return self.pathfinder.distanceField(room)
+
+    # list of rooms from fromRoom to toRoom, both included, or None if there is no route
+    def shortestPath(self, fromRoom, toRoom):
+        return self.pathfinder.shortestPath(fromRoom, toRoom)
+
+    def aStarPath(self, fromRoom, toRoom):
+        return self.pathfinder.aStarPath(fromRoom, toRoom)
+
+    # same routes as shortestPath, searched over contracted corridors and clusters; for large maps
+    def hierarchicalPath(self, fromRoom, toRoom):
+        if self.corridorGraph is None:
+            self.corridorGraph = CorridorGraph(self)
+        return self.corridorGraph.shortestPath(fromRoom, toRoom)
+
+    def nearestRoom(self, fromRoom, predicate, includeSource=False):
+        return self.pathfinder.nearestRoom(fromRoom, predicate, includeSource)
+
+    def nearestRoomWithItemReward(self, fromRoom=None):
+        return self.nearestRoom(fromRoom or self.spawnRoom, lambda room: room.itemReward is not None)
+
+    # directions that take the player from their current room to toRoom
+    def routePlayer(self, player, toRoom):
+        return self.pathfinder.directionsBetween(player.room, toRoom)
+
+    # starts a versioned change log at the current state; see ChangeLog
+    def trackChanges(self, maxEntries=10000):
+        # imported here because ChangeLog checkpoints through MapSnapshot, which imports this module
+        from ChangeLog import ChangeLog
+        self.changeLog = ChangeLog(self, maxEntries)
+        return self.changeLog
+
+    def setItemReward(self, room, itemReward):
+        self.version += 1
+        if self.snapshots:
+            self.preserveRoom(room)
+        self.rewards.setReward(room, itemReward)
+        if self.changeLog is not None:
+            self.changeLog.rewardSet(room)
+
+    # assigns rewards in one seeded batch; see RewardPlacer.place
+    def placeRewards(self, rewards, seed=None, weight=defaultWeight, densityRadius=2):
+        return self.rewards.place(rewards, seed, weight, densityRadius)
+
+    # every room holding reward
+    def roomsWithReward(self, reward):
+        return self.rewards.roomsWith(reward)
+
+    def changesSince(self, version):
+        return self.changeLog.changesSince(version)
+
+    def sync(self, version=None):
+        return self.changeLog.sync(version)
+
+    def placePlayer(self, player, room=None):
+        self.occupancy.place(player, room)
+
+    def removePlayer(self, player):
+        return self.occupancy.remove(player)
+
+    def move(self, player, direction):
+        return self.occupancy.move(player, direction)
+
+    def applyMoves(self, moves, results=None):
+        return self.occupancy.applyMoves(moves, results)
+
+    def populationOf(self, room):
+        return self.occupancy.populationOf(room)
+
+    # players within radius rooms of room, straight-line
+    def playersNear(self, room, radius):
+        position = room.position
+        return self.occupancy.playersNear(position.x, position.y, radius)
 
-    def textVisualization(self):
-        xValueSet = {room.position.x for room in self.rooms}
-        yValueSet = {room.position.y for room in self.rooms}
-        xValues = sorted(list(xValueSet))
-        yValues = sorted(list(yValueSet))
+    # players at most steps moves away from room
+    def playersWithinRooms(self, room, steps):
+        return self.occupancy.playersWithinRooms(room, steps)
 
-        xRange = xValues[-1] - xValues[0]
-        xOffset = 0 - xValues[0]
-        yRange = yValues[-1] - yValues[0]
-        yOffset = 0 - yValues[0]
+    # rooms whose exit mask is in masks. masks is any container of 4-bit masks, e.g. a set or a 16-entry table
+    def roomsWithExits(self, masks):
+        return [room for room in self.rooms if room.exits in masks]
 
-        yTemplateArray = [" "] * (yRange + 1)
+    def deadEnds(self):
+        return self.roomsWithExits(DEAD_END_MASKS)
 
-        xTemplateArray = [yTemplateArray.copy() for i in range(xRange + 1)]
+    def junctions(self):
+        return self.roomsWithExits(JUNCTION_MASKS)
 
+    # number of rooms with 0, 1, 2, 3 and 4 exits
+    def exitCountHistogram(self):
+        counts = [0] * 16
         for room in self.rooms:
-            xIndex = xOffset + room.position.x
-            yIndex = yOffset + room.position.y
-            xTemplateArray[xIndex][yIndex] = "O" if room.position == Position.zero() else room.visualizeTextCharacter()
+            counts[room.exits] += 1
+        histogram = [0] * 5
+        for mask, count in enumerate(counts):
+            histogram[EXIT_COUNTS[mask]] += count
+        return histogram
 
-        outStr = ""
-        for yIndex in range(yRange - 1, 0, -1):
-            for xIndex in range(xRange):
-                outStr += xTemplateArray[xIndex][yIndex]
-            outStr += "\n"
+    # flat array export of the room graph, for balancing metrics; see MapAnalytics
+    def analytics(self):
+        return MapAnalytics(self)
 
-        print(outStr)
+    def metrics(self):
+        return MapAnalytics(self).metrics()
 
+    # draws the whole map as text, north up, to file (stdout by default). see MapRenderer for windows and images
+    def textVisualization(self, file=None):
+        MapRenderer(self).renderText(file)
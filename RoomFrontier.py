@@ -0,0 +1,60 @@
+from CardinalDirection import CardinalDirection
+from GridPosition import NORTH_KEY_DELTA, SOUTH_KEY_DELTA, EAST_KEY_DELTA, WEST_KEY_DELTA
+
+# Incremental index of the cells around the map, keyed by packed cell keys (see GridPosition).
+# For every cell touching an occupied cell it keeps the number of occupied NSEW neighbors, and the
+# set of candidate cells whose count is exactly 1. Placing a room updates four counts, so
+# eligibility checks never rescan the map. Each cell must be occupied only once; RoomController
+# checks its RoomGrid before calling occupy.
+class RoomFrontier():
+    def __init__(self):
+        self.neighborCounts = {}
+        self.candidates = set()
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def copy(self):
+        frontier = RoomFrontier()
+        frontier.neighborCounts = dict(self.neighborCounts)
+        frontier.candidates = set(self.candidates)
+        return frontier
+
+    def occupy(self, key):
+        neighborCounts = self.neighborCounts
+        candidates = self.candidates
+        for neighbor in (key + NORTH_KEY_DELTA, key + SOUTH_KEY_DELTA, key + EAST_KEY_DELTA, key + WEST_KEY_DELTA):
+            count = neighborCounts.get(neighbor, 0) + 1
+            neighborCounts[neighbor] = count
+            if count == 1:
+                candidates.add(neighbor)
+            elif count == 2:
+                candidates.discard(neighbor)
+
+    def neighborCount(self, key):
+        return self.neighborCounts.get(key, 0)
+
+    # mirrors RoomController.canAddRoomAt: true when exactly one NSEW neighbor is occupied
+    def isCandidate(self, key):
+        return self.neighborCounts.get(key, 0) == 1
+
+    # eligible directions out of a cell, in CardinalDirection order so the result matches a sorted list
+    def eligibleDirections(self, key):
+        neighborCounts = self.neighborCounts
+        directions = []
+        if neighborCounts.get(key + NORTH_KEY_DELTA, 0) == 1:
+            directions.append(CardinalDirection.NORTH)
+        if neighborCounts.get(key + SOUTH_KEY_DELTA, 0) == 1:
+            directions.append(CardinalDirection.SOUTH)
+        if neighborCounts.get(key + EAST_KEY_DELTA, 0) == 1:
+            directions.append(CardinalDirection.EAST)
+        if neighborCounts.get(key + WEST_KEY_DELTA, 0) == 1:
+            directions.append(CardinalDirection.WEST)
+        return directions
+
+    def hasEligibleDirection(self, key):
+        neighborCounts = self.neighborCounts
+        return (neighborCounts.get(key + NORTH_KEY_DELTA, 0) == 1
+                or neighborCounts.get(key + SOUTH_KEY_DELTA, 0) == 1
+                or neighborCounts.get(key + EAST_KEY_DELTA, 0) == 1
+                or neighborCounts.get(key + WEST_KEY_DELTA, 0) == 1)
@@ -0,0 +1,163 @@
+from array import array
+
+# Dense occupancy index over the map's cells. Cells live row-major in a bytearray (1 = occupied)
+# with a parallel array of room table indexes, offset so the spawn origin sits in the middle.
+# The outermost ring of cells is always kept empty: the grid grows before a room lands on it,
+# which lets neighbor lookups and the whole-map neighbor count skip bounds checks.
+class RoomGrid():
+    def __init__(self, initialSize=64):
+        self.width = initialSize
+        self.height = initialSize
+        self.originX = -(initialSize // 2)
+        self.originY = -(initialSize // 2)
+        self.occupancy = bytearray(self.width * self.height)
+        self.roomIndexes = array("l", [0]) * (self.width * self.height)
+        self.rooms = []
+
+        self.minX = None
+        self.maxX = None
+        self.minY = None
+        self.maxY = None
+
+    def __len__(self):
+        return len(self.rooms)
+
+    # the same grid over other rooms; roomMap maps each of this grid's rooms to its replacement
+    def copy(self, roomMap):
+        grid = RoomGrid.__new__(RoomGrid)
+        grid.__dict__.update(self.__dict__)
+        grid.occupancy = bytearray(self.occupancy)
+        grid.roomIndexes = array("l", self.roomIndexes)
+        grid.rooms = [roomMap[room] for room in self.rooms]
+        return grid
+
+    def cellIndex(self, x, y):
+        return (y - self.originY) * self.width + (x - self.originX)
+
+    def cellAt(self, index):
+        return (index % self.width + self.originX, index // self.width + self.originY)
+
+    def inInterior(self, x, y):
+        column = x - self.originX
+        row = y - self.originY
+        return 0 < column < self.width - 1 and 0 < row < self.height - 1
+
+    # records a room at its position. a later room placed on the same cell replaces the earlier one.
+    # returns True if the cell was empty before.
+    def place(self, room):
+        x = room.position.x
+        y = room.position.y
+        if not self.inInterior(x, y):
+            self.growToFit(x, y)
+        index = (y - self.originY) * self.width + (x - self.originX)
+
+        self.rooms.append(room)
+        self.roomIndexes[index] = len(self.rooms)
+        if self.occupancy[index]:
+            return False
+        self.occupancy[index] = 1
+
+        if self.minX is None:
+            self.minX = self.maxX = x
+            self.minY = self.maxY = y
+        else:
+            if x < self.minX:
+                self.minX = x
+            elif x > self.maxX:
+                self.maxX = x
+            if y < self.minY:
+                self.minY = y
+            elif y > self.maxY:
+                self.maxY = y
+        return True
+
+    # reallocates so that (x, y) lands inside the empty border ring, at least doubling the grown axis
+    def growToFit(self, x, y):
+        left = min(x - 1, self.originX)
+        bottom = min(y - 1, self.originY)
+        right = max(x + 1, self.originX + self.width - 1)
+        top = max(y + 1, self.originY + self.height - 1)
+
+        width = self.width
+        height = self.height
+        if left < self.originX or right > self.originX + width - 1:
+            width = max(width * 2, right - left + 1)
+        if bottom < self.originY or top > self.originY + height - 1:
+            height = max(height * 2, top - bottom + 1)
+        # keep the old area centered in the new one
+        originX = left - (width - (right - left + 1)) // 2
+        originY = bottom - (height - (top - bottom + 1)) // 2
+
+        occupancy = bytearray(width * height)
+        roomIndexes = array("l", [0]) * (width * height)
+        columnShift = self.originX - originX
+        for row in range(self.height):
+            oldStart = row * self.width
+            newStart = (row + self.originY - originY) * width + columnShift
+            occupancy[newStart:newStart + self.width] = self.occupancy[oldStart:oldStart + self.width]
+            roomIndexes[newStart:newStart + self.width] = self.roomIndexes[oldStart:oldStart + self.width]
+
+        self.width = width
+        self.height = height
+        self.originX = originX
+        self.originY = originY
+        self.occupancy = occupancy
+        self.roomIndexes = roomIndexes
+
+    def isOccupied(self, x, y):
+        if not self.inInterior(x, y):
+            return False
+        return self.occupancy[(y - self.originY) * self.width + (x - self.originX)] == 1
+
+    # number of occupied NSEW neighbors of any cell, on or off the grid
+    def neighborCount(self, x, y):
+        column = x - self.originX
+        row = y - self.originY
+        width = self.width
+        if 0 < column < width - 1 and 0 < row < self.height - 1:
+            occupancy = self.occupancy
+            index = row * width + column
+            return occupancy[index + width] + occupancy[index - width] + occupancy[index + 1] + occupancy[index - 1]
+        isOccupied = self.isOccupied
+        return isOccupied(x, y + 1) + isOccupied(x, y - 1) + isOccupied(x + 1, y) + isOccupied(x - 1, y)
+
+    def roomAt(self, x, y):
+        if not self.inInterior(x, y):
+            return None
+        roomIndex = self.roomIndexes[(y - self.originY) * self.width + (x - self.originX)]
+        if roomIndex == 0:
+            return None
+        return self.rooms[roomIndex - 1]
+
+    def roomIdAt(self, x, y):
+        room = self.roomAt(x, y)
+        return room.id if room else None
+
+    # (minX, minY, maxX, maxY) of the occupied cells, or None when the grid is empty
+    def bounds(self):
+        if self.minX is None:
+            return None
+        return (self.minX, self.minY, self.maxX, self.maxY)
+
+    # occupied-neighbor count of every cell at once, as bytes in the grid's row-major layout.
+    # the occupancy bytes are read as one little-endian integer and shifted by one cell and by one
+    # row in each direction; counts never exceed 4, so the byte lanes never carry into each other.
+    # the empty border ring keeps the east/west shifts from wrapping counts across rows.
+    def neighborCountGrid(self):
+        size = len(self.occupancy)
+        return (self.__neighborCountInt() & ((1 << (8 * size)) - 1)).to_bytes(size, "little")
+
+    # how many cells have exactly neighborCount occupied neighbors, counting only occupied cells if asked
+    def countCellsWithNeighbors(self, neighborCount, occupiedOnly=False):
+        if not occupiedOnly:
+            return self.neighborCountGrid().count(neighborCount)
+        # occupied cells hold count + 1 and empty cells 0, so a zero count stays distinguishable
+        size = len(self.occupancy)
+        occupied = int.from_bytes(self.occupancy, "little")
+        marked = (self.__neighborCountInt() + occupied) & (occupied * 255)
+        return marked.to_bytes(size, "little").count(neighborCount + 1)
+
+    def __neighborCountInt(self):
+        occupied = int.from_bytes(self.occupancy, "little")
+        rowBits = 8 * self.width
+        return (occupied << 8) + (occupied >> 8) + (occupied << rowBits) + (occupied >> rowBits)
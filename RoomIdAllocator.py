@@ -0,0 +1,50 @@
+import hashlib
+import uuid
+
+# Hands out room ids for one RoomController.
+#
+#   "sequential"  1, 2, 3, ... in creation order (the default). cheapest, and the same seed gives the same ids
+#   "seeded"      64-bit ints scrambled from (seed, creation order), so ids from different seeds collide with
+#                 negligible probability when worlds are merged or cached side by side (not never: callers
+#                 that merge worlds should still check). still reproducible per seed
+#   "hex"         uuid4().hex strings, the old behavior, for callers that need globally unique ids
+#
+# The seeded scramble is splitmix64's finalizer over seedBase + n * golden ratio, a bijection on 64-bit
+# ints, so ids within one world never repeat.
+
+SEQUENTIAL = "sequential"
+SEEDED = "seeded"
+HEX = "hex"
+
+MASK_64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+def mix64(value):
+    value = (value ^ (value >> 30)) * 0xBF58476D1CE4E5B9 & MASK_64
+    value = (value ^ (value >> 27)) * 0x94D049BB133111EB & MASK_64
+    return value ^ (value >> 31)
+
+
+class RoomIdAllocator():
+    def __init__(self, mode=SEQUENTIAL, seed=None):
+        if mode not in (SEQUENTIAL, SEEDED, HEX):
+            raise ValueError(f"unknown id mode {mode!r}")
+        self.mode = mode
+        self.seed = seed
+        self.counter = 0
+        digest = hashlib.blake2b(repr(seed).encode("utf-8"), digest_size=8).digest()
+        self.seedBase = int.from_bytes(digest, "little")
+
+    def allocate(self):
+        self.counter += 1
+        if self.mode == SEQUENTIAL:
+            return self.counter
+        if self.mode == SEEDED:
+            return mix64((self.seedBase + self.counter * GOLDEN_GAMMA) & MASK_64)
+        return uuid.uuid4().hex
+
+    # keeps sequential ids clear of an id that came from somewhere else, e.g. a loaded map
+    def reserve(self, roomId):
+        if self.mode == SEQUENTIAL and isinstance(roomId, int) and roomId > self.counter:
+            self.counter = roomId
@@ -0,0 +1,175 @@
+from CardinalDirection import EXIT_BITS
+from GridPosition import GridPosition
+from Room import Room
+from RoomController import RoomController
+import json
+
+# Streaming JSON export and import for RoomController, in the same schema as RoomController.toDict.
+# The writer emits one room at a time and produces exactly what json.dump(controller.toDict(), fp)
+# would; the reader parses rooms and coordinates one entry at a time without loading the document.
+
+DIRECTION_KEYS = ("north", "south", "east", "west")
+
+
+def iterJSONChunks(controller):
+    encode = json.dumps
+    yield '{"rooms": {'
+    separator = ""
+    for room in controller.rooms:
+        # json turns int keys into strings, so the key is always the id's string form
+        yield f"{separator}{encode(str(room.id))}: {encode(room.toDict())}"
+        separator = ", "
+    yield '}, "roomCoordinates": ['
+    separator = ""
+    for position in controller.roomCoordinates:
+        yield f"{separator}[{encode(position.x)}, {encode(position.y)}]"
+        separator = ", "
+    yield f'], "spawnRoom": {encode(controller.spawnRoom.id)}}}'
+
+
+def dumpController(controller, fp):
+    fp.writelines(iterJSONChunks(controller))
+
+
+# characters that can follow a prefix of a JSON number inside the number
+NUMBER_CHARACTERS = frozenset(".eE+-0123456789")
+
+
+# Incremental scanner over a text file holding one JSON document. Values are decoded with
+# json's raw_decode; the buffer is refilled whenever a value runs past its end.
+class JSONStreamReader():
+    def __init__(self, fp, chunkSize=1 << 16):
+        self.fp = fp
+        self.chunkSize = chunkSize
+        self.buffer = ""
+        self.index = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunkSize)
+        if not chunk:
+            self.eof = True
+            return False
+        # drop what has been consumed so the buffer stays about one chunk long
+        self.buffer = self.buffer[self.index:] + chunk
+        self.index = 0
+        return True
+
+    def peek(self):
+        while True:
+            buffer = self.buffer
+            index = self.index
+            length = len(buffer)
+            while index < length and buffer[index] in " \t\n\r":
+                index += 1
+            self.index = index
+            if index < length:
+                return buffer[index]
+            if not self.fill():
+                return ""
+
+    def expect(self, character):
+        found = self.peek()
+        if found != character:
+            raise ValueError(f"expected {character!r} at offset {self.index}, found {found!r}")
+        self.index += 1
+
+    # consumes character if it is next and reports whether it was
+    def accept(self, character):
+        if self.peek() == character:
+            self.index += 1
+            return True
+        return False
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.index)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # a number that ends at the buffer's end, or right before a character that could carry it on
+            # ("1." then "5", "1" then "e5"), may continue in the next chunk
+            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                    and (end == len(self.buffer) or self.buffer[end] in NUMBER_CHARACTERS) and self.fill()):
+                continue
+            self.index = end
+            return value
+
+    # yields each member's key; the caller consumes the member's value before asking for the next one
+    def members(self):
+        self.expect("{")
+        if self.accept("}"):
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.accept("}"):
+                return
+            self.expect(",")
+
+    # yields once per array element; the caller consumes each element
+    def elements(self):
+        self.expect("[")
+        if self.accept("]"):
+            return
+        while True:
+            yield
+            if self.accept("]"):
+                return
+            self.expect(",")
+
+
+# yields ("room", roomId, roomDict), ("roomCoordinate", [x, y]) and ("spawnRoom", roomId) records
+# in document order
+def iterRecords(fp, chunkSize=1 << 16):
+    reader = JSONStreamReader(fp, chunkSize)
+    for key in reader.members():
+        if key == "rooms":
+            for roomId in reader.members():
+                yield ("room", roomId, reader.value())
+        elif key == "roomCoordinates":
+            for _ in reader.elements():
+                yield ("roomCoordinate", reader.value())
+        elif key == "spawnRoom":
+            yield ("spawnRoom", reader.value())
+        else:
+            reader.value()
+
+
+# rebuilds a RoomController from a stream written by dumpController or json.dump(controller.toDict()).
+# exits are linked as soon as both rooms have been read.
+def loadController(fp, chunkSize=1 << 16):
+    controller = RoomController(generate=False)
+    roomsById = controller.roomsById
+    pendingExits = {}
+    spawnRoomId = None
+    for record in iterRecords(fp, chunkSize):
+        if record[0] == "room":
+            roomDict = record[2]
+            room = Room(roomDict["name"], GridPosition(*roomDict["position"]), id=roomDict["id"])
+            room.itemReward = roomDict.get("itemReward")
+            for direction in DIRECTION_KEYS:
+                if direction in roomDict:
+                    neighbor = roomsById.get(roomDict[direction])
+                    if neighbor is None:
+                        pendingExits.setdefault(roomDict[direction], []).append((room, direction))
+                    else:
+                        room.setExit(EXIT_BITS[direction], neighbor)
+            for waitingRoom, direction in pendingExits.pop(room.id, ()):
+                waitingRoom.setExit(EXIT_BITS[direction], room)
+            controller.addRoomConnection(room, None, None)
+        elif record[0] == "spawnRoom":
+            spawnRoomId = record[1]
+
+    if pendingExits:
+        raise ValueError(f"exits point at {len(pendingExits)} room id(s) missing from the stream")
+    controller.spawnRoom = roomsById[spawnRoomId]
+    controller.roomLimit = len(controller.rooms)
+    return controller
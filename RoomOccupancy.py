@@ -0,0 +1,149 @@
+from CardinalDirection import CardinalDirection, EXIT_ATTRIBUTES
+from PlayerSpatialIndex import PlayerSpatialIndex
+
+# exit attribute for each move, given either as a CardinalDirection or as its exit bit
+MOVE_ATTRIBUTES = dict(EXIT_ATTRIBUTES)
+MOVE_ATTRIBUTES.update((direction, EXIT_ATTRIBUTES[direction.mask]) for direction in CardinalDirection)
+
+
+# Keeps players, Room.players and the controller's occupiedRooms/emptyRooms sets in step. Every change
+# is validated before anything is touched, so a rejected move leaves all of them as they were. A room's
+# population is len(room.players), so counts never need a scan over players. spatialIndex follows every
+# placement and move for area-of-interest queries.
+class RoomOccupancy():
+    def __init__(self, controller, cellSize=16):
+        self.controller = controller
+        self.players = set()
+        self.spatialIndex = PlayerSpatialIndex(cellSize)
+        self.nextPlayerId = 1
+
+    def __len__(self):
+        return len(self.players)
+
+    # puts player in room (spawn by default), taking it out of wherever it was
+    def place(self, player, room=None):
+        if room is None:
+            room = self.controller.spawnRoom
+        if room not in self.controller.rooms:
+            raise ValueError(f"{room.name} is not part of this map")
+        if player.id is None:
+            player.id = self.nextPlayerId
+            self.nextPlayerId += 1
+        if player.room is not None:
+            self.__leave(player, player.room)
+        self.__enter(player, room)
+        self.players.add(player)
+        if self.controller.changeLog is not None:
+            self.controller.changeLog.playerMoved(player)
+
+    def remove(self, player):
+        if player not in self.players:
+            return False
+        self.__leave(player, player.room)
+        player.room = None
+        self.players.discard(player)
+        self.spatialIndex.remove(player)
+        if self.controller.changeLog is not None:
+            self.controller.changeLog.playerMoved(player)
+        return True
+
+    # moves player through one exit. returns the new room, or None if there is no exit that way
+    def move(self, player, direction):
+        if player not in self.players:
+            raise ValueError("player has not been placed on this map")
+        if direction not in MOVE_ATTRIBUTES:
+            raise ValueError(f"{direction!r} is not a direction")
+        room = player.room
+        nextRoom = getattr(room, MOVE_ATTRIBUTES[direction])
+        if nextRoom is None:
+            return None
+        self.__leave(player, room)
+        self.__enter(player, nextRoom)
+        if self.controller.changeLog is not None:
+            self.controller.changeLog.playerMoved(player)
+        return nextRoom
+
+    # applies a tick's worth of (player, direction) moves in order and returns (moved, blocked) counts.
+    # same rules as move, with the bookkeeping inlined and looked up once. when results is a list, the
+    # new room (or None when blocked) of every move is appended to it
+    def applyMoves(self, moves, results=None):
+        players = self.players
+        occupiedRooms = self.controller.occupiedRooms
+        emptyRooms = self.controller.emptyRooms
+        attributes = MOVE_ATTRIBUTES
+        updateIndex = self.spatialIndex.update
+        changeLog = self.controller.changeLog
+        # snapshots don't change during the loop: taking one is the writer's job
+        preserveRoom = self.controller.preserveRoom if self.controller.snapshots else None
+        moved = 0
+        blocked = 0
+        # the whole batch is checked first, so a bad entry rejects it before any player has moved
+        if not isinstance(moves, (list, tuple)):
+            moves = list(moves)
+        for player, direction in moves:
+            if player not in players:
+                raise ValueError("player has not been placed on this map")
+            if direction not in attributes:
+                raise ValueError(f"{direction!r} is not a direction")
+        for player, direction in moves:
+            room = player.room
+            nextRoom = getattr(room, attributes[direction])
+            if nextRoom is None:
+                blocked += 1
+                if results is not None:
+                    results.append(None)
+                continue
+            if preserveRoom is not None:
+                preserveRoom(room)
+                preserveRoom(nextRoom)
+            roomPlayers = room.players
+            roomPlayers.discard(player)
+            if not roomPlayers:
+                occupiedRooms.discard(room)
+                emptyRooms.add(room)
+            if not nextRoom.players:
+                emptyRooms.discard(nextRoom)
+                occupiedRooms.add(nextRoom)
+            nextRoom.players.add(player)
+            player.room = nextRoom
+            player.position = nextRoom.position
+            updateIndex(player)
+            if changeLog is not None:
+                changeLog.playerMoved(player)
+            moved += 1
+            if results is not None:
+                results.append(nextRoom)
+        if moved:
+            self.controller.version += 1
+        return (moved, blocked)
+
+    def populationOf(self, room):
+        return len(room.players)
+
+    def playersNear(self, x, y, radius):
+        return self.spatialIndex.playersNear(x, y, radius)
+
+    def playersWithinRooms(self, room, steps):
+        return self.spatialIndex.playersWithinRooms(room, steps)
+
+    def __enter(self, player, room):
+        self.__beforeWrite(room)
+        if not room.players:
+            self.controller.emptyRooms.discard(room)
+            self.controller.occupiedRooms.add(room)
+        room.players.add(player)
+        player.room = room
+        player.position = room.position
+        self.spatialIndex.update(player)
+
+    def __leave(self, player, room):
+        self.__beforeWrite(room)
+        room.players.discard(player)
+        if not room.players:
+            self.controller.occupiedRooms.discard(room)
+            self.controller.emptyRooms.add(room)
+
+    def __beforeWrite(self, room):
+        self.controller.version += 1
+        if self.controller.snapshots:
+            self.controller.preserveRoom(room)
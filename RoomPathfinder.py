@@ -0,0 +1,148 @@
+from collections import OrderedDict
+from CardinalDirection import CardinalDirection
+from WorkQueue import PriorityQueue
+
+# Breadth-first distances from one source room. order lists every reachable room by
+# nondecreasing distance, so nearest-room queries are a scan of order instead of a new search.
+class DistanceField():
+    def __init__(self, source):
+        self.source = source
+        self.distances = {source: 0}
+        self.parents = {source: None}
+        self.order = [source]
+
+        distances = self.distances
+        parents = self.parents
+        order = self.order
+        index = 0
+        while index < len(order):
+            room = order[index]
+            index += 1
+            distance = distances[room] + 1
+            for neighbor in (room.north, room.south, room.east, room.west):
+                if neighbor is not None and neighbor not in distances:
+                    distances[neighbor] = distance
+                    parents[neighbor] = room
+                    order.append(neighbor)
+
+    def __len__(self):
+        return len(self.order)
+
+    def distanceTo(self, room):
+        return self.distances.get(room)
+
+    # rooms from the source to room, both included, or None if room is unreachable
+    def pathTo(self, room):
+        if room not in self.parents:
+            return None
+        path = []
+        while room is not None:
+            path.append(room)
+            room = self.parents[room]
+        path.reverse()
+        return path
+
+    # closest reachable room for which predicate is true. the source itself is only a candidate with
+    # includeSource, so by default this is the nearest other room
+    def nearest(self, predicate, includeSource=False):
+        for room in self.order[0 if includeSource else 1:]:
+            if predicate(room):
+                return room
+        return None
+
+
+# Pathfinding and cached distance fields over a RoomController's room graph. Fields are kept in a
+# small LRU and dropped whenever the controller reports a graph change through invalidate().
+class RoomPathfinder():
+    def __init__(self, controller, maxCachedFields=16):
+        self.controller = controller
+        self.maxCachedFields = maxCachedFields
+        self.fields = OrderedDict()
+
+    def invalidate(self):
+        self.fields.clear()
+
+    def distanceField(self, room=None):
+        if room is None:
+            room = self.controller.spawnRoom
+        field = self.fields.get(room)
+        if field is not None:
+            self.fields.move_to_end(room)
+            return field
+        field = DistanceField(room)
+        self.fields[room] = field
+        if len(self.fields) > self.maxCachedFields:
+            self.fields.popitem(last=False)
+        return field
+
+    # uses a cached field for fromRoom when there is one, otherwise a breadth-first search that stops at toRoom
+    def shortestPath(self, fromRoom, toRoom):
+        field = self.fields.get(fromRoom)
+        if field is not None:
+            return field.pathTo(toRoom)
+
+        parents = {fromRoom: None}
+        frontier = [fromRoom]
+        index = 0
+        while index < len(frontier):
+            room = frontier[index]
+            index += 1
+            if room is toRoom:
+                return self.__walkBack(parents, toRoom)
+            for neighbor in (room.north, room.south, room.east, room.west):
+                if neighbor is not None and neighbor not in parents:
+                    parents[neighbor] = room
+                    frontier.append(neighbor)
+        return None
+
+    # A* guided by the Manhattan distance between room positions, which never overestimates on the grid
+    def aStarPath(self, fromRoom, toRoom):
+        goal = toRoom.position
+        parents = {fromRoom: None}
+        costs = {fromRoom: 0}
+        openRooms = PriorityQueue()
+        openRooms.enqueue(fromRoom, 0)
+        while openRooms:
+            room = openRooms.dequeue()
+            if room is toRoom:
+                return self.__walkBack(parents, toRoom)
+            cost = costs[room] + 1
+            for neighbor in (room.north, room.south, room.east, room.west):
+                if neighbor is not None and cost < costs.get(neighbor, cost + 1):
+                    costs[neighbor] = cost
+                    parents[neighbor] = room
+                    position = neighbor.position
+                    # re-queueing a room that is already open lowers its priority in place
+                    openRooms.enqueue(neighbor, cost + abs(position.x - goal.x) + abs(position.y - goal.y))
+        return None
+
+    def distanceBetween(self, fromRoom, toRoom):
+        return self.distanceField(fromRoom).distanceTo(toRoom)
+
+    def nearestRoom(self, fromRoom, predicate, includeSource=False):
+        return self.distanceField(fromRoom).nearest(predicate, includeSource)
+
+    # directions a player in fromRoom has to take to reach toRoom, or None if it can't be reached
+    def directionsBetween(self, fromRoom, toRoom):
+        path = self.shortestPath(fromRoom, toRoom)
+        if path is None:
+            return None
+        directions = []
+        for room, nextRoom in zip(path, path[1:]):
+            if room.north is nextRoom:
+                directions.append(CardinalDirection.NORTH)
+            elif room.south is nextRoom:
+                directions.append(CardinalDirection.SOUTH)
+            elif room.east is nextRoom:
+                directions.append(CardinalDirection.EAST)
+            else:
+                directions.append(CardinalDirection.WEST)
+        return directions
+
+    def __walkBack(self, parents, room):
+        path = []
+        while room is not None:
+            path.append(room)
+            room = parents[room]
+        path.reverse()
+        return path
@@ -0,0 +1,218 @@
+from GridPosition import packCoordinates
+from MapSnapshot import MapSnapshot, RECORD, encodeSnapshot
+from RoomOccupancy import MOVE_ATTRIBUTES
+from array import array
+from bisect import bisect_left
+from multiprocessing import resource_tracker, shared_memory
+import mmap
+import struct
+import sys
+
+# A read-only map that several worker processes on one host share instead of each building its own
+# RoomController. The map is written once, into a multiprocessing.shared_memory block or a file, and
+# every worker attaches to the same bytes without copying them:
+#
+#   header    magic, then offset and size of each section
+#   snapshot  a MapSnapshot of the map (records of x, y and exit indexes, ids, names and rewards)
+#   cells     sorted packed cell coordinates and the record index of the room on each cell
+#   ids       sorted room ids and their record indexes, when every id is an unsigned 64-bit int
+#
+# The cell and id tables are written in native byte order (they never leave the host) and read as
+# memoryview casts, so roomAt and roomWithId are binary searches over the shared bytes. Rooms are the
+# snapshot's LazyRoom views, made the first time they are reached. Everything that changes while the
+# server runs stays in the worker: players, and each view's players set.
+
+MAGIC = b"RSHW"
+HEADER = struct.Struct("<4s4xQQQQQQ")
+ALIGNMENT = 8
+# SharedMemory(track=False) is new in 3.13
+UNTRACKED_ATTACH = sys.version_info >= (3, 13)
+
+
+def encodeSharedWorld(controller):
+    rooms = list(controller.rooms)
+    roomIndexes = {room: index for index, room in enumerate(rooms)}
+    snapshot = encodeSnapshot(controller, rooms)
+
+    # the room the grid holds for each cell, so overlapping rooms resolve the same way roomAt does
+    cells = sorted((packCoordinates(room.position.x, room.position.y), roomIndexes[room])
+                   for room in (controller.roomAt(position.x, position.y) for position in controller.roomCoordinates))
+    cellKeys = array("Q", [key for key, _ in cells]).tobytes()
+    cellRooms = array("I", [index for _, index in cells]).tobytes()
+
+    if all(type(room.id) is int and 0 <= room.id < 1 << 64 for room in rooms):
+        ids = sorted((room.id, index) for index, room in enumerate(rooms))
+    else:
+        ids = []
+    idKeys = array("Q", [roomId for roomId, _ in ids]).tobytes()
+    idRooms = array("I", [index for _, index in ids]).tobytes()
+
+    sections = []
+    offsets = []
+    offset = HEADER.size
+    for data in (snapshot, cellKeys, cellRooms, idKeys, idRooms):
+        padding = -offset % ALIGNMENT
+        sections.append(bytes(padding))
+        sections.append(data)
+        offsets.append(offset + padding)
+        offset += padding + len(data)
+    # cell and id rooms follow their keys directly: 8-byte keys keep them aligned
+    header = HEADER.pack(MAGIC, offsets[0], len(snapshot), offsets[1], len(cells), offsets[3], len(ids))
+    return b"".join([header] + sections)
+
+
+def writeSharedWorld(controller, path):
+    with open(path, "wb") as fp:
+        fp.write(encodeSharedWorld(controller))
+
+
+class SharedWorld():
+    # copies controller's map into a new shared memory block. the creating process owns the block and
+    # unlinks it on close(); workers attach() by name
+    @staticmethod
+    def create(controller, name=None):
+        data = encodeSharedWorld(controller)
+        block = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+        block.buf[:len(data)] = data
+        return SharedWorld(block.buf, block, owner=True)
+
+    @staticmethod
+    def attach(name):
+        # attaching registers the block with this process's resource tracker, which unlinks everything
+        # registered with it when it shuts down, so the block would vanish when the worker exits. 3.13
+        # attaches untracked; older versions take the registration back off, under the "/"-prefixed
+        # POSIX name the tracker knows blocks by. before 3.13 a worker that shares the creator's tracker
+        # (any worker started through multiprocessing) takes the creator's registration off as well, so
+        # the block is then only unlinked by the owner's close(), not by the tracker if the owner dies
+        if UNTRACKED_ATTACH:
+            block = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            block = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister("/" + block.name, "shared_memory")
+        return SharedWorld(block.buf, block)
+
+    # a file written by writeSharedWorld, memory-mapped
+    @staticmethod
+    def open(path):
+        with open(path, "rb") as fp:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return SharedWorld(mapped)
+
+    def __init__(self, buffer, block=None, owner=False):
+        self.buffer = buffer
+        self.block = block
+        self.owner = owner
+        self.view = memoryview(buffer)
+        magic, snapshotOffset, snapshotSize, cellsOffset, cellCount, idsOffset, idCount = HEADER.unpack_from(self.view, 0)
+        if magic != MAGIC:
+            raise ValueError("not a shared world")
+        self.snapshotView = self.view[snapshotOffset:snapshotOffset + snapshotSize]
+        self.snapshot = MapSnapshot(self.snapshotView)
+        # x, y, north, south, east, west, name, itemReward per room; see MapSnapshot
+        records = self.snapshot.recordsOffset
+        self.records = self.snapshot.view[records:records + RECORD.size * self.snapshot.roomCount].cast("i")
+        self.cellKeys = self.view[cellsOffset:cellsOffset + 8 * cellCount].cast("Q")
+        self.cellRooms = self.view[cellsOffset + 8 * cellCount:cellsOffset + 12 * cellCount].cast("I")
+        self.idKeys = self.view[idsOffset:idsOffset + 8 * idCount].cast("Q")
+        self.idRooms = self.view[idsOffset + 8 * idCount:idsOffset + 12 * idCount].cast("I")
+        # only built when ids aren't 64-bit ints and so have no shared table
+        self.indexesById = None
+        self.players = set()
+
+    def __len__(self):
+        return self.snapshot.roomCount
+
+    @property
+    def name(self):
+        return self.block.name if self.block is not None else None
+
+    @property
+    def spawnRoom(self):
+        return self.snapshot.spawnRoom
+
+    def room(self, index):
+        return self.snapshot.room(index)
+
+    def iterRooms(self):
+        return self.snapshot.iterRooms()
+
+    def position(self, index):
+        return (self.records[8 * index], self.records[8 * index + 1])
+
+    # record indexes of the north, south, east and west neighbors, -1 where there is no exit
+    def exitIndexes(self, index):
+        return tuple(self.records[8 * index + 2:8 * index + 6])
+
+    def roomAt(self, x, y):
+        key = packCoordinates(x, y)
+        slot = bisect_left(self.cellKeys, key)
+        if slot < len(self.cellKeys) and self.cellKeys[slot] == key:
+            return self.room(self.cellRooms[slot])
+        return None
+
+    def roomWithId(self, roomId):
+        if len(self.idKeys):
+            if type(roomId) is not int or not 0 <= roomId < 1 << 64:
+                return None
+            slot = bisect_left(self.idKeys, roomId)
+            if slot < len(self.idKeys) and self.idKeys[slot] == roomId:
+                return self.room(self.idRooms[slot])
+            return None
+        if self.indexesById is None:
+            self.indexesById = {self.snapshot.roomId(index): index for index in range(len(self))}
+        index = self.indexesById.get(roomId)
+        return None if index is None else self.room(index)
+
+    # players live in this process only
+    def place(self, player, room=None):
+        if room is None:
+            room = self.spawnRoom
+        if player.room is not None:
+            player.room.players.discard(player)
+        room.players.add(player)
+        player.room = room
+        player.position = room.position
+        self.players.add(player)
+
+    def remove(self, player):
+        if player not in self.players:
+            return False
+        player.room.players.discard(player)
+        player.room = None
+        self.players.discard(player)
+        return True
+
+    # moves player through one exit. returns the new room, or None when there is no exit that way
+    def move(self, player, direction):
+        if player not in self.players:
+            raise ValueError("player has not been placed in this world")
+        if direction not in MOVE_ATTRIBUTES:
+            raise ValueError(f"{direction!r} is not a direction")
+        nextRoom = getattr(player.room, MOVE_ATTRIBUTES[direction])
+        if nextRoom is None:
+            return None
+        player.room.players.discard(player)
+        nextRoom.players.add(player)
+        player.room = nextRoom
+        player.position = nextRoom.position
+        return nextRoom
+
+    # detaches; the owner also frees the shared block. rooms from this world must not be used afterwards
+    def close(self):
+        for player in self.players:
+            player.room = None
+        self.players = set()
+        for view in (self.records, self.cellKeys, self.cellRooms, self.idKeys, self.idRooms):
+            view.release()
+        self.snapshot.close()
+        self.snapshotView.release()
+        self.view.release()
+        if self.block is not None:
+            self.block.close()
+            if self.owner:
+                # an attach sharing this tracker may have taken the registration off, and unlink takes it off again
+                if not UNTRACKED_ATTACH:
+                    resource_tracker.register("/" + self.block.name, "shared_memory")
+                self.block.unlink()
+        elif isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
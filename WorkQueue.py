@@ -0,0 +1,253 @@
+from abc import ABC, abstractmethod
+import heapq
+import random
+
+# Work queues for generation and pathfinding. Every variant shares the same interface:
+#
+#   enqueue(value)   adds value; returns False (and does nothing) if unique and value is already queued
+#   dequeue()        removes and returns the next value, or None when empty
+#   peek()           the value dequeue would return, without removing it
+#   len(queue), value in queue, clear()
+#
+# With unique=True (the default) each queue tracks its members in a set, so membership checks are
+# O(1) and a value can't be queued twice. Values must then be hashable.
+
+class WorkQueue(ABC):
+    def __init__(self, unique=True):
+        self.members = set() if unique else None
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __contains__(self, value):
+        if self.members is not None:
+            return value in self.members
+        return any(item is value or item == value for item in self.values())
+
+    # the queued values, in no particular order
+    @abstractmethod
+    def values(self):
+        pass
+
+
+# First in, first out, on a ring buffer that doubles when full
+class FIFOQueue(WorkQueue):
+    def __init__(self, unique=True, capacity=16):
+        WorkQueue.__init__(self, unique)
+        size = 1
+        while size < capacity:
+            size *= 2
+        self.storage = [None] * size
+        self.mask = size - 1
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def enqueue(self, value):
+        members = self.members
+        if members is not None:
+            if value in members:
+                return False
+            members.add(value)
+        if self.count > self.mask:
+            self.grow()
+        self.storage[(self.head + self.count) & self.mask] = value
+        self.count += 1
+        return True
+
+    def dequeue(self):
+        if self.count == 0:
+            return None
+        head = self.head
+        value = self.storage[head]
+        self.storage[head] = None
+        self.head = (head + 1) & self.mask
+        self.count -= 1
+        if self.members is not None:
+            self.members.discard(value)
+        return value
+
+    def peek(self):
+        return self.storage[self.head] if self.count else None
+
+    def grow(self):
+        head = self.head
+        # unroll the ring so the oldest value sits at index 0 of the larger buffer
+        self.storage = self.storage[head:] + self.storage[:head] + [None] * len(self.storage)
+        self.mask = len(self.storage) - 1
+        self.head = 0
+
+    def values(self):
+        return [self.storage[(self.head + index) & self.mask] for index in range(self.count)]
+
+    def clear(self):
+        self.storage = [None] * len(self.storage)
+        self.head = 0
+        self.count = 0
+        if self.members is not None:
+            self.members.clear()
+
+
+# Last in, first out
+class LIFOQueue(WorkQueue):
+    def __init__(self, unique=True):
+        WorkQueue.__init__(self, unique)
+        self.storage = []
+
+    def __len__(self):
+        return len(self.storage)
+
+    def enqueue(self, value):
+        members = self.members
+        if members is not None:
+            if value in members:
+                return False
+            members.add(value)
+        self.storage.append(value)
+        return True
+
+    def dequeue(self):
+        if not self.storage:
+            return None
+        value = self.storage.pop()
+        if self.members is not None:
+            self.members.discard(value)
+        return value
+
+    def peek(self):
+        return self.storage[-1] if self.storage else None
+
+    def values(self):
+        return list(reversed(self.storage))
+
+    def clear(self):
+        self.storage = []
+        if self.members is not None:
+            self.members.clear()
+
+
+# Lowest priority first, ties in insertion order. With unique=True, enqueueing a queued value with a
+# lower priority moves it up (the old heap entry is left behind and skipped when it surfaces);
+# a higher or equal priority is ignored.
+class PriorityQueue(WorkQueue):
+    REMOVED = object()
+
+    def __init__(self, unique=True):
+        WorkQueue.__init__(self, unique)
+        self.heap = []
+        self.entries = {} if unique else None
+        self.counter = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, value):
+        if self.entries is not None:
+            return value in self.entries
+        return WorkQueue.__contains__(self, value)
+
+    def enqueue(self, value, priority=0):
+        entries = self.entries
+        if entries is not None:
+            entry = entries.get(value)
+            if entry is not None:
+                if priority >= entry[0]:
+                    return False
+                entry[2] = PriorityQueue.REMOVED
+                self.count -= 1
+        self.counter += 1
+        entry = [priority, self.counter, value]
+        if entries is not None:
+            entries[value] = entry
+        heapq.heappush(self.heap, entry)
+        self.count += 1
+        return True
+
+    def dequeueWithPriority(self):
+        heap = self.heap
+        while heap:
+            priority, _, value = heapq.heappop(heap)
+            if value is not PriorityQueue.REMOVED:
+                if self.entries is not None:
+                    del self.entries[value]
+                self.count -= 1
+                return (priority, value)
+        return None
+
+    def dequeue(self):
+        entry = self.dequeueWithPriority()
+        return entry[1] if entry else None
+
+    def peek(self):
+        heap = self.heap
+        while heap and heap[0][2] is PriorityQueue.REMOVED:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+
+    def priorityOf(self, value):
+        entry = self.entries.get(value) if self.entries is not None else None
+        return entry[0] if entry else None
+
+    def values(self):
+        return [entry[2] for entry in sorted(self.heap) if entry[2] is not PriorityQueue.REMOVED]
+
+    def clear(self):
+        self.heap = []
+        self.count = 0
+        if self.entries is not None:
+            self.entries.clear()
+
+
+# Dequeues a uniformly random member: the picked slot is swapped with the last one and popped
+class RandomizedQueue(WorkQueue):
+    def __init__(self, unique=True, rng=None):
+        WorkQueue.__init__(self, unique)
+        self.storage = []
+        self.rng = rng or random.Random()
+        self.nextIndex = None
+
+    def __len__(self):
+        return len(self.storage)
+
+    def enqueue(self, value):
+        members = self.members
+        if members is not None:
+            if value in members:
+                return False
+            members.add(value)
+        self.storage.append(value)
+        self.nextIndex = None
+        return True
+
+    def dequeue(self):
+        storage = self.storage
+        if not storage:
+            return None
+        index = self.nextIndex if self.nextIndex is not None else self.rng.randrange(len(storage))
+        self.nextIndex = None
+        value = storage[index]
+        storage[index] = storage[-1]
+        storage.pop()
+        if self.members is not None:
+            self.members.discard(value)
+        return value
+
+    # draws the next pick now, so the following dequeue returns the same value
+    def peek(self):
+        if not self.storage:
+            return None
+        if self.nextIndex is None:
+            self.nextIndex = self.rng.randrange(len(self.storage))
+        return self.storage[self.nextIndex]
+
+    def values(self):
+        return list(self.storage)
+
+    def clear(self):
+        self.storage = []
+        self.nextIndex = None
+        if self.members is not None:
+            self.members.clear()
@@ -0,0 +1,64 @@
+from MapSnapshot import MapSnapshot, encodeSnapshot
+from RoomController import RoomController
+from concurrent.futures import ProcessPoolExecutor
+import time
+
+# Batch generation of many independent worlds, e.g. pre-generated dungeon instances. Each job is a
+# (seed, roomLimit) pair; every job produces a WorldResult, including the ones that fail.
+
+class WorldResult():
+    def __init__(self, seed, roomLimit, snapshot=None, roomCount=0, error=None, elapsed=0.0):
+        self.seed = seed
+        self.roomLimit = roomLimit
+        # the world as MapSnapshot bytes, or None if generation failed
+        self.snapshot = snapshot
+        self.roomCount = roomCount
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def controller(self):
+        return MapSnapshot(self.snapshot).toController()
+
+    def __repr__(self):
+        status = f"{self.roomCount} rooms" if self.ok else f"failed: {self.error}"
+        return f"WorldResult(seed={self.seed!r}, roomLimit={self.roomLimit}, {status})"
+
+
+# generates one world. never raises: errors are reported on the result. module level so pools can pickle it
+def generateWorld(job):
+    seed, roomLimit = job
+    start = time.perf_counter()
+    try:
+        controller = RoomController(roomLimit, generate=False)
+        controller.generateRooms(seed, strict=True)
+        snapshot = encodeSnapshot(controller)
+    except Exception as error:
+        return WorldResult(seed, roomLimit, error=f"{type(error).__name__}: {error}", elapsed=time.perf_counter() - start)
+    return WorldResult(seed, roomLimit, snapshot, len(controller.rooms), elapsed=time.perf_counter() - start)
+
+
+# yields a WorldResult per job, in job order. workers=1 runs in this process; None uses every core
+def iterWorlds(jobs, workers=None, chunksize=16):
+    if workers == 1:
+        for job in jobs:
+            yield generateWorld(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(generateWorld, jobs, chunksize=chunksize)
+
+
+# feeds every result to sink as soon as it is ready and returns (succeeded, failed) counts
+def generateWorlds(jobs, sink, workers=None, chunksize=16):
+    succeeded = 0
+    failed = 0
+    for result in iterWorlds(jobs, workers, chunksize):
+        if result.ok:
+            succeeded += 1
+        else:
+            failed += 1
+        sink(result)
+    return (succeeded, failed)
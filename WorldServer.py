@@ -0,0 +1,237 @@
+from CardinalDirection import CardinalDirection, EXIT_DIRECTIONS
+from RoomOccupancy import MOVE_ATTRIBUTES
+import asyncio
+
+# Asyncio front end that owns a RoomController. Commands are queued as they arrive and applied together
+# once per tick, so game code never touches the controller between ticks and the controller never has to
+# be thread- or task-safe. Within a tick joins run first, then every move in arrival order as one
+# applyMoves batch, then looks, exit lists and leaves, which therefore see the state after the moves.
+#
+# Subscribers get one TickUpdate per tick that changed something.
+
+JOIN = "join"
+MOVE = "move"
+LOOK = "look"
+EXITS = "exits"
+LEAVE = "leave"
+
+
+class TickUpdate():
+    def __init__(self, tick, moves, joined, left):
+        self.tick = tick
+        # (player, fromRoom, toRoom) for every move that went through
+        self.moves = moves
+        self.joined = joined
+        self.left = left
+
+    def __repr__(self):
+        return f"TickUpdate(tick={self.tick}, moves={len(self.moves)}, joined={len(self.joined)}, left={len(self.left)})"
+
+
+class WorldServer():
+    def __init__(self, controller, tickInterval=0.05, subscriberBacklog=64):
+        self.controller = controller
+        self.tickInterval = tickInterval
+        self.subscriberBacklog = subscriberBacklog
+        self.tick = 0
+        self.pending = []
+        self.subscribers = set()
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        # whatever arrived after the last tick still gets answered
+        self.runTick()
+
+    # ticks on a fixed schedule; a tick that overruns pushes the next one back instead of bunching up
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            deadline += self.tickInterval
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                deadline = loop.time()
+            try:
+                self.runTick()
+            except Exception:
+                # runTick already failed that tick's futures with the error; the next tick starts clean
+                pass
+
+    # queues a command and returns a future for its result, resolved at the next tick
+    def submit(self, player, command, argument=None):
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((player, command, argument, future))
+        return future
+
+    def subscribe(self):
+        queue = asyncio.Queue(self.subscriberBacklog)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    # applies every queued command. synchronous, so tests and tools can drive ticks by hand. if applying
+    # raises, every future of the tick still unanswered gets the error before it propagates
+    def runTick(self):
+        commands = self.pending
+        self.pending = []
+        self.tick += 1
+        if not commands:
+            return None
+        try:
+            return self.__applyCommands(commands)
+        except Exception as error:
+            for _, _, _, future in commands:
+                self.__fail(future, error)
+            raise
+
+    def __applyCommands(self, commands):
+        players = self.controller.occupancy.players
+        joined = []
+        # joins go first, so a move that arrived ahead of its player's join in the same tick still counts
+        for player, kind, argument, future in commands:
+            if kind == JOIN:
+                self.__resolve(future, self.__join, player, argument, joined)
+
+        moves = []
+        moveFutures = []
+        rest = []
+        for command in commands:
+            player, kind, argument, future = command
+            if kind == JOIN:
+                continue
+            if kind == MOVE:
+                # rejected up front so the batch itself can't fail halfway through
+                if player not in players:
+                    self.__fail(future, ValueError("player has not joined"))
+                elif argument not in MOVE_ATTRIBUTES:
+                    self.__fail(future, ValueError(f"{argument!r} is not a direction"))
+                else:
+                    moves.append((player, argument))
+                    moveFutures.append(future)
+            else:
+                rest.append(command)
+
+        # a player can move more than once per tick, so each move starts where the previous one ended
+        rooms = {player: player.room for player, _ in moves}
+        results = []
+        self.controller.applyMoves(moves, results)
+        movedTo = []
+        for (player, _), toRoom, future in zip(moves, results, moveFutures):
+            if toRoom is not None:
+                movedTo.append((player, rooms[player], toRoom))
+                rooms[player] = toRoom
+            if not future.done():
+                future.set_result(toRoom)
+
+        left = []
+        for player, kind, argument, future in rest:
+            if kind == LOOK:
+                self.__resolve(future, self.look, player)
+            elif kind == EXITS:
+                self.__resolve(future, self.exits, player)
+            elif kind == LEAVE:
+                self.__resolve(future, self.__leave, player, left)
+            else:
+                self.__fail(future, ValueError(f"unknown command {kind!r}"))
+
+        update = None
+        if movedTo or joined or left:
+            update = TickUpdate(self.tick, movedTo, joined, left)
+            self.publish(update)
+        return update
+
+    # slow subscribers lose their oldest updates rather than holding up the tick
+    def publish(self, update):
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(update)
+
+    # area-of-interest fan-out: for every player within radius rooms of either end of a move, the moves
+    # they should hear about. costs one spatial query per move, not a scan over every player
+    def audience(self, update, radius):
+        controller = self.controller
+        interested = {}
+        for move in update.moves:
+            _, fromRoom, toRoom = move
+            listeners = set(controller.playersNear(toRoom, radius))
+            listeners.update(controller.playersNear(fromRoom, radius))
+            for listener in listeners:
+                interested.setdefault(listener, []).append(move)
+        return interested
+
+    def look(self, player):
+        room = player.room
+        if room is None:
+            raise ValueError("player has not joined")
+        return {"name": room.name, "id": room.id, "position": room.position.toArray(),
+                "exits": self.exits(player), "players": len(room.players), "itemReward": room.itemReward}
+
+    def exits(self, player):
+        if player.room is None:
+            raise ValueError("player has not joined")
+        return sorted(direction.name.lower() for direction in EXIT_DIRECTIONS[player.room.exits])
+
+    def __join(self, player, room, joined):
+        self.controller.placePlayer(player, room)
+        joined.append(player)
+        return player.room
+
+    def __leave(self, player, left):
+        removed = self.controller.removePlayer(player)
+        if removed:
+            left.append(player)
+        return removed
+
+    def __resolve(self, future, function, *arguments):
+        try:
+            result = function(*arguments)
+        except Exception as error:
+            self.__fail(future, error)
+            return
+        if not future.done():
+            future.set_result(result)
+
+    def __fail(self, future, error):
+        if not future.done():
+            future.set_exception(error)
+
+
+# In-process client for tests and load runs: every call goes through the server's command queue and
+# waits for the tick that answers it, exactly like a networked client would.
+class LocalClient():
+    def __init__(self, server, player):
+        self.server = server
+        self.player = player
+
+    def join(self, room=None):
+        return self.server.submit(self.player, JOIN, room)
+
+    def move(self, direction):
+        if isinstance(direction, str):
+            direction = CardinalDirection[direction.upper()]
+        return self.server.submit(self.player, MOVE, direction)
+
+    def look(self):
+        return self.server.submit(self.player, LOOK)
+
+    def exits(self):
+        return self.server.submit(self.player, EXITS)
+
+    def leave(self):
+        return self.server.submit(self.player, LEAVE)
@@ -0,0 +1,543 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from RoomController import RoomController
+from RoomJSONStream import dumpController, loadController
+from MapSnapshot import MapSnapshot, writeSnapshot
+from SharedWorld import SharedWorld
+from ChunkedWorldGenerator import ChunkedWorldGenerator
+from LazyWorld import LazyWorld
+from GenerationCache import GenerationCache
+from WorldBatch import generateWorlds
+from WorkQueue import FIFOQueue, LIFOQueue, PriorityQueue, RandomizedQueue
+from DoublyLinkedList import DoublyLinkedList
+from MapRenderer import MapRenderer
+from Player import Player
+from CardinalDirection import CardinalDirection
+from WorldServer import WorldServer, LocalClient
+from GenerationProfiler import GenerationProfiler
+from GenerationStrategy import QueueStrategy, WeightedStrategy, CorridorStrategy, HubStrategy, OutwardStrategy
+from MapSnapshot import encodeSnapshot
+from ChangeLog import encodeChanges
+import asyncio
+import random
+import statistics
+import sys
+import threading
+
+# run with `python benchmarks.py`. each benchmark prints one line per map size.
+# `python benchmarks.py --suite [results.json]` runs only the timed suite, `--profile` a profiled generation.
+
+def benchmarkGeneration(sizes=(1000, 10000, 100000), seed=1):
+    controller = RoomController(1)
+    for size in sizes:
+        controller.roomLimit = size
+        start = time.perf_counter()
+        controller.generateRooms(seed)
+        elapsed = time.perf_counter() - start
+        print(f"generateRooms {size:>8} rooms: {elapsed:8.3f}s {len(controller.rooms) / elapsed:12.0f} rooms/s")
+
+
+def benchmarkChunkedGeneration(sizes=(100000, 1000000), workerCounts=(1, 4), seed=1):
+    generator = ChunkedWorldGenerator(seed)
+    for size in sizes:
+        for workers in workerCounts:
+            start = time.perf_counter()
+            controller = generator.generate(size, workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"chunked generate {size:>8} rooms, {workers} worker(s): {elapsed:8.3f}s {len(controller.rooms) / elapsed:12.0f} rooms/s")
+
+
+# worlds sized like testGenerateQuickTestJSON's, 10 to 500 rooms
+def benchmarkWorldBatch(worldCounts=(1000,), workerCounts=(1, None), seed=1):
+    rng = random.Random(seed)
+    for count in worldCounts:
+        jobs = [(rng.getrandbits(32), rng.randint(10, 500)) for _ in range(count)]
+        for workers in workerCounts:
+            rooms = []
+            start = time.perf_counter()
+            generateWorlds(jobs, lambda result: rooms.append(result.roomCount), workers=workers)
+            elapsed = time.perf_counter() - start
+            label = "all cores" if workers is None else f"{workers} worker(s)"
+            print(f"generateWorlds {count:>6} worlds, {label}: {elapsed:8.3f}s {count / elapsed:10.1f} worlds/s {sum(rooms) / elapsed:10.0f} rooms/s")
+
+
+# the DoublyLinkedList-backed queue generateRooms used before WorkQueue
+class LinkedListQueue():
+    def __init__(self):
+        self.storage = DoublyLinkedList()
+
+    def enqueue(self, value):
+        self.storage.add_to_head(value)
+
+    def dequeue(self):
+        return self.storage.remove_from_tail()
+
+    def __len__(self):
+        return len(self.storage)
+
+
+# steady-state churn like generateRooms: keep about `depth` values queued while cycling `operations` through
+def benchmarkQueues(operations=200000, depth=1000):
+    values = [object() for _ in range(depth * 2)]
+    for label, makeQueue in (("DoublyLinkedList Queue", LinkedListQueue), ("FIFOQueue", FIFOQueue),
+                             ("FIFOQueue(unique=False)", lambda: FIFOQueue(unique=False)), ("LIFOQueue", LIFOQueue),
+                             ("PriorityQueue", PriorityQueue), ("RandomizedQueue", lambda: RandomizedQueue(rng=random.Random(1)))):
+        queue = makeQueue()
+        for value in values[:depth]:
+            queue.enqueue(value)
+        start = time.perf_counter()
+        for index in range(operations):
+            value = queue.dequeue()
+            queue.enqueue(value)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<24} {operations} dequeue+enqueue at depth {depth}: {elapsed:7.3f}s {operations / elapsed:12.0f} ops/s")
+
+
+# wall time of fn, then its peak traced allocation in a second, traced run
+def measure(fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def benchmarkJSONExport(sizes=(10000, 100000), seed=1):
+    controller = RoomController(1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rooms.json")
+
+        def dumpWhole():
+            with open(path, "w") as fp:
+                json.dump(controller.toDict(), fp)
+
+        def dumpStreaming():
+            with open(path, "w") as fp:
+                dumpController(controller, fp)
+
+        def loadWhole():
+            with open(path) as fp:
+                json.load(fp)
+
+        def loadStreaming():
+            with open(path) as fp:
+                loadController(fp)
+
+        for size in sizes:
+            controller.roomLimit = size
+            controller.generateRooms(seed)
+            for label, fn in (("json.dump(toDict())", dumpWhole), ("dumpController", dumpStreaming),
+                              ("json.load", loadWhole), ("loadController", loadStreaming)):
+                elapsed, peak = measure(fn)
+                print(f"{label:<20} {size:>8} rooms: {elapsed:8.3f}s peak {peak / 1e6:8.1f} MB")
+
+
+def benchmarkSnapshot(sizes=(10000, 100000), seed=1):
+    controller = RoomController(1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rooms.map")
+        jsonPath = os.path.join(directory, "rooms.json")
+        for size in sizes:
+            controller.roomLimit = size
+            controller.generateRooms(seed)
+            with open(jsonPath, "w") as fp:
+                dumpController(controller, fp)
+
+            start = time.perf_counter()
+            writeSnapshot(controller, path)
+            written = time.perf_counter()
+            snapshot = MapSnapshot.open(path)
+            snapshot.spawnRoom
+            opened = time.perf_counter()
+            snapshot.toController()
+            rebuilt = time.perf_counter()
+            snapshot.close()
+            print(f"snapshot {size:>8} rooms: {os.path.getsize(path) / 1e6:6.1f} MB (json {os.path.getsize(jsonPath) / 1e6:6.1f} MB)"
+                  f" write {written - start:7.3f}s open {(opened - written) * 1000:7.3f}ms toController {rebuilt - opened:7.3f}s")
+
+
+def benchmarkRendering(sizes=(10000, 100000), seed=1):
+    controller = RoomController(1)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            controller.roomLimit = size
+            controller.generateRooms(seed)
+            renderer = MapRenderer(controller)
+            width, height = renderer.imageSize()
+            with open(os.path.join(directory, "map.txt"), "w") as fp:
+                textSeconds, textPeak = measure(lambda: renderer.renderText(fp))
+            with open(os.path.join(directory, "map.png"), "wb") as fp:
+                pngSeconds, pngPeak = measure(lambda: renderer.writePNG(fp))
+            print(f"render {size:>8} rooms: text {textSeconds:7.3f}s peak {textPeak / 1e6:6.2f} MB,"
+                  f" png {width}x{height} {pngSeconds:7.3f}s peak {pngPeak / 1e6:6.2f} MB")
+
+
+def benchmarkRoomQueries(sizes=(10000, 100000), seed=1):
+    controller = RoomController(1)
+    for size in sizes:
+        controller.roomLimit = size
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        controller.generateRooms(seed)
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        start = time.perf_counter()
+        deadEnds = controller.deadEnds()
+        junctions = controller.junctions()
+        elapsed = time.perf_counter() - start
+        print(f"rooms {size:>8}: {(after - before) / size:6.0f} B/room (whole controller),"
+              f" {len(deadEnds)} dead ends and {len(junctions)} junctions in {elapsed * 1000:7.2f}ms")
+
+
+def benchmarkMovement(playerCount=10000, ticks=20, roomCount=100000, seed=1):
+    controller = RoomController(roomCount, seed=seed)
+    rng = random.Random(seed)
+    players = [Player() for _ in range(playerCount)]
+    for player in players:
+        controller.placePlayer(player)
+    directions = list(CardinalDirection)
+    ticksOfMoves = [[(player, rng.choice(directions)) for player in players] for _ in range(ticks)]
+    start = time.perf_counter()
+    moved = 0
+    for moves in ticksOfMoves:
+        moved += controller.applyMoves(moves)[0]
+    elapsed = time.perf_counter() - start
+    print(f"movement {playerCount:>6} players x {ticks} ticks: {playerCount * ticks / elapsed:10.0f} moves/s"
+          f" ({moved} moved, {len(controller.occupiedRooms)} rooms occupied)")
+
+
+# 10k simulated players, each sending a move, a look or an exit list and waiting for the answer before the next
+def benchmarkWorldServer(playerCount=10000, commandsPerPlayer=20, tickInterval=0.05, roomCount=100000, seed=1):
+    controller = RoomController(roomCount, seed=seed)
+    latencies = []
+
+    async def simulate(client, rng):
+        await client.join()
+        for _ in range(commandsPerPlayer):
+            roll = rng.random()
+            start = time.perf_counter()
+            if roll < 0.8:
+                await client.move(rng.choice(directions))
+            elif roll < 0.9:
+                await client.look()
+            else:
+                await client.exits()
+            latencies.append(time.perf_counter() - start)
+
+    async def run():
+        server = WorldServer(controller, tickInterval)
+        server.start()
+        rng = random.Random(seed)
+        clients = [LocalClient(server, Player()) for _ in range(playerCount)]
+        start = time.perf_counter()
+        await asyncio.gather(*(simulate(client, random.Random(rng.random())) for client in clients))
+        elapsed = time.perf_counter() - start
+        await server.stop()
+        return elapsed, server.tick
+
+    directions = list(CardinalDirection)
+    elapsed, ticks = asyncio.run(run())
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[len(latencies) * 99 // 100]
+    print(f"world server {playerCount:>6} players, {tickInterval * 1000:.0f}ms ticks: {len(latencies) / elapsed:9.0f} commands/s"
+          f" over {ticks} ticks, latency p50 {p50 * 1000:6.1f}ms p99 {p99 * 1000:6.1f}ms")
+
+
+# area-of-interest queries against a brute-force distance check over every player
+def benchmarkInterest(playerCounts=(1000, 10000, 50000), radius=8, queries=1000, roomCount=100000, seed=1):
+    controller = RoomController(roomCount, seed=seed)
+    rooms = list(controller.rooms)
+    for playerCount in playerCounts:
+        rng = random.Random(seed)
+        players = [Player() for _ in range(playerCount)]
+        for player in players:
+            controller.placePlayer(player, rng.choice(rooms))
+        centers = [rng.choice(rooms) for _ in range(queries)]
+        start = time.perf_counter()
+        found = sum(len(controller.playersNear(room, radius)) for room in centers)
+        indexed = time.perf_counter() - start
+        start = time.perf_counter()
+        for room in centers[:max(1, queries // 10)]:
+            [player for player in players if not player.position.distanceIsGreaterThan(room.position, radius)]
+        scanned = (time.perf_counter() - start) * queries / max(1, queries // 10)
+        print(f"interest {playerCount:>6} players: {indexed / queries * 1e6:8.1f}us/query indexed,"
+              f" {scanned / queries * 1e6:9.1f}us/query scanning ({found / queries:.1f} found per query)")
+        for player in players:
+            controller.removePlayer(player)
+
+
+# bytes a client one tick behind downloads, against a full toDict() dump
+def benchmarkChangeLog(roomCount=100000, playerCount=1000, ticks=10, seed=1):
+    controller = RoomController(roomCount, seed=seed)
+    controller.trackChanges()
+    rng = random.Random(seed)
+    players = [Player() for _ in range(playerCount)]
+    for player in players:
+        controller.placePlayer(player)
+    directions = list(CardinalDirection)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        version = controller.changeLog.version
+        controller.applyMoves([(player, rng.choice(directions)) for player in players])
+    elapsed = time.perf_counter() - start
+    delta = encodeChanges(controller.sync(version)["changes"])
+    full = json.dumps(controller.toDict()).encode("utf-8")
+    print(f"change log {playerCount} players x {ticks} ticks: {elapsed / ticks * 1000:6.2f}ms/tick,"
+          f" one-tick sync {len(delta) / 1e3:8.1f} KB vs full dump {len(full) / 1e6:6.1f} MB")
+
+
+# start-up and memory of an unbounded world while players wander out from spawn
+def benchmarkLazyWorld(playerCount=100, steps=2000, seed=1):
+    tracemalloc.start()
+    start = time.perf_counter()
+    world = LazyWorld(seed, maxLoadedChunks=64)
+    startup = time.perf_counter() - start
+    rng = random.Random(seed)
+    players = [Player() for _ in range(playerCount)]
+    for player in players:
+        world.place(player)
+    directions = list(CardinalDirection)
+    start = time.perf_counter()
+    for _ in range(steps):
+        for player in players:
+            world.move(player, rng.choice(directions))
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"lazy world: start-up {startup * 1e6:6.1f}us, {playerCount * steps / elapsed:9.0f} moves/s,"
+          f" {len(world.chunks)} chunks ({len(world)} rooms) loaded, {world.loads} loads, {world.evictions} evictions,"
+          f" memory {current / 1e6:6.1f} MB (peak {peak / 1e6:6.1f} MB)")
+
+
+def benchmarkGenerationCache(sizes=(10000, 100000), seed=1):
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            cache = GenerationCache(directory=directory)
+            start = time.perf_counter()
+            cache.get(seed, size)
+            generated = time.perf_counter()
+            cache.get(seed, size)
+            hit = time.perf_counter()
+            GenerationCache(directory=directory).get(seed, size)
+            loaded = time.perf_counter()
+            print(f"generation cache {size:>8} rooms: miss {generated - start:7.3f}s memory hit {hit - generated:7.3f}s"
+                  f" disk hit {loaded - hit:7.3f}s")
+
+
+def benchmarkAnalytics(sizes=(10000, 100000), seed=1):
+    for size in sizes:
+        controller = RoomController(size, seed=seed)
+        start = time.perf_counter()
+        analytics = controller.analytics()
+        exported = time.perf_counter()
+        metrics = analytics.metrics()
+        measured = time.perf_counter()
+        print(f"analytics {size:>8} rooms: export {exported - start:7.3f}s metrics {measured - exported:7.3f}s"
+              f" (diameter {metrics['diameter']}, dead ends {metrics['deadEndRatio']:.2f})")
+
+
+def benchmarkRouting(sizes=(100000, 1000000), queries=200, seed=1):
+    for size in sizes:
+        controller = RoomController(size, seed=seed)
+        rng = random.Random(seed)
+        reachable = controller.distanceField().order
+        pairs = [(rng.choice(reachable), rng.choice(reachable)) for _ in range(queries)]
+        start = time.perf_counter()
+        for fromRoom, toRoom in pairs:
+            controller.hierarchicalPath(fromRoom, toRoom)
+        cold = time.perf_counter()
+        for fromRoom, toRoom in pairs:
+            controller.hierarchicalPath(fromRoom, toRoom)
+        warm = time.perf_counter()
+        for fromRoom, toRoom in pairs:
+            controller.shortestPath(fromRoom, toRoom)
+        searched = time.perf_counter()
+        print(f"routing {size:>8} rooms: hierarchical {(cold - start) / queries * 1000:7.3f}ms cold {(warm - cold) / queries * 1000:7.3f}ms warm,"
+              f" breadth-first {(searched - warm) / queries * 1000:7.3f}ms per route")
+
+
+def benchmarkRewardPlacement(sizes=(10000, 100000), rewardCount=1000, seed=1):
+    for size in sizes:
+        controller = RoomController(size, seed=seed)
+        start = time.perf_counter()
+        controller.placeRewards({"gold": rewardCount, "key": rewardCount // 100}, seed=seed)
+        placed = time.perf_counter()
+        controller.roomsWithReward("key")
+        found = time.perf_counter()
+        print(f"reward placement {size:>8} rooms: place {placed - start:7.3f}s lookup {(found - placed) * 1e6:6.1f}us")
+
+
+def benchmarkSharedWorld(sizes=(100000, 1000000), lookups=10000, seed=1):
+    for size in sizes:
+        controller = RoomController(size, seed=seed)
+        start = time.perf_counter()
+        owner = SharedWorld.create(controller)
+        created = time.perf_counter()
+        worker = SharedWorld.attach(owner.name)
+        attached = time.perf_counter()
+        rng = random.Random(seed)
+        for _ in range(lookups):
+            worker.roomWithId(rng.randint(1, size))
+        looked = time.perf_counter()
+        print(f"shared world {size:>8} rooms: {len(owner.buffer) / 1e6:6.1f} MB shared, create {created - start:7.3f}s"
+              f" attach {(attached - created) * 1000:7.3f}ms, {lookups / (looked - attached):9.0f} id lookups/s")
+        worker.close()
+        owner.close()
+
+
+# snapshot vs clone, tick cost while a snapshot is live, and a snapshot export running beside the ticks
+def benchmarkControllerSnapshot(roomCount=100000, playerCount=1000, ticks=10, seed=1):
+    controller = RoomController(roomCount, seed=seed)
+    rng = random.Random(seed)
+    players = [Player() for _ in range(playerCount)]
+    for player in players:
+        controller.placePlayer(player)
+    directions = list(CardinalDirection)
+
+    def tickTime():
+        start = time.perf_counter()
+        for _ in range(ticks):
+            controller.applyMoves([(player, rng.choice(directions)) for player in players])
+        return (time.perf_counter() - start) / ticks * 1000
+
+    # the first snapshot also imports ControllerSnapshot
+    controller.snapshot().release()
+    start = time.perf_counter()
+    controller.clone()
+    cloned = time.perf_counter()
+    snapshot = controller.snapshot()
+    taken = time.perf_counter()
+    plain = tickTime()
+    withSnapshot = tickTime()
+    exporter = threading.Thread(target=lambda: encodeSnapshot(snapshot))
+    exporter.start()
+    exporting = tickTime()
+    exporter.join()
+    print(f"controller snapshot {roomCount} rooms: take {(taken - cloned) * 1e6:6.1f}us vs clone {cloned - start:6.3f}s,"
+          f" tick {plain:6.2f}ms plain, {withSnapshot:6.2f}ms with a snapshot, {exporting:6.2f}ms during an export,"
+          f" {len(snapshot.preserved)} rooms copied")
+    snapshot.release()
+
+
+# generation speed and the shape each strategy gives, per map size
+def benchmarkStrategies(sizes=(10000, 100000), seed=1):
+    for strategy in (QueueStrategy(), WeightedStrategy(), CorridorStrategy(), HubStrategy(), OutwardStrategy()):
+        for size in sizes:
+            start = time.perf_counter()
+            controller = RoomController(size, seed=seed, strategy=strategy)
+            elapsed = time.perf_counter() - start
+            metrics = controller.metrics()
+            print(f"strategy {strategy.name:<8} {size:>8} rooms: {elapsed:8.3f}s {size / elapsed:10.0f} rooms/s,"
+                  f" dead ends {metrics['deadEndRatio']:5.3f} junctions {metrics['junctionRatio']:5.3f}"
+                  f" mean corridor {metrics['meanCorridorLength']:5.2f} mean spawn distance {metrics['meanSpawnDistance']:7.1f}")
+
+
+def benchmarkProfile(size=100000, seed=1):
+    profiler = GenerationProfiler(sampleEvery=size // 10)
+    RoomController(size, seed=seed, profiler=profiler)
+    print(profiler.formatReport())
+
+
+# ASV-style suite: each case gets a fresh fixture per map size, runs `repeat` times and reports min and median
+def suiteCases(seed):
+    def generation(size):
+        return lambda: RoomController(size, seed=seed)
+
+    def corridorGeneration(size):
+        return lambda: RoomController(size, seed=seed, strategy=CorridorStrategy())
+
+    def hubGeneration(size):
+        return lambda: RoomController(size, seed=seed, strategy=HubStrategy())
+
+    def outwardGeneration(size):
+        return lambda: RoomController(size, seed=seed, strategy=OutwardStrategy())
+
+    def jsonExport(size):
+        controller = RoomController(size, seed=seed)
+
+        def run():
+            with open(os.devnull, "w") as fp:
+                dumpController(controller, fp)
+        return run
+
+    def snapshotEncode(size):
+        controller = RoomController(size, seed=seed)
+        return lambda: encodeSnapshot(controller)
+
+    def snapshotLoad(size):
+        data = encodeSnapshot(RoomController(size, seed=seed))
+        return lambda: MapSnapshot(data).toController()
+
+    def renderText(size):
+        renderer = MapRenderer(RoomController(size, seed=seed))
+
+        def run():
+            with open(os.devnull, "w") as fp:
+                renderer.renderText(fp)
+        return run
+
+    def renderPNG(size):
+        renderer = MapRenderer(RoomController(size, seed=seed))
+
+        def run():
+            with open(os.devnull, "wb") as fp:
+                renderer.writePNG(fp)
+        return run
+
+    return [generation, corridorGeneration, hubGeneration, outwardGeneration, jsonExport, snapshotEncode, snapshotLoad, renderText, renderPNG]
+
+
+def runSuite(sizes=(1000, 10000, 100000), repeat=3, seed=1, output=None):
+    results = []
+    for case in suiteCases(seed):
+        for size in sizes:
+            run = case(size)
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                times.append(time.perf_counter() - start)
+            results.append({"case": case.__name__, "size": size, "min": min(times), "median": statistics.median(times), "repeat": repeat})
+            print(f"{case.__name__:<16} {size:>8} rooms: min {min(times):8.4f}s median {statistics.median(times):8.4f}s")
+    if output is not None:
+        with open(output, "w") as fp:
+            json.dump(results, fp, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    if "--suite" in sys.argv:
+        index = sys.argv.index("--suite")
+        runSuite(output=sys.argv[index + 1] if index + 1 < len(sys.argv) else None)
+        sys.exit()
+    if "--profile" in sys.argv:
+        benchmarkProfile()
+        sys.exit()
+    benchmarkQueues()
+    benchmarkGeneration()
+    benchmarkChunkedGeneration()
+    benchmarkWorldBatch()
+    benchmarkJSONExport()
+    benchmarkSnapshot()
+    benchmarkRendering()
+    benchmarkRoomQueries()
+    benchmarkMovement()
+    benchmarkWorldServer()
+    benchmarkInterest()
+    benchmarkChangeLog()
+    benchmarkLazyWorld()
+    benchmarkGenerationCache()
+    benchmarkAnalytics()
+    benchmarkRouting()
+    benchmarkRewardPlacement()
+    benchmarkSharedWorld()
+    benchmarkControllerSnapshot()
+    benchmarkStrategies()
+    benchmarkProfile()
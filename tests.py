@@ -1,9 +1,37 @@
 import unittest
-from RoomController import RoomController
+from RoomController import RoomController, GenerationExhausted
 from Room import Room
 from Position import Position
+from Player import Player
 from CardinalDirection import CardinalDirection
+from RoomFrontier import RoomFrontier
+from RoomGrid import RoomGrid
+from GridPosition import GridPosition, INTERN_LIMIT, packCoordinates, unpackCoordinates
+from Queue import Queue
+from WorkQueue import FIFOQueue, LIFOQueue, PriorityQueue, RandomizedQueue
+from RoomJSONStream import JSONStreamReader, dumpController, loadController, iterRecords
+from MapSnapshot import MapSnapshot, encodeSnapshot, writeSnapshot
+from SharedWorld import SharedWorld, writeSharedWorld
+from RoomPathfinder import DistanceField
+from ChunkedWorldGenerator import ChunkedWorldGenerator
+from CorridorGraph import CorridorGraph
+from LazyWorld import LazyWorld
+from GenerationCache import GenerationCache
+from WorldBatch import generateWorlds
+from GenerationProfiler import GenerationProfiler
+from GenerationStrategy import QueueStrategy, WeightedStrategy, CorridorStrategy, HubStrategy, OutwardStrategy
+from ChangeLog import ChangeReplica, encodeChanges, decodeChanges
+from MapRenderer import MapRenderer, PNG_SIGNATURE
+from MapAnalytics import MapAnalytics
+from WorldServer import WorldServer, LocalClient, TickUpdate
+import asyncio
+import io
+import os
+import tempfile
 import json
+import struct
+import zlib
+import random
 
 
 class RoomTests(unittest.TestCase):
@@ -142,25 +170,1097 @@ class RoomTests(unittest.TestCase):
         self.assertEqual(controller.roomEligibleDirections(b), set([CardinalDirection.NORTH, CardinalDirection.EAST]))
         self.assertEqual(controller.roomEligibleDirections(d), set([CardinalDirection.SOUTH, CardinalDirection.WEST]))
 
+    def legacyLayout(self, roomLimit, seed):
+        # the original generation loop, checking neighbors through a plain set of positions
+        random.seed(seed)
+        coordinates = {(0, 0)}
+        layout = [(0, 0)]
+        queue = Queue()
+        queue.enqueue((0, 0))
+        offsets = [(0, 1), (0, -1), (1, 0), (-1, 0)]
+
+        def eligible(cell):
+            directions = []
+            for offset in offsets:
+                x, y = cell[0] + offset[0], cell[1] + offset[1]
+                count = len([1 for dx, dy in offsets if (x + dx, y + dy) in coordinates])
+                if count == 1:
+                    directions.append(offset)
+            return directions
+
+        while len(layout) < roomLimit and len(queue) > 0:
+            oldCell = queue.dequeue()
+            directions = eligible(oldCell)
+            if len(directions) > 0:
+                offset = random.choice(directions)
+                newCell = (oldCell[0] + offset[0], oldCell[1] + offset[1])
+                coordinates.add(newCell)
+                layout.append(newCell)
+                if len(eligible(newCell)) > 0:
+                    queue.enqueue(newCell)
+                if len(eligible(oldCell)) > 0:
+                    queue.enqueue(oldCell)
+        return layout
+
+    def testFrontier(self):
+        frontier = RoomFrontier()
+        frontier.occupy(packCoordinates(0, 0))
+        self.assertEqual(frontier.candidates, {packCoordinates(x, y) for x, y in [(0, 1), (0, -1), (1, 0), (-1, 0)]})
+
+        frontier.occupy(packCoordinates(0, 1))
+        self.assertEqual(frontier.neighborCount(packCoordinates(1, 1)), 1)
+        self.assertEqual(frontier.neighborCount(packCoordinates(1, 0)), 1)
+        frontier.occupy(packCoordinates(1, 1))
+        self.assertEqual(frontier.isCandidate(packCoordinates(1, 0)), False)
+        self.assertEqual(frontier.eligibleDirections(packCoordinates(1, 1)), [CardinalDirection.NORTH, CardinalDirection.EAST])
+
+    def testGridPosition(self):
+        position = GridPosition(3, -4)
+        self.assertEqual(unpackCoordinates(position.key), (3, -4))
+        self.assertEqual(position, Position(3, -4))
+        self.assertEqual(hash(position), hash(Position(3, -4)))
+        self.assertEqual(hash(position), hash(Position(3.0, -4.0)))
+        self.assertEqual(GridPosition.zero().distanceTo(position), 5)
+        self.assertEqual(GridPosition.zero().distanceIsGreaterThan(position, 4.5), True)
+        self.assertEqual(position / GridPosition(2, 2), Position(1.5, -2))
+        self.assertRaises(TypeError, GridPosition, 1.5, 0)
+
+        self.assertIs(GridPosition.at(3, -4), GridPosition.at(3, -4))
+        # the intern table stays bounded however many cells are visited
+        for y in range(INTERN_LIMIT + 10):
+            GridPosition.at(7, y)
+        self.assertLessEqual(len(GridPosition._interned), INTERN_LIMIT)
+        self.assertEqual(GridPosition.at(7, 3), GridPosition(7, 3))
+        n, s, e, w = GridPosition.zero().nsewOne()
+        self.assertEqual((n, s, e, w), (Position(0, 1), Position(0, -1), Position(1, 0), Position(-1, 0)))
+
+        mixedSet = set([GridPosition(0, 1), Position(0, 1), Position(0.5, 1)])
+        self.assertEqual(len(mixedSet), 2)
+        self.assertEqual(Position(0, 1) in set([GridPosition(0, 1)]), True)
+
+    def testRoomGrid(self):
+        grid = RoomGrid(initialSize=4)
+        a, b, c = self.rooms()
+        a.connectEastTo(b)
+        b.connectEastTo(c)
+        for room in (a, b, c):
+            self.assertEqual(grid.place(room), True)
+        self.assertEqual(grid.bounds(), (0, 0, 2, 0))
+        self.assertIs(grid.roomAt(1, 0), b)
+        self.assertEqual(grid.roomIdAt(2, 0), c.id)
+        self.assertIsNone(grid.roomAt(5, 5))
+        self.assertEqual(grid.neighborCount(1, 1), 1)
+        self.assertEqual(grid.neighborCount(3, 0), 1)
+        self.assertEqual(grid.neighborCount(1, 0), 2)
+
+        # growing keeps every cell and room where it was
+        far = Room("Far", GridPosition(-40, 25))
+        grid.place(far)
+        self.assertEqual(grid.bounds(), (-40, 0, 2, 25))
+        self.assertIs(grid.roomAt(-40, 25), far)
+        self.assertIs(grid.roomAt(0, 0), a)
+        self.assertEqual(grid.neighborCount(-40, 24), 1)
+
+        # whole-map counts agree with the per-cell lookups
+        counts = grid.neighborCountGrid()
+        for index, count in enumerate(counts):
+            x, y = grid.cellAt(index)
+            self.assertEqual(count, grid.neighborCount(x, y))
+        self.assertEqual(grid.countCellsWithNeighbors(1, occupiedOnly=True), 2)
+        self.assertEqual(grid.countCellsWithNeighbors(0, occupiedOnly=True), 1)
+
+    def testControllerGridMatchesRooms(self):
+        controller = RoomController(300)
+        for room in controller.rooms:
+            self.assertEqual(controller.roomAt(room.position.x, room.position.y).position, room.position)
+        self.assertEqual(sum(controller.grid.occupancy), len(controller.roomCoordinates))
+        for position in controller.roomCoordinates:
+            for neighbor in position.nsewOne():
+                self.assertEqual(controller.canAddRoomAt(neighbor), controller.frontier.isCandidate(neighbor.key))
+
+    def testPathfinding(self):
+        controller = RoomController()
+        controller.resetAllRooms()
+        spawn = controller.spawnRoom
+        a, b, c = self.rooms()
+        d, e, f = self.rooms()
+        controller.addRoomConnection(a, spawn, CardinalDirection.NORTH)
+        controller.addRoomConnection(b, a, CardinalDirection.EAST)
+        controller.addRoomConnection(c, b, CardinalDirection.NORTH)
+        controller.addRoomConnection(d, spawn, CardinalDirection.WEST)
+
+        self.assertEqual(controller.shortestPath(d, c), [d, spawn, a, b, c])
+        self.assertEqual(controller.aStarPath(d, c), [d, spawn, a, b, c])
+        self.assertEqual(controller.shortestPath(c, f), None)
+
+        field = controller.distanceField()
+        self.assertEqual(field.distanceTo(c), 3)
+        self.assertIs(controller.distanceField(), field)
+        self.assertEqual(controller.nearestRoomWithItemReward(), None)
+        c.itemReward = "key"
+        d.itemReward = "coin"
+        self.assertIs(controller.nearestRoomWithItemReward(), d)
+        self.assertIs(controller.nearestRoom(b, lambda room: room.itemReward is not None), c)
+        self.assertIs(controller.nearestRoom(c, lambda room: room.itemReward is not None), d)
+        self.assertIs(controller.nearestRoom(c, lambda room: room.itemReward is not None, includeSource=True), c)
+
+        # a new connection drops the cached fields
+        controller.addRoomConnection(e, d, CardinalDirection.WEST)
+        self.assertIsNot(controller.distanceField(), field)
+        self.assertEqual(controller.distanceField().distanceTo(e), 2)
+
+        player = Player()
+        player.room = e
+        self.assertEqual(controller.routePlayer(player, b),
+                         [CardinalDirection.EAST, CardinalDirection.EAST, CardinalDirection.NORTH, CardinalDirection.EAST])
+
+    def testAStarMatchesBreadthFirst(self):
+        for seed in range(8):
+            controller = RoomController(400, seed=seed)
+            rooms = sorted(controller.distanceField().order, key=lambda room: room.name)
+            for target in rooms[::37]:
+                for source in rooms[::53]:
+                    aStar = controller.aStarPath(source, target)
+                    breadthFirst = controller.shortestPath(source, target)
+                    self.assertEqual(aStar and len(aStar), breadthFirst and len(breadthFirst))
+
+    def testStreamingJSON(self):
+        controller = RoomController(300)
+        controller.spawnRoom.itemReward = {"gold": 3}
+        stream = io.StringIO()
+        dumpController(controller, stream)
+        self.assertEqual(stream.getvalue(), json.dumps(controller.toDict()))
+
+        for text in (stream.getvalue(), json.dumps(controller.toDict(), indent=2)):
+            loaded = loadController(io.StringIO(text), chunkSize=7)
+            expected = json.loads(text)
+            loadedDict = loaded.toDict()
+            self.assertEqual(sorted(expected.pop("roomCoordinates")), sorted(loadedDict.pop("roomCoordinates")))
+            self.assertEqual(expected, loadedDict)
+            self.assertEqual(loaded.spawnRoom.id, controller.spawnRoom.id)
+            self.assertEqual(len(loaded.distanceField()), len(controller.distanceField()))
+
+        # numbers split across chunks anywhere, fractions and exponents included
+        text = '[1.5, 2, -0.25e-3, 1e5, 12345.678E+2, true, [3.0]]'
+        for chunkSize in (1, 2, 3):
+            reader = JSONStreamReader(io.StringIO(text), chunkSize=chunkSize)
+            self.assertEqual([reader.value() for _ in reader.elements()], json.loads(text))
+
+        records = list(iterRecords(io.StringIO('{"spawnRoom": "a", "extra": [1, {"b": 2}], "rooms": {}, "roomCoordinates": [[0, 0]]}')))
+        self.assertEqual(records, [("spawnRoom", "a"), ("roomCoordinate", [0, 0])])
+
+    def testMapSnapshot(self):
+        controller = RoomController(300)
+        controller.spawnRoom.itemReward = {"gold": 3}
+        data = encodeSnapshot(controller)
+        snapshot = MapSnapshot(data)
+        self.assertEqual(len(snapshot), 300)
+        self.assertEqual(snapshot.spawnRoom.id, controller.spawnRoom.id)
+        self.assertEqual(snapshot.spawnRoom.itemReward, {"gold": 3})
+        # lazy rooms only materialize what is walked
+        self.assertEqual(len(snapshot.rooms), 1)
+        lazyField = DistanceField(snapshot.spawnRoom)
+        self.assertEqual(sorted(room.id for room in lazyField.order), sorted(room.id for room in controller.distanceField().order))
+
+        rebuilt = snapshot.toController()
+        expected = controller.toDict()
+        rebuiltDict = rebuilt.toDict()
+        self.assertEqual(sorted(expected.pop("roomCoordinates")), sorted(rebuiltDict.pop("roomCoordinates")))
+        self.assertEqual(expected, rebuiltDict)
+
+        # ids that aren't hex digests go through the string table
+        controller.spawnRoom.id = "spawn"
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rooms.map")
+            writeSnapshot(controller, path)
+            mapped = MapSnapshot.open(path)
+            self.assertEqual(mapped.spawnRoom.id, "spawn")
+            self.assertEqual(mapped.toController().toDict()["rooms"]["spawn"], controller.spawnRoom.toDict())
+            mapped.close()
+
+    def assertTreeLayout(self, controller):
+        # one room per cell, adjacent rooms are always connected, and every room hangs off spawn exactly once
+        positions = {room.position for room in controller.rooms}
+        self.assertEqual(len(positions), len(controller.rooms))
+        edges = 0
+        for room in controller.rooms:
+            for neighbor, exit in zip(room.position.nsewOne(), (room.north, room.south, room.east, room.west)):
+                self.assertEqual(neighbor in positions, exit is not None)
+                if exit is not None:
+                    self.assertEqual(exit.position, neighbor)
+                    edges += 1
+        self.assertEqual(edges // 2, len(controller.rooms) - 1)
+        self.assertEqual(len(controller.distanceField()), len(controller.rooms))
+
+    def layoutSignature(self, controller):
+        return sorted((room.name, room.position.x, room.position.y,
+                       tuple(exit.name if exit else None for exit in (room.north, room.south, room.east, room.west)))
+                      for room in controller.rooms)
+
+    def testChunkedGeneration(self):
+        generator = ChunkedWorldGenerator(seed=11, chunkSize=20, roomsPerChunk=160)
+        controller = generator.generate(1000)
+        self.assertEqual(len(controller.rooms), 1000)
+        self.assertEqual(controller.spawnRoom.position, Position(0, 0))
+        self.assertTreeLayout(controller)
+
+        parallel = generator.generate(1000, workers=3)
+        self.assertEqual(self.layoutSignature(parallel), self.layoutSignature(controller))
+        other = ChunkedWorldGenerator(seed=12, chunkSize=20, roomsPerChunk=160).generate(1000)
+        self.assertNotEqual(self.layoutSignature(other), self.layoutSignature(controller))
+
+        self.assertRaises(ValueError, ChunkedWorldGenerator, 1, 8, 64)
+
+        small = ChunkedWorldGenerator(seed=11).generate(50)
+        self.assertEqual(len(small.rooms), 50)
+        self.assertTreeLayout(small)
+
+    def testSeededGeneration(self):
+        self.assertEqual(self.layoutSignature(RoomController(200, seed=5)), self.layoutSignature(RoomController(200, seed=5)))
+
+    def testWorldBatch(self):
+        jobs = [(seed, 10 + seed * 40) for seed in range(6)] + [(99, "many")]
+        results = []
+        succeeded, failed = generateWorlds(jobs, results.append, workers=2, chunksize=2)
+        self.assertEqual((succeeded, failed), (6, 1))
+        self.assertEqual([(result.seed, result.roomLimit) for result in results], jobs)
+
+        for result in results[:-1]:
+            self.assertEqual(result.ok, True)
+            self.assertEqual(result.roomCount, result.roomLimit)
+            controller = result.controller()
+            self.assertEqual(self.layoutSignature(controller), self.layoutSignature(RoomController(result.roomLimit, seed=result.seed)))
+
+        self.assertEqual(results[-1].ok, False)
+        self.assertIsNone(results[-1].snapshot)
+        self.assertIn("TypeError", results[-1].error)
+
+    def testStrictGeneration(self):
+        class BlockedFrontier(RoomFrontier):
+            def eligibleDirections(self, key):
+                return []
+
+        class BlockedController(RoomController):
+            def clearRooms(self):
+                RoomController.clearRooms(self)
+                self.frontier = BlockedFrontier()
+
+        controller = BlockedController(10, generate=False)
+        self.assertRaises(GenerationExhausted, controller.generateRooms, 1, True)
+        self.assertEqual(len(controller.rooms), 1)
+
+    def testWorkQueues(self):
+        fifo = FIFOQueue(capacity=2)
+        for value in range(5):
+            self.assertEqual(fifo.enqueue(value), True)
+        self.assertEqual(fifo.enqueue(3), False)
+        self.assertEqual(fifo.dequeue(), 0)
+        fifo.enqueue(0)
+        for value in range(5, 9):
+            fifo.enqueue(value)
+        self.assertEqual(3 in fifo, True)
+        self.assertEqual([fifo.dequeue() for _ in range(len(fifo))], [1, 2, 3, 4, 0, 5, 6, 7, 8])
+        self.assertEqual(fifo.dequeue(), None)
+
+        duplicates = Queue()
+        duplicates.enqueue("a")
+        duplicates.enqueue("a")
+        self.assertEqual(len(duplicates), 2)
+
+        lifo = LIFOQueue()
+        for value in "abc":
+            lifo.enqueue(value)
+        self.assertEqual(lifo.peek(), "c")
+        self.assertEqual([lifo.dequeue() for _ in range(3)], ["c", "b", "a"])
+
+        priority = PriorityQueue()
+        priority.enqueue("far", 9)
+        priority.enqueue("near", 2)
+        priority.enqueue("middle", 5)
+        self.assertEqual(priority.enqueue("far", 12), False)
+        self.assertEqual(priority.enqueue("far", 1), True)
+        self.assertEqual(len(priority), 3)
+        self.assertEqual(priority.priorityOf("far"), 1)
+        self.assertEqual([priority.dequeue() for _ in range(4)], ["far", "near", "middle", None])
+
+        randomized = RandomizedQueue(rng=random.Random(3))
+        for value in range(20):
+            randomized.enqueue(value)
+        peeked = randomized.peek()
+        self.assertEqual(randomized.dequeue(), peeked)
+        drained = [peeked] + [randomized.dequeue() for _ in range(19)]
+        self.assertEqual(sorted(drained), list(range(20)))
+        self.assertNotEqual(drained, list(range(20)))
+        self.assertEqual(len(randomized), 0)
+
+    def testMapRendering(self):
+        # spawn with a corridor east and a room north of its end: the old renderer dropped the top row and left column
+        controller = RoomController(generate=False)
+        controller.resetAllRooms()
+        east = Room("East", GridPosition(1, 0))
+        controller.addRoomConnection(east, controller.spawnRoom, CardinalDirection.EAST)
+        controller.addRoomConnection(Room("North", GridPosition(1, 1)), east, CardinalDirection.NORTH)
+        output = io.StringIO()
+        controller.textVisualization(output)
+        self.assertEqual(output.getvalue(), " ⏜\nO+\n")
+        self.assertEqual(east.visualizeTextCharacter(), "+")
+        self.assertEqual(east.exitMask(), CardinalDirection.NORTH.mask | CardinalDirection.WEST.mask)
+
+        renderer = MapRenderer(controller)
+        player = Player()
+        player.room = east
+        output = io.StringIO()
+        renderer.renderTextAround(player, 1, output)
+        self.assertEqual(output.getvalue().split("\n"), [" ⏜ ", "O+ ", "   ", ""])
+
+        ppm = io.BytesIO()
+        renderer.writePPM(ppm, scale=2)
+        self.assertTrue(ppm.getvalue().startswith(b"P6\n12 12\n255\n"))
+        self.assertEqual(len(ppm.getvalue()), len(b"P6\n12 12\n255\n") + 12 * 12 * 3)
+
+        png = io.BytesIO()
+        renderer.writePNG(png, chunkSize=16)
+        data = png.getvalue()
+        self.assertTrue(data.startswith(PNG_SIGNATURE))
+        offset = len(PNG_SIGNATURE)
+        chunks = []
+        while offset < len(data):
+            length, = struct.unpack(">I", data[offset:offset + 4])
+            chunks.append((data[offset + 4:offset + 8], data[offset + 8:offset + 8 + length]))
+            offset += 12 + length
+        self.assertEqual(chunks[0][0], b"IHDR")
+        self.assertEqual(struct.unpack(">II", chunks[0][1][:8]), (6, 6))
+        self.assertEqual(chunks[-1][0], b"IEND")
+        pixels = zlib.decompress(b"".join(chunk for kind, chunk in chunks if kind == b"IDAT"))
+        self.assertEqual(len(pixels), 6 * (1 + 6 * 3))
+
+        # a generated map renders exactly its bounding box
+        controller = RoomController(500, seed=3)
+        minX, minY, maxX, maxY = controller.grid.bounds()
+        rows = list(MapRenderer(controller).textRows())
+        self.assertEqual(len(rows), maxY - minY + 1)
+        self.assertTrue(all(len(row) == maxX - minX + 1 for row in rows))
+        self.assertEqual(rows[maxY][-minX], "O")
+
+    def testExitMasks(self):
+        a = Room("A")
+        b = Room("B")
+        c = Room("C")
+        a.connectNorthTo(b)
+        a.connectWestTo(c)
+        self.assertEqual(a.exitMask(), CardinalDirection.NORTH.mask | CardinalDirection.WEST.mask)
+        self.assertEqual(b.exitMask(), CardinalDirection.SOUTH.mask)
+        self.assertEqual(a.connectedInDirections(), {CardinalDirection.NORTH, CardinalDirection.WEST})
+        self.assertTrue(a.hasExit(CardinalDirection.WEST.mask))
+        self.assertEqual(a.exitCount(), 2)
+        self.assertEqual(str(b), "Room: B - connected to 1 room")
+        a.setExit(CardinalDirection.WEST.mask, None)
+        self.assertIsNone(a.west)
+        self.assertEqual(a.connectedInDirections(), {CardinalDirection.NORTH})
+        self.assertFalse(hasattr(a, "__dict__"))
+
+        controller = RoomController(2000, seed=5)
+        for room in controller.rooms:
+            self.assertEqual(room.exitMask(), sum(direction.mask for direction, exit in zip(CardinalDirection, (room.north, room.south, room.east, room.west)) if exit))
+        self.assertEqual(set(controller.deadEnds()), {room for room in controller.rooms if len(room.connectedInDirections()) == 1})
+        self.assertEqual(set(controller.junctions()), {room for room in controller.rooms if len(room.connectedInDirections()) >= 3})
+        histogram = controller.exitCountHistogram()
+        self.assertEqual(sum(histogram), len(controller.rooms))
+        self.assertEqual(histogram[1], len(controller.deadEnds()))
+
+        # loaders rebuild the masks along with the exits
+        masks = sorted((room.id, room.exitMask()) for room in controller.rooms)
+        snapshot = MapSnapshot(encodeSnapshot(controller))
+        self.assertEqual(sorted((room.id, room.exitMask()) for room in snapshot.toController().rooms), masks)
+        self.assertEqual(sorted((room.id, room.exitMask()) for room in snapshot.iterRooms()), masks)
+        stream = io.StringIO()
+        dumpController(controller, stream)
+        stream.seek(0)
+        self.assertEqual(sorted((room.id, room.exitMask()) for room in loadController(stream).rooms), masks)
+
+    def testPlayerMovement(self):
+        controller = RoomController(generate=False)
+        controller.resetAllRooms()
+        spawn = controller.spawnRoom
+        east = Room("East")
+        controller.addRoomConnection(east, spawn, CardinalDirection.EAST)
+        walker = Player()
+        other = Player()
+        controller.placePlayer(walker)
+        controller.placePlayer(other)
+        self.assertEqual(controller.populationOf(spawn), 2)
+        self.assertEqual(controller.occupiedRooms, {spawn})
+        self.assertEqual(controller.emptyRooms, {east})
+
+        # no exit north: nothing changes
+        self.assertIsNone(controller.move(walker, CardinalDirection.NORTH))
+        self.assertIs(walker.room, spawn)
+        self.assertIs(controller.move(walker, CardinalDirection.EAST), east)
+        self.assertEqual(walker.position, GridPosition(1, 0))
+        self.assertEqual(controller.occupiedRooms, {spawn, east})
+        self.assertEqual(controller.emptyRooms, set())
+
+        self.assertEqual(controller.applyMoves([(other, CardinalDirection.EAST), (walker, CardinalDirection.WEST),
+                                                (walker, CardinalDirection.SOUTH), (other, CardinalDirection.EAST.mask)]), (2, 2))
+        self.assertEqual((walker.room, other.room), (spawn, east))
+        self.assertEqual(controller.populationOf(spawn), 1)
+        self.assertTrue(controller.removePlayer(walker))
+        self.assertIsNone(walker.room)
+        self.assertEqual(controller.occupiedRooms, {east})
+        self.assertEqual(controller.emptyRooms, {spawn})
+        self.assertRaises(ValueError, controller.move, walker, CardinalDirection.EAST)
+        self.assertRaises(ValueError, controller.move, other, "up")
+        # a batch with an unplaced player is rejected before anyone moves
+        version = controller.version
+        self.assertRaises(ValueError, controller.applyMoves, [(other, CardinalDirection.WEST), (walker, CardinalDirection.EAST)])
+        self.assertEqual((other.room, controller.version), (east, version))
+
+        # random walks keep every set consistent with Room.players
+        controller = RoomController(500, seed=2)
+        rng = random.Random(2)
+        players = [Player() for _ in range(200)]
+        for player in players:
+            controller.placePlayer(player)
+        for _ in range(20):
+            controller.applyMoves([(player, rng.choice(list(CardinalDirection))) for player in players])
+        self.assertEqual(sum(controller.populationOf(room) for room in controller.rooms), len(players))
+        self.assertEqual(controller.occupiedRooms, {player.room for player in players})
+        self.assertEqual(controller.emptyRooms, controller.rooms - controller.occupiedRooms)
+
+    def testPlayerSpatialIndex(self):
+        controller = RoomController(3000, seed=4)
+        rng = random.Random(4)
+        players = [Player() for _ in range(300)]
+        rooms = list(controller.rooms)
+        for player in players:
+            controller.placePlayer(player, rng.choice(rooms))
+        for _ in range(10):
+            controller.applyMoves([(player, rng.choice(list(CardinalDirection))) for player in players])
+        index = controller.occupancy.spatialIndex
+        self.assertEqual(len(index), len(players))
+
+        center = players[0].room
+        for radius in (0, 2.5, 3, 16.5, 17, 40):
+            expected = {player for player in players if not player.position.distanceIsGreaterThan(center.position, radius)}
+            self.assertEqual(set(controller.playersNear(center, radius)), expected)
+
+        for steps in (0, 2, 10):
+            field = DistanceField(center)
+            expected = {player for player in players if player.room in field.distances and field.distances[player.room] <= steps}
+            self.assertEqual(set(controller.playersWithinRooms(center, steps)), expected)
+
+        mover = players[1]
+        update = TickUpdate(1, [(mover, center, mover.room)], [], [])
+        audience = WorldServer(controller).audience(update, 5)
+        self.assertEqual(set(audience), set(controller.playersNear(center, 5)) | set(controller.playersNear(mover.room, 5)))
+        self.assertIn(mover, audience)
+
+        controller.removePlayer(players[0])
+        self.assertNotIn(players[0], index)
+        self.assertNotIn(players[0], controller.playersNear(center, 100))
+
+    def testWorldServer(self):
+        controller = RoomController(generate=False)
+        controller.resetAllRooms()
+        east = Room("East")
+        controller.addRoomConnection(east, controller.spawnRoom, CardinalDirection.EAST)
+
+        async def session():
+            server = WorldServer(controller, tickInterval=0.001)
+            updates = server.subscribe()
+            server.start()
+            walker = LocalClient(server, Player())
+            stranger = LocalClient(server, Player())
+            self.assertIs(await walker.join(), controller.spawnRoom)
+            self.assertEqual(await walker.exits(), ["east"])
+
+            # commands from one tick are answered together, moves before looks
+            moved, blocked, look, lost = await asyncio.gather(walker.move("east"), walker.move(CardinalDirection.NORTH),
+                                                              walker.look(), stranger.move("east"), return_exceptions=True)
+            self.assertIs(moved, east)
+            self.assertIsNone(blocked)
+            self.assertEqual(look["name"], "East")
+            self.assertEqual(look["exits"], ["west"])
+            self.assertIsInstance(lost, ValueError)
+
+            self.assertTrue(await walker.leave())
+            await server.stop()
+            seen = []
+            while not updates.empty():
+                seen.append(updates.get_nowait())
+            return seen
+
+        seen = asyncio.run(session())
+        self.assertEqual([len(update.joined) for update in seen], [1, 0, 0])
+        self.assertEqual(seen[1].moves[0][1:], (controller.spawnRoom, east))
+        self.assertEqual(len(seen[2].left), 1)
+        self.assertEqual(controller.emptyRooms, controller.rooms)
+
+    def testWorldServerTickOrderAndFailures(self):
+        controller = RoomController(generate=False)
+        controller.resetAllRooms()
+        east = Room("East")
+        controller.addRoomConnection(east, controller.spawnRoom, CardinalDirection.EAST)
+
+        async def session():
+            server = WorldServer(controller, tickInterval=0.001)
+            client = LocalClient(server, Player())
+            # the move arrives first but the join still runs ahead of it within the tick
+            moved = client.move("east")
+            joined = client.join()
+            server.runTick()
+            self.assertIs(await joined, controller.spawnRoom)
+            self.assertIs(await moved, east)
+
+            def broken(moves, results):
+                raise RuntimeError("broken tick")
+            controller.applyMoves = broken
+            server.start()
+            failed, look = await asyncio.gather(client.move("west"), client.look(), return_exceptions=True)
+            self.assertIsInstance(failed, RuntimeError)
+            self.assertIsInstance(look, RuntimeError)
+
+            # the server keeps ticking after the failure
+            del controller.applyMoves
+            self.assertIs(await client.move("west"), controller.spawnRoom)
+            await server.stop()
+
+        asyncio.run(session())
+
+    def testGenerationProfiler(self):
+        profiler = GenerationProfiler(sampleEvery=500)
+        profiled = RoomController(3000, seed=6, profiler=profiler)
+        plain = RoomController(3000, seed=6)
+        self.assertEqual(self.layoutSignature(profiled), self.layoutSignature(plain))
+        # the wrappers only live for the one run
+        self.assertNotIn("addRoomConnection", vars(profiled))
+        self.assertNotIn("place", vars(profiled.grid))
+
+        report = profiler.report()
+        self.assertEqual(report["rooms"], 3000)
+        self.assertEqual(report["phases"]["createRoom"]["calls"], 2999)
+        self.assertEqual(report["phases"]["addRoomConnection"]["calls"], 2999)
+        self.assertEqual(report["counters"]["dequeues"], report["phases"]["frontier.eligibleDirections"]["calls"])
+        self.assertEqual(report["counters"]["dequeues"] - report["counters"]["exhaustedDequeues"], 2999)
+        self.assertGreater(report["counters"]["reenqueues"], 0)
+        self.assertEqual(report["deadEnds"], len(plain.deadEnds()))
+        self.assertEqual([sample[0] for sample in report["frontier"]], [500, 1000, 1500, 2000, 2500, 3000, 3000])
+
+        output = io.StringIO()
+        profiler.writeReport(output)
+        self.assertEqual(json.loads(output.getvalue())["rooms"], 3000)
+        self.assertIn("createRoom", profiler.formatReport())
+
+    def testRoomIds(self):
+        first = RoomController(500, seed=8)
+        second = RoomController(500, seed=8)
+        self.assertEqual(sorted(room.id for room in first.rooms), list(range(1, 501)))
+        self.assertEqual(first.spawnRoom.id, 1)
+        self.assertEqual({room.name: room.id for room in first.rooms}, {room.name: room.id for room in second.rooms})
+        for room in first.rooms:
+            self.assertIs(first.roomWithId(room.id), room)
+        self.assertIsNone(first.roomWithId(501))
+
+        seeded = RoomController(500, seed=8, idMode="seeded")
+        again = RoomController(500, seed=8, idMode="seeded")
+        other = RoomController(500, seed=9, idMode="seeded")
+        ids = {room.name: room.id for room in seeded.rooms}
+        self.assertEqual(ids, {room.name: room.id for room in again.rooms})
+        self.assertEqual(len(set(ids.values())), 500)
+        self.assertTrue(all(0 <= roomId < 1 << 64 for roomId in ids.values()))
+        self.assertFalse(set(ids.values()) & {room.id for room in other.rooms})
+
+        legacy = RoomController(50, seed=8, idMode="hex")
+        self.assertTrue(all(len(room.id) == 32 for room in legacy.rooms))
+        self.assertRaises(ValueError, RoomController, 10, idMode="uuid")
+
+        # ids survive both export formats, and new rooms on a loaded map don't reuse them
+        snapshot = MapSnapshot(encodeSnapshot(seeded))
+        self.assertEqual(snapshot.spawnRoom.id, seeded.spawnRoom.id)
+        loaded = snapshot.toController()
+        self.assertEqual({room.name: room.id for room in loaded.rooms}, ids)
+        stream = io.StringIO()
+        dumpController(first, stream)
+        stream.seek(0)
+        loaded = loadController(stream)
+        self.assertIs(loaded.roomWithId(1), loaded.spawnRoom)
+        room = Room("Extra")
+        loaded.addRoomConnection(room, loaded.spawnRoom, CardinalDirection.NORTH)
+        self.assertEqual(room.id, 501)
+
+    def testChangeLog(self):
+        controller = RoomController(300, seed=12)
+        log = controller.trackChanges(maxEntries=60)
+        players = [Player() for _ in range(5)]
+        for player in players:
+            controller.placePlayer(player)
+        fresh = ChangeReplica()
+        fresh.apply(controller.sync())
+        self.assertEqual(fresh.version, log.version)
+        self.assertEqual(fresh.players, {player.id: controller.spawnRoom.id for player in players})
+
+        rng = random.Random(12)
+        following = ChangeReplica()
+        following.apply(controller.sync())
+        stale = ChangeReplica()
+        stale.apply(controller.sync())
+        for step in range(30):
+            room = rng.choice(sorted(controller.rooms, key=lambda room: room.id))
+            directions = controller.roomEligibleDirections(room)
+            if directions:
+                controller.addRoomConnection(Room(f"Extra {step}"), room, min(directions))
+            controller.setItemReward(room, {"gold": step})
+            controller.applyMoves([(player, rng.choice(list(CardinalDirection))) for player in players])
+            if step % 3 == 0:
+                response = controller.sync(following.version)
+                # caught-up clients only ever get changes, in a compact encoding
+                self.assertNotIn("checkpoint", response)
+                response["changes"] = decodeChanges(encodeChanges(response["changes"]))
+                following.apply(response)
+        following.apply(controller.sync(following.version))
+        self.assertLessEqual(len(log), 60)
+        stale.apply(controller.sync(stale.version))
+
+        expected = {room.id: (room.name, room.position, room.itemReward) for room in controller.rooms}
+        for replica in (following, stale):
+            self.assertEqual(replica.version, log.version)
+            self.assertEqual({room.id: (room.name, room.position, room.itemReward) for room in replica.controller.rooms}, expected)
+            self.assertEqual(replica.players, {player.id: player.room.id for player in players})
+            extra = [room for room in replica.controller.rooms if room.name.startswith("Extra")]
+            for room in extra:
+                original = controller.roomWithId(room.id)
+                self.assertEqual([exit.id if exit else None for exit in (room.north, room.south, room.east, room.west)],
+                                 [exit.id if exit else None for exit in (original.north, original.south, original.east, original.west)])
+
+        # reward and player entries collapse to the newest one per room or player
+        self.assertEqual(controller.changesSince(log.version), [])
+        controller.setItemReward(controller.spawnRoom, "a")
+        controller.setItemReward(controller.spawnRoom, "b")
+        log.compact()
+        self.assertEqual(controller.changesSince(log.version - 2), [("reward", controller.spawnRoom.id, "b")])
+
+        # room additions never collapse, so a long enough run forces a checkpoint
+        log = controller.trackChanges(maxEntries=8)
+        added = 0
+        for room in sorted(controller.rooms, key=lambda room: room.id):
+            directions = controller.roomEligibleDirections(room)
+            if directions and added < 12:
+                controller.addRoomConnection(Room(f"Late {added}"), room, min(directions))
+                added += 1
+        self.assertIsNone(controller.changesSince(0))
+        response = controller.sync(0)
+        self.assertIn("checkpoint", response)
+        stale.apply(response)
+        self.assertEqual(len(stale.controller.rooms), len(controller.rooms))
+
+    def testLazyWorld(self):
+        world = LazyWorld(seed=3, chunkSize=20, roomsPerChunk=160, maxLoadedChunks=9)
+        self.assertEqual(len(world.chunks), 0)
+        spawn = world.spawnRoom
+        self.assertEqual((spawn.name, spawn.position), ("Spawn Area", GridPosition(0, 0)))
+
+        def signature(chunk):
+            return sorted((room.id, room.position, tuple(exit.id if exit else None for exit in (room.north, room.south, room.east, room.west)))
+                          for room in chunk.rooms)
+
+        player = Player()
+        world.place(player)
+        self.assertEqual(len(world.chunks), 9)
+        home = signature(world.chunk(0, 0))
+        self.assertEqual(len(world.chunk(0, 0).rooms), 160)
+
+        # walking only ever reaches loaded rooms
+        rng = random.Random(3)
+        for _ in range(200):
+            world.move(player, rng.choice(list(CardinalDirection)))
+            self.assertTrue(world.isLoaded(*world.chunkKeyAt(player.position.x, player.position.y)))
+        self.assertRaises(ValueError, world.move, player, "up")
+
+        # far away, the spawn area is evicted; loaded rooms never point into evicted ones
+        world.place(player, world.chunk(6, -4).rooms[0])
+        self.assertFalse(world.isLoaded(0, 0))
+        self.assertLessEqual(len(world.chunks), 9)
+        loaded = {room for chunk in world.chunks.values() for room in chunk.rooms}
+        for room in loaded:
+            for exit in (room.north, room.south, room.east, room.west):
+                self.assertTrue(exit is None or exit in loaded)
+
+        # and comes back exactly as it was, seams included
+        world.place(player)
+        self.assertEqual(signature(world.chunk(0, 0)), home)
+        self.assertGreater(world.evictions, 0)
+        self.assertEqual(world.roomAt(0, 0), world.spawnRoom)
+
+        # a second player far away doesn't evict the chunks around the first, or cut its seams
+        other = Player()
+        world.place(other, world.chunk(6, -4).rooms[0])
+        for chunkY in (-1, 0, 1):
+            for chunkX in (-1, 0, 1):
+                self.assertTrue(world.isLoaded(chunkX, chunkY))
+        self.assertEqual(signature(world.chunk(0, 0)), home)
+        for _ in range(50):
+            world.move(other, rng.choice(list(CardinalDirection)))
+        self.assertEqual(signature(world.chunk(0, 0)), home)
+        # once it leaves, the chunks around it can go again
+        world.remove(other)
+        world.place(player, world.spawnRoom)
+        self.assertLessEqual(len(world.chunks), 9)
+
+    def testGenerationCache(self):
+        def signature(controller):
+            return sorted((room.id, room.name, room.position, room.exits) for room in controller.rooms)
+
+        fresh = RoomController(400, seed=5, idMode="seeded")
+        cache = GenerationCache(maxEntries=2)
+        first = cache.get(5, 400, idMode="seeded")
+        self.assertEqual(signature(first), signature(fresh))
+        self.assertEqual(first.toDict()["rooms"], fresh.toDict()["rooms"])
+        self.assertEqual(first.roomCoordinates, fresh.roomCoordinates)
+
+        # callers get their own copy every time
+        first.spawnRoom.itemReward = "gold"
+        first.addRoomConnection(Room("Extra"), None, None)
+        first.placePlayer(Player())
+        second = cache.get(5, 400, idMode="seeded")
+        self.assertIsNot(second.spawnRoom, first.spawnRoom)
+        self.assertIsNone(second.spawnRoom.itemReward)
+        self.assertEqual(signature(second), signature(fresh))
+        self.assertEqual(second.populationOf(second.spawnRoom), 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(second.roomAt(0, 0), second.spawnRoom)
+        self.assertEqual(len(second.rooms), 400)
+        self.assertEqual({room.id: distance for room, distance in second.distanceField().distances.items()},
+                         {room.id: distance for room, distance in fresh.distanceField().distances.items()})
+
+        # least recently used worlds fall out
+        cache.get(6, 100)
+        cache.get(7, 100)
+        self.assertEqual(len(cache), 2)
+        self.assertNotIn(cache.key(5, 400, "seeded"), cache)
+        self.assertNotIn(cache.key(5, 400), cache)
+
+        # the disk tier serves a cache that has never generated anything
+        with tempfile.TemporaryDirectory() as directory:
+            generated = GenerationCache(directory=directory).get(5, 400, idMode="seeded")
+            cold = GenerationCache(directory=directory)
+            loaded = cold.get(5, 400, idMode="seeded")
+            self.assertEqual((cold.diskHits, cold.misses), (1, 0))
+            self.assertEqual(signature(loaded), signature(fresh))
+            self.assertEqual([room.id for room in loaded.grid.rooms], [room.id for room in generated.grid.rooms])
+            room = Room("Extra")
+            loaded.addRoomConnection(room, None, None)
+            fresh.addRoomConnection(extra := Room("Extra"), None, None)
+            self.assertEqual(room.id, extra.id)
+            self.assertEqual(os.listdir(directory), [os.path.basename(cold.path(cold.key(5, 400, "seeded")))])
+
+            # strategies and their parameters are part of the key, on disk too
+            corridor = cold.get(5, 400, strategy=CorridorStrategy())
+            self.assertEqual(signature(corridor), signature(RoomController(400, seed=5, strategy=CorridorStrategy())))
+            self.assertEqual(cold.misses, 1)
+            self.assertNotEqual(cold.key(5, 400, strategy=CorridorStrategy()), cold.key(5, 400, strategy=CorridorStrategy(straightness=2.0)))
+            reloaded = GenerationCache(directory=directory).get(5, 400, strategy=CorridorStrategy())
+            self.assertEqual(signature(reloaded), signature(corridor))
+            self.assertEqual(reloaded.strategy.cacheKey(), CorridorStrategy().cacheKey())
+
+    def testMapAnalytics(self):
+        controller = RoomController(generate=False)
+        controller.resetAllRooms()
+        spawn = controller.spawnRoom
+        previous = spawn
+        for y in range(1, 4):
+            room = Room(f"North {y}", GridPosition(0, y))
+            controller.addRoomConnection(room, previous, CardinalDirection.NORTH)
+            previous = room
+        controller.addRoomConnection(Room("East", GridPosition(1, 0)), spawn, CardinalDirection.EAST)
+        controller.addRoomConnection(Room("West", GridPosition(-1, 0)), spawn, CardinalDirection.WEST)
+
+        analytics = controller.analytics()
+        self.assertEqual(len(analytics), 6)
+        self.assertEqual(analytics.spawnIndex, 0)
+        self.assertEqual(list(analytics.offsets), [0, 3, 5, 7, 8, 9, 10])
+        self.assertEqual(list(analytics.targets[:3]), [1, 4, 5])
+        self.assertEqual((list(analytics.xs), list(analytics.ys)), ([0, 0, 0, 0, 1, -1], [0, 1, 2, 3, 0, 0]))
+        self.assertEqual(analytics.exitMasks[0], spawn.exits)
+        metrics = analytics.metrics()
+        self.assertEqual(metrics["deadEndRatio"], 0.5)
+        self.assertEqual(metrics["branchingFactor"], 10 / 6)
+        self.assertEqual((metrics["corridors"], metrics["maxCorridorLength"]), (1, 2))
+        self.assertEqual(metrics["diameter"], 4)
+        self.assertEqual(metrics["spawnDistanceHistogram"], [1, 3, 1, 1])
+        self.assertEqual(metrics["unreachable"], 0)
+
+        # agrees with walking the Room objects
+        controller = RoomController(3000, seed=4)
+        analytics = controller.analytics()
+        self.assertEqual([analytics.roomsWithExitCount(count) for count in range(5)], controller.exitCountHistogram())
+        field = controller.distanceField()
+        distances = analytics.distancesFrom()
+        for index, room in enumerate(analytics.rooms):
+            self.assertEqual(distances[index], field.distances.get(room, -1))
+        self.assertEqual(controller.metrics()["maxSpawnDistance"], max(field.distances.values()))
+
+        # an empty map has zero metrics rather than errors
+        empty = RoomController(generate=False).metrics()
+        self.assertEqual((empty["rooms"], empty["junctionRatio"], empty["meanSpawnDistance"], empty["diameter"]), (0, 0.0, 0.0, 0))
+        self.assertEqual(empty["spawnDistanceHistogram"], [])
+
+    def testCorridorGraph(self):
+        controller = RoomController(4000, seed=6)
+        controller.corridorGraph = CorridorGraph(controller, clusterSize=8)
+        rng = random.Random(6)
+        offsets = {CardinalDirection.NORTH: (0, 1), CardinalDirection.SOUTH: (0, -1), CardinalDirection.EAST: (1, 0), CardinalDirection.WEST: (-1, 0)}
+
+        def checkRoutes():
+            reachable = controller.distanceField().order
+            rooms = sorted(controller.rooms, key=lambda room: room.id)
+            for _ in range(60):
+                fromRoom = rng.choice(rooms)
+                toRoom = rng.choice(reachable)
+                expected = controller.shortestPath(fromRoom, toRoom)
+                path = controller.hierarchicalPath(fromRoom, toRoom)
+                if expected is None:
+                    self.assertIsNone(path)
+                    continue
+                self.assertEqual(len(path), len(expected))
+                self.assertIs(path[0], fromRoom)
+                self.assertIs(path[-1], toRoom)
+                for room, nextRoom in zip(path, path[1:]):
+                    self.assertIn(nextRoom, (room.north, room.south, room.east, room.west))
+
+        checkRoutes()
+        graph = controller.corridorGraph
+        self.assertTrue(any(graph.isCorridor(room) for room in controller.rooms))
+        self.assertTrue(graph.isNode(controller.spawnRoom) or graph.isCorridor(controller.spawnRoom))
+
+        # new rooms, overlapping ones included, only rebuild the clusters around them
+        builds = graph.builds
+        rooms = sorted(controller.rooms, key=lambda room: room.id)
+        for _ in range(200):
+            oldRoom = rng.choice(rooms)
+            direction = rng.choice(list(CardinalDirection))
+            dx, dy = offsets[direction]
+            room = Room("Extra", GridPosition(oldRoom.position.x + dx, oldRoom.position.y + dy))
+            controller.addRoomConnection(room, oldRoom, direction)
+            rooms.append(room)
+        checkRoutes()
+        self.assertGreater(graph.builds, builds)
+        self.assertIsNone(controller.clone().corridorGraph)
+
+    def testRewardPlacement(self):
+        def placement(controller):
+            return sorted((room.id, room.itemReward) for room in controller.rooms if room.itemReward is not None)
+
+        controller = RoomController(3000, seed=9)
+        placed = controller.placeRewards({"gold": 40, "key": 3}, seed=1)
+        self.assertEqual((len(placed["gold"]), len(placed["key"])), (40, 3))
+        again = RoomController(3000, seed=9)
+        again.placeRewards({"gold": 40, "key": 3}, seed=1)
+        self.assertEqual(placement(again), placement(controller))
+        other = RoomController(3000, seed=9)
+        other.placeRewards({"gold": 40, "key": 3}, seed=2)
+        self.assertNotEqual(placement(other), placement(controller))
+
+        # only reachable rooms, one reward each, and the index matches the rooms
+        field = controller.distanceField()
+        self.assertEqual(controller.roomsWithReward("gold"), set(placed["gold"]))
+        self.assertEqual(len(controller.roomsWithReward("gold") | controller.roomsWithReward("key")), 43)
+        self.assertTrue(all(room in field.distances for room in controller.roomsWithReward("gold")))
+        self.assertEqual(controller.roomsWithReward("shield"), set())
+
+        # weights steer placement; zero weight rooms are never picked
+        placed = controller.placeRewards([("map", 20)], seed=1, weight=lambda distance, deadEnd, density: 1.0 if deadEnd else 0.0)
+        self.assertTrue(all(room.exitCount() == 1 for room in placed["map"]))
+        rooms, distances, deadEnds, densities = controller.rewards.features()
+        self.assertEqual(len(rooms), len(controller.rooms))
+        self.assertTrue(all(0 <= density <= 24 for density in densities))
+
+        room = placed["map"][0]
+        controller.setItemReward(room, {"coins": 5})
+        self.assertNotIn(room, controller.roomsWithReward("map"))
+        self.assertEqual(controller.roomsWithReward({"coins": 5}), {room})
+        controller.setItemReward(room, None)
+        self.assertEqual(controller.roomsWithReward({"coins": 5}), set())
+
+        # copies and loaded maps come with their index
+        self.assertEqual(len(controller.clone().roomsWithReward("gold")), 40)
+        loaded = MapSnapshot(encodeSnapshot(controller)).toController()
+        self.assertEqual({room.id for room in loaded.roomsWithReward("key")}, {room.id for room in controller.roomsWithReward("key")})
+
+        # tiny weights still sample at random instead of tying at 0 and falling back to creation order
+        fresh = RoomController(400, seed=9)
+        rooms, distances, _, _ = fresh.rewards.features()
+        reachable = [room for index, room in enumerate(rooms) if distances[index] >= 0]
+        placed = fresh.placeRewards({"dust": 10}, seed=9, weight=lambda distance, deadEnd, density: 1e-300)["dust"]
+        self.assertNotEqual(set(placed), set(reachable[-10:]))
+
+    def testSharedWorld(self):
+        controller = RoomController(2000, seed=4)
+        owner = SharedWorld.create(controller)
+        worker = SharedWorld.attach(owner.name)
+        try:
+            self.assertEqual(len(worker), 2000)
+            self.assertEqual(worker.spawnRoom.id, controller.spawnRoom.id)
+            for room in controller.rooms:
+                view = worker.roomWithId(room.id)
+                self.assertEqual((view.name, view.position, view.exits), (room.name, room.position, room.exits))
+                self.assertEqual(view.north.id if view.north else None, room.north.id if room.north else None)
+                self.assertEqual(worker.position(view.index), (room.position.x, room.position.y))
+                self.assertEqual(worker.roomAt(room.position.x, room.position.y).id, controller.roomAt(room.position.x, room.position.y).id)
+            self.assertIsNone(worker.roomAt(10000, 10000))
+            self.assertIsNone(worker.roomWithId(2001))
+            self.assertIsNone(worker.roomWithId("1"))
+
+            # players stay in the process, and the view, they were placed in
+            player = Player()
+            worker.place(player)
+            self.assertEqual(len(worker.spawnRoom.players), 1)
+            self.assertEqual(len(owner.spawnRoom.players), 0)
+            direction = next(direction for direction in CardinalDirection if worker.spawnRoom.hasExit(direction.mask))
+            room = worker.move(player, direction)
+            self.assertIs(player.room, room)
+            self.assertRaises(ValueError, worker.move, player, "up")
+            self.assertEqual(worker.exitIndexes(worker.spawnRoom.index)[list(CardinalDirection).index(direction)], room.index)
+        finally:
+            worker.close()
+            owner.close()
+        self.assertRaises(FileNotFoundError, SharedWorld.attach, owner.name)
+
+        # the same layout memory-mapped from a file, with ids that need the fallback lookup
+        controller = RoomController(300, seed=4, idMode="hex")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "world.shw")
+            writeSharedWorld(controller, path)
+            world = SharedWorld.open(path)
+            room = next(iter(controller.rooms))
+            self.assertEqual(world.roomWithId(room.id).position, room.position)
+            self.assertEqual(world.roomAt(0, 0).name, "Spawn Area")
+            world.close()
+
+    def testControllerSnapshot(self):
+        controller = RoomController(400, seed=21)
+        players = [Player() for _ in range(6)]
+        for player in players:
+            controller.placePlayer(player)
+        controller.setItemReward(controller.spawnRoom, "key")
+        frozen = controller.clone()
+        for player in players:
+            frozen.placePlayer(Player(), frozen.roomWithId(player.room.id))
+        snapshot = controller.snapshot()
+        self.assertEqual(snapshot.version, controller.version)
+
+        # later writes: new rooms (some growing the grid), rewards and moves
+        rng = random.Random(21)
+        for step in range(60):
+            room = rng.choice(sorted(controller.rooms, key=lambda room: room.id))
+            directions = controller.roomEligibleDirections(room)
+            if directions:
+                controller.addRoomConnection(Room(f"Extra {step}"), room, min(directions))
+            controller.setItemReward(room, step)
+            controller.applyMoves([(player, rng.choice(list(CardinalDirection))) for player in players])
+        controller.move(players[0], next(direction for direction in CardinalDirection
+                                          if players[0].room.hasExit(direction.mask)))
+        self.assertGreater(len(controller.rooms), 400)
+        self.assertLess(len(snapshot.preserved), len(controller.rooms))
+
+        def rendered(source):
+            output = io.StringIO()
+            source.textVisualization(output)
+            return output.getvalue()
+
+        self.assertEqual(len(snapshot), 400)
+        self.assertEqual(snapshot.toDict()["rooms"], frozen.toDict()["rooms"])
+        self.assertEqual(rendered(snapshot), rendered(frozen))
+        self.assertEqual(encodeSnapshot(snapshot, snapshot.grid.rooms), encodeSnapshot(frozen, frozen.grid.rooms))
+        self.assertEqual(MapAnalytics(snapshot).metrics(), MapAnalytics(frozen).metrics())
+        streamed = io.StringIO()
+        dumpController(snapshot, streamed)
+        self.assertEqual(json.loads(streamed.getvalue())["rooms"], frozen.toDict()["rooms"])
+        for room in frozen.rooms:
+            view = snapshot.roomWithId(room.id)
+            self.assertEqual(snapshot.populationOf(view), frozen.populationOf(room))
+            self.assertEqual(snapshot.roomIdAt(room.position.x, room.position.y), frozen.roomIdAt(room.position.x, room.position.y))
+        target = max(frozen.rooms, key=lambda room: room.id)
+        self.assertEqual([room.id for room in snapshot.shortestPath(snapshot.spawnRoom, snapshot.roomWithId(target.id))],
+                         [room.id for room in frozen.shortestPath(frozen.spawnRoom, target)])
+
+        # released snapshots stop collecting old state and are dropped at the next snapshot
+        reward = controller.spawnRoom.itemReward
+        with controller.snapshot() as other:
+            controller.setItemReward(controller.spawnRoom, "other")
+            self.assertEqual(other.spawnRoom.itemReward, reward)
+        controller.setItemReward(controller.spawnRoom, "later")
+        self.assertEqual(len(other.preserved), 1)
+        controller.snapshot()
+        self.assertNotIn(other, set(controller.snapshots))
+
+    def testGenerationStrategies(self):
+        # the default strategy is the original generator
+        self.assertEqual(self.layoutSignature(RoomController(500, seed=3, strategy=QueueStrategy())),
+                         self.layoutSignature(RoomController(500, seed=3)))
+
+        shapes = {}
+        for strategy in (WeightedStrategy(), CorridorStrategy(), HubStrategy(), OutwardStrategy()):
+            controller = RoomController(3000, seed=3, strategy=strategy)
+            self.assertEqual(len(controller.rooms), 3000)
+            # weighted strategies grow a tree on distinct cells, all of it reachable from spawn
+            self.assertEqual(len(controller.roomCoordinates), 3000)
+            metrics = controller.metrics()
+            self.assertEqual(metrics["unreachable"], 0)
+            self.assertEqual(sum(room.exitCount() for room in controller.rooms), 2 * 2999)
+            self.assertEqual(self.layoutSignature(controller), self.layoutSignature(RoomController(3000, seed=3, strategy=strategy)))
+            self.assertIs(controller.clone().strategy, strategy)
+            shapes[strategy.name] = metrics
+        self.assertGreater(shapes["corridor"]["meanCorridorLength"], shapes["hub"]["meanCorridorLength"])
+        self.assertLess(shapes["corridor"]["deadEndRatio"], shapes["hub"]["deadEndRatio"])
+        self.assertGreater(shapes["outward"]["meanSpawnDistance"], shapes["weighted"]["meanSpawnDistance"])
+
+        # weights come from the batched feature columns; cells weighted 0 are never opened
+        class FirstRingStrategy(WeightedStrategy):
+            def weights(self, distances, crowding, parentExits, branchDepths):
+                self.lastColumns = (len(distances), len(crowding), len(parentExits), len(branchDepths))
+                return [1.0 if distance == 1 else 0.0 for distance in distances]
+
+        strategy = FirstRingStrategy()
+        controller = RoomController(10, generate=False, strategy=strategy)
+        self.assertRaises(GenerationExhausted, controller.generateRooms, 1, True)
+        self.assertEqual(len(controller.rooms), 5)
+        self.assertEqual(len(set(strategy.lastColumns)), 1)
+
+        profiler = GenerationProfiler(sampleEvery=1000)
+        RoomController(2000, seed=3, profiler=profiler, strategy=HubStrategy())
+        self.assertEqual(profiler.report()["phases"]["addRoomConnection"]["calls"], 1999)
+
+    def testGenerationMatchesLegacyLayout(self):
+        for seed in (1, 7, 2024):
+            controller = RoomController(10)
+            controller.roomLimit = 300
+            controller.generateRooms(seed)
+            # rooms are named in creation order, spawn first
+            ordered = sorted(controller.rooms, key=lambda room: -1 if room is controller.spawnRoom else int(room.name.split()[1]))
+            layout = [(room.position.x, room.position.y) for room in ordered]
+            self.assertEqual(layout, self.legacyLayout(300, seed))
+
     def testGenerateQuickTestJSON(self):
-        roomController = RoomController(10)
-        file_write = open("rooms10.json", "w")
-        json.dump(roomController.toDict(), file_write, indent=2)
-        file_write.close()
+        # written to a temporary directory so test runs leave nothing behind in the checkout
+        with tempfile.TemporaryDirectory() as directory:
+            roomController = RoomController(10)
+            file_write = open(os.path.join(directory, "rooms10.json"), "w")
+            json.dump(roomController.toDict(), file_write, indent=2)
+            file_write.close()
 
-        roomController = RoomController(100)
-        file_write = open("rooms100.json", "w")
-        json.dump(roomController.toDict(), file_write)
-        file_write.close()
+            roomController = RoomController(100)
+            file_write = open(os.path.join(directory, "rooms100.json"), "w")
+            json.dump(roomController.toDict(), file_write)
+            file_write.close()
 
-        roomController.textVisualization()
+            roomController.textVisualization()
 
-        roomController = RoomController(500)
-        file_write = open("rooms500.json", "w")
-        json.dump(roomController.toDict(), file_write)
-        file_write.close()
+            roomController = RoomController(500)
+            file_write = open(os.path.join(directory, "rooms500.json"), "w")
+            json.dump(roomController.toDict(), file_write)
+            file_write.close()
 
-        # print(roomController.toDict())
+            # print(roomController.toDict())
 
 
 if __name__ == '__main__':